@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import asyncio
+from typing import List
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import Config
+from app.middlewares import TelegramMetricsMiddleware
+
+
+def build_bot(config: Config) -> Bot:
+    session = None
+    if config.telegram_api_url:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(config.telegram_api_url))
+    bot = Bot(
+        token=config.bot_token,
+        session=session,
+        default=DefaultBotProperties(parse_mode="HTML"),
+    )
+    bot.session.middleware(TelegramMetricsMiddleware())
+    return bot
+
+
+def build_dispatcher(config: Config, session_maker: async_sessionmaker[AsyncSession]) -> Dispatcher:
+    """Диспетчер с роутерами, миддлварами и фоновыми задачами — общий для polling и webhook."""
+    # Импорты только для бота: планировщику нужен build_bot, а хендлеры и их зависимости — нет
+    from app.db.session import replica_set
+    from app.handlers import setup_routers
+    from app.middlewares import (
+        ConfigMiddleware,
+        DbSessionMiddleware,
+        HandlerNameMiddleware,
+        MetricsMiddleware,
+        OrderedExecutorMiddleware,
+        ThrottlingMiddleware,
+    )
+    from app.services.board import start_board_updater, stop_board_updater
+    from app.services.delivery import DeliverySettings
+    from app.services.outbox import OutboxDispatcher
+    from app.services.throttling import ThrottleSettings, Throttler, build_throttle_backend
+    from app.services.view_cache import is_cross_process, listen_for_changes
+    from app.startup import warm_start
+
+    dp = Dispatcher()
+
+    # Подключаем роутеры
+    setup_routers(dp)
+
+    # Миддлвары для всех апдейтов. Первыми — лимиты команд (флуд отсекается до очереди
+    # и сессии БД) и очередь: апдейты одного чата по порядку, всего не больше, чем
+    # соединений в пуле; затем метрики, чтобы учесть и работу сессии
+    throttle_settings = ThrottleSettings.from_config(config)
+    throttle_backend = build_throttle_backend(config.throttle_redis_url) if throttle_settings.enabled else None
+    if throttle_backend is not None:
+        dp.update.middleware(ThrottlingMiddleware(Throttler(throttle_settings, throttle_backend)))
+    concurrency = config.update_concurrency or config.db_pool_size + config.db_max_overflow
+    dp.update.middleware(OrderedExecutorMiddleware(concurrency))
+    dp.update.middleware(MetricsMiddleware())
+    dp.update.middleware(ConfigMiddleware(config))
+    dp.update.middleware(DbSessionMiddleware(session_maker))
+    dp.message.middleware(HandlerNameMiddleware())
+    dp.callback_query.middleware(HandlerNameMiddleware())
+
+    background: List[asyncio.Task] = []
+
+    async def on_startup(bot: Bot) -> None:
+        # Соединения и горячие запросы готовим до первого апдейта
+        await warm_start(session_maker)
+        # Фоновая отправка уведомлений из outbox
+        outbox = OutboxDispatcher(session_maker, bot, DeliverySettings.from_config(config))
+        background.append(asyncio.create_task(outbox.run(), name="outbox-dispatcher"))
+        # Отложенная перерисовка досок групп (/board)
+        start_board_updater(session_maker, bot, default_tz=config.default_timezone, debounce=config.board_debounce)
+        # Следим за отставанием реплик: отстающие не получают чтений
+        replicas = replica_set(session_maker)
+        if replicas is not None:
+            background.append(asyncio.create_task(replicas.monitor(), name="replica-monitor"))
+        # Изменения задач из других воркеров сбрасывают кэш представлений этого
+        if is_cross_process():
+            engine = session_maker.kw["bind"]
+            background.append(asyncio.create_task(listen_for_changes(engine), name="view-cache-listener"))
+
+    async def on_shutdown() -> None:
+        await stop_board_updater()
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+        background.clear()
+        if throttle_backend is not None:
+            await throttle_backend.close()
+
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
+    return dp
@@ -2,8 +2,13 @@ from __future__ import annotations
 
 import os
 from dataclasses import dataclass
+from datetime import time
+from typing import Optional, Tuple
 from dotenv import load_dotenv
 
+from app.utils.parsing import ParseError, parse_duration_minutes
+from app.utils.ratelimit import Rate, parse_rate, parse_rate_rules
+
 def _env_bool(name: str, default: bool = False) -> bool:
     val = os.getenv(name)
     if val is None:
@@ -14,9 +19,66 @@ def _env_bool(name: str, default: bool = False) -> bool:
 class Config:
     bot_token: str
     database_url: str
+    # Реплики для чтения (списки задач, дайджесты); пусто — всё на primary
+    database_replica_urls: Tuple[str, ...] = ()
+    # Реплика, отстающая сильнее (сек), выводится из ротации
+    replica_max_lag: float = 5.0
+    # Пул соединений (на каждый процесс и на каждую реплику)
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_recycle: int = 1800
+    # always | idle | never — когда проверять соединение перед выдачей из пула
+    db_pre_ping: str = "idle"
+    db_pre_ping_idle: float = 30.0
+    db_statement_cache_size: int = 100
+    # БД за pgbouncer в режиме pool_mode=transaction
+    db_pgbouncer: bool = False
+    db_pool_warmup: int = 2
+    # Одновременно обрабатываемых апдейтов на процесс; 0 — по ёмкости пула (размер + overflow)
+    update_concurrency: int = 0
+    # Лимиты входящих команд: на пользователя, на групповой чат и отдельные по командам (None — без лимита)
+    throttle_user: Optional[Rate] = Rate(capacity=5, per_second=0.5)
+    throttle_chat: Optional[Rate] = Rate(capacity=20, per_second=2.0)
+    throttle_commands: Tuple[Tuple[str, Optional[Rate]], ...] = (("export", Rate(capacity=2, per_second=2 / 60)),)
+    # Общие для всех воркеров лимиты в Redis; пусто — в памяти процесса
+    throttle_redis_url: str = ""
     log_level: str = "INFO"
     daily_digest_hour: int = 9
+    # Часовой пояс пользователей, не задавших свой (/tz)
+    default_timezone: str = "Europe/Moscow"
+    # Дедлайн задачи наступает в это время дня (в поясе исполнителя)
+    deadline_time: time = time(18, 0)
+    # Напоминания по умолчанию: за сколько минут до дедлайна
+    reminder_offsets: Tuple[int, ...] = (1440, 0)
     notify_done_in_chat: bool = True
+    # Доска /board перерисовывается не чаще раза в столько секунд
+    board_debounce: float = 10.0
+    # Закрытые задачи старше стольких дней переносятся в tasks_archive (0 — не переносить)
+    archive_after_days: int = 30
+    archive_batch_size: int = 1000
+    delivery_workers: int = 8
+    delivery_global_rate: float = 30.0
+    delivery_max_attempts: int = 5
+    identity_cache_size: int = 50_000
+    identity_cache_ttl: int = 600
+    view_cache_size: int = 20_000
+    view_cache_ttl: int = 300
+    # polling | webhook
+    run_mode: str = "polling"
+    webhook_base_url: str = ""
+    webhook_path: str = "/telegram/webhook"
+    webhook_secret: str = ""
+    webhook_host: str = "0.0.0.0"
+    webhook_port: int = 8080
+    webhook_workers: int = 1
+    # Свой адрес Bot API (локальный сервер или фейковый Telegram для тестов)
+    telegram_api_url: str = ""
+    # /metrics для Prometheus (0 — выключено); у webhook-воркера i порт metrics_port + i
+    metrics_host: str = "127.0.0.1"
+    metrics_port: int = 0
+    scheduler_metrics_port: int = 0
+    # Шардов рассылки дайджестов — одинаково у всех экземпляров планировщика
+    scheduler_shards: int = 16
 
 def load_config() -> Config:
     # Загружаем .env из текущей рабочей директории (для systemd важен WorkingDirectory)
@@ -28,14 +90,113 @@ def load_config() -> Config:
     if not database_url:
         raise RuntimeError("DATABASE_URL не задан в окружении / .env")
 
+    database_replica_urls = tuple(
+        url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()
+    )
+    replica_max_lag = float(os.getenv("REPLICA_MAX_LAG", "5"))
+    db_pool_size = int(os.getenv("DB_POOL_SIZE", "5"))
+    db_max_overflow = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    db_pool_recycle = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    db_pre_ping = os.getenv("DB_PRE_PING", "idle").strip().lower()
+    if db_pre_ping not in {"always", "idle", "never"}:
+        raise RuntimeError("DB_PRE_PING должен быть always, idle или never")
+    db_pre_ping_idle = float(os.getenv("DB_PRE_PING_IDLE", "30"))
+    db_statement_cache_size = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+    db_pgbouncer = _env_bool("DB_PGBOUNCER", False)
+    db_pool_warmup = int(os.getenv("DB_POOL_WARMUP", "2"))
+    update_concurrency = int(os.getenv("UPDATE_CONCURRENCY", "0"))
+    try:
+        throttle_user = parse_rate(os.getenv("THROTTLE_USER", "5/10s"))
+        throttle_chat = parse_rate(os.getenv("THROTTLE_CHAT", "20/10s"))
+        throttle_commands = tuple(parse_rate_rules(os.getenv("THROTTLE_COMMANDS", "export=2/1m")).items())
+    except ValueError as e:
+        raise RuntimeError(f"Неверные THROTTLE_USER / THROTTLE_CHAT / THROTTLE_COMMANDS: {e}")
+    throttle_redis_url = os.getenv("THROTTLE_REDIS_URL", "").strip()
     log_level = os.getenv("LOG_LEVEL", "INFO").upper()
     daily_digest_hour = int(os.getenv("DAILY_DIGEST_HOUR", "9"))
+    default_timezone = os.getenv("DEFAULT_TIMEZONE", "Europe/Moscow").strip()
+    try:
+        hh, mm = os.getenv("DEADLINE_TIME", "18:00").strip().split(":")
+        deadline_time = time(int(hh), int(mm))
+        reminder_offsets = tuple(
+            parse_duration_minutes(v) for v in os.getenv("REMINDER_OFFSETS", "24h,0").split(",") if v.strip()
+        )
+    except (ValueError, ParseError) as e:
+        raise RuntimeError(f"Неверные DEADLINE_TIME / REMINDER_OFFSETS: {e}")
     notify_done_in_chat = _env_bool("NOTIFY_DONE_IN_CHAT", True)
+    board_debounce = float(os.getenv("BOARD_DEBOUNCE", "10"))
+    archive_after_days = int(os.getenv("ARCHIVE_AFTER_DAYS", "30"))
+    archive_batch_size = int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
+    delivery_workers = int(os.getenv("DELIVERY_WORKERS", "8"))
+    delivery_global_rate = float(os.getenv("DELIVERY_GLOBAL_RATE", "30"))
+    delivery_max_attempts = int(os.getenv("DELIVERY_MAX_ATTEMPTS", "5"))
+    identity_cache_size = int(os.getenv("IDENTITY_CACHE_SIZE", "50000"))
+    identity_cache_ttl = int(os.getenv("IDENTITY_CACHE_TTL", "600"))
+    view_cache_size = int(os.getenv("VIEW_CACHE_SIZE", "20000"))
+    view_cache_ttl = int(os.getenv("VIEW_CACHE_TTL", "300"))
+    run_mode = os.getenv("RUN_MODE", "polling").strip().lower()
+    if run_mode not in {"polling", "webhook"}:
+        raise RuntimeError("RUN_MODE должен быть polling или webhook")
+    webhook_base_url = os.getenv("WEBHOOK_BASE_URL", "").strip().rstrip("/")
+    if run_mode == "webhook" and not webhook_base_url:
+        raise RuntimeError("WEBHOOK_BASE_URL не задан, а RUN_MODE=webhook")
+    webhook_path = os.getenv("WEBHOOK_PATH", "/telegram/webhook").strip()
+    webhook_secret = os.getenv("WEBHOOK_SECRET", "").strip()
+    webhook_host = os.getenv("WEBHOOK_HOST", "0.0.0.0").strip()
+    webhook_port = int(os.getenv("WEBHOOK_PORT", "8080"))
+    webhook_workers = int(os.getenv("WEBHOOK_WORKERS", "1"))
+    telegram_api_url = os.getenv("TELEGRAM_API_URL", "").strip().rstrip("/")
+    metrics_host = os.getenv("METRICS_HOST", "127.0.0.1").strip()
+    metrics_port = int(os.getenv("METRICS_PORT", "0"))
+    scheduler_metrics_port = int(os.getenv("SCHEDULER_METRICS_PORT", "0"))
+    scheduler_shards = int(os.getenv("SCHEDULER_SHARDS", "16"))
+    if scheduler_shards < 1:
+        raise RuntimeError("SCHEDULER_SHARDS должен быть не меньше 1")
 
     return Config(
         bot_token=bot_token,
         database_url=database_url,
+        database_replica_urls=database_replica_urls,
+        replica_max_lag=replica_max_lag,
+        db_pool_size=db_pool_size,
+        db_max_overflow=db_max_overflow,
+        db_pool_recycle=db_pool_recycle,
+        db_pre_ping=db_pre_ping,
+        db_pre_ping_idle=db_pre_ping_idle,
+        db_statement_cache_size=db_statement_cache_size,
+        db_pgbouncer=db_pgbouncer,
+        db_pool_warmup=db_pool_warmup,
+        update_concurrency=update_concurrency,
+        throttle_user=throttle_user,
+        throttle_chat=throttle_chat,
+        throttle_commands=throttle_commands,
+        throttle_redis_url=throttle_redis_url,
         log_level=log_level,
         daily_digest_hour=daily_digest_hour,
+        default_timezone=default_timezone,
+        deadline_time=deadline_time,
+        reminder_offsets=reminder_offsets,
         notify_done_in_chat=notify_done_in_chat,
+        board_debounce=board_debounce,
+        archive_after_days=archive_after_days,
+        archive_batch_size=archive_batch_size,
+        delivery_workers=delivery_workers,
+        delivery_global_rate=delivery_global_rate,
+        delivery_max_attempts=delivery_max_attempts,
+        identity_cache_size=identity_cache_size,
+        identity_cache_ttl=identity_cache_ttl,
+        view_cache_size=view_cache_size,
+        view_cache_ttl=view_cache_ttl,
+        run_mode=run_mode,
+        webhook_base_url=webhook_base_url,
+        webhook_path=webhook_path,
+        webhook_secret=webhook_secret,
+        webhook_host=webhook_host,
+        webhook_port=webhook_port,
+        webhook_workers=webhook_workers,
+        telegram_api_url=telegram_api_url,
+        metrics_host=metrics_host,
+        metrics_port=metrics_port,
+        scheduler_metrics_port=scheduler_metrics_port,
+        scheduler_shards=scheduler_shards,
     )
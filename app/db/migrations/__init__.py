@@ -0,0 +1,142 @@
+"""
+Версионные миграции схемы.
+
+Каждая миграция — модуль `mNNNN_<name>.py` в этом пакете с функцией
+`async def upgrade(conn: AsyncConnection) -> None` и, при необходимости,
+флагом `TRANSACTIONAL = False` (нужен для `CREATE INDEX CONCURRENTLY`, который
+нельзя выполнять внутри транзакции). Применённые версии хранятся
+в таблице `schema_migrations`.
+
+DDL миграции не зависит от текущих моделей: таблицы объявляются прямо в ней
+(`frozen_metadata()` + `Table`) или пишутся SQL-текстом, — иначе правка модели
+переписала бы историю, и новая БД получила бы поздние столбцы уже в m0001.
+"""
+from __future__ import annotations
+
+import importlib
+import logging
+import pkgutil
+import re
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Optional, Set
+
+from sqlalchemy import MetaData, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+_MODULE_RE = re.compile(r"^m(?P<version>\d{4})_(?P<name>\w+)$")
+# Ключ advisory-lock, чтобы два процесса не мигрировали одновременно
+_LOCK_KEY = 7_310_001
+
+# Копия соглашения об именах из app.db.base: имена ограничений и индексов,
+# созданных миграциями, не должны меняться вместе с ним
+_NAMING_CONVENTION = {
+    "ix": "ix_%(column_0_label)s",
+    "uq": "uq_%(table_name)s_%(column_0_name)s",
+    "ck": "ck_%(table_name)s_%(constraint_name)s",
+    "fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s",
+    "pk": "pk_%(table_name)s",
+}
+
+
+def frozen_metadata() -> MetaData:
+    """Отдельная MetaData для таблиц, объявленных в самой миграции."""
+    return MetaData(naming_convention=_NAMING_CONVENTION)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    upgrade: Callable[[AsyncConnection], Awaitable[None]]
+    transactional: bool = True
+
+
+def discover() -> List[Migration]:
+    migrations = []
+    for info in pkgutil.iter_modules(__path__):
+        m = _MODULE_RE.match(info.name)
+        if not m:
+            continue
+        module = importlib.import_module(f"{__name__}.{info.name}")
+        migrations.append(Migration(
+            version=int(m["version"]),
+            name=m["name"],
+            upgrade=module.upgrade,
+            transactional=getattr(module, "TRANSACTIONAL", True),
+        ))
+    migrations.sort(key=lambda x: x.version)
+    versions = [x.version for x in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"Дублирующиеся номера миграций: {versions}")
+    return migrations
+
+
+async def _ensure_table(conn: AsyncConnection) -> None:
+    await conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        " version INTEGER PRIMARY KEY,"
+        " name VARCHAR(255) NOT NULL,"
+        " applied_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+    ))
+
+
+async def applied_versions(conn: AsyncConnection) -> Set[int]:
+    q = await conn.execute(text("SELECT version FROM schema_migrations"))
+    return {row[0] for row in q}
+
+
+async def create_index_concurrently(conn: AsyncConnection, name: str, ddl: str, *, unique: bool = False) -> None:
+    """
+    `CREATE [UNIQUE] INDEX CONCURRENTLY IF NOT EXISTS` с защитой от недостроенных индексов:
+    если прошлая попытка упала, индекс остаётся INVALID — удаляем и строим заново.
+    `ddl` — всё, что идёт после имени индекса (`ON table (...) WHERE ...`).
+    """
+    q = await conn.execute(
+        text("SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"),
+        {"name": name},
+    )
+    valid = q.scalar_one_or_none()
+    if valid is False:
+        logger.warning("Индекс %s недостроен (INVALID), пересоздаём", name)
+        await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    await conn.execute(text(f"CREATE {kind} CONCURRENTLY IF NOT EXISTS {name} {ddl}"))
+
+
+async def migrate(engine: AsyncEngine, target: Optional[int] = None) -> List[Migration]:
+    """Применяет все ещё не применённые миграции (до `target` включительно)."""
+    migrations = discover()
+    applied: List[Migration] = []
+
+    async with engine.connect() as lock_conn:
+        lock_conn = await lock_conn.execution_options(isolation_level="AUTOCOMMIT")
+        await lock_conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": _LOCK_KEY})
+        try:
+            await _ensure_table(lock_conn)
+            done = await applied_versions(lock_conn)
+            for mig in migrations:
+                if mig.version in done or (target is not None and mig.version > target):
+                    continue
+                logger.info("Миграция %04d_%s", mig.version, mig.name)
+                if mig.transactional:
+                    async with engine.begin() as conn:
+                        await mig.upgrade(conn)
+                        await _record(conn, mig)
+                else:
+                    async with engine.connect() as conn:
+                        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+                        await mig.upgrade(conn)
+                        await _record(conn, mig)
+                applied.append(mig)
+        finally:
+            await lock_conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": _LOCK_KEY})
+    return applied
+
+
+async def _record(conn: AsyncConnection, mig: Migration) -> None:
+    await conn.execute(
+        text("INSERT INTO schema_migrations (version, name) VALUES (:v, :n)"),
+        {"v": mig.version, "n": mig.name},
+    )
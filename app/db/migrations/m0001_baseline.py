@@ -0,0 +1,50 @@
+"""Исходная схема — users, chats и tasks в том виде, в каком они были до миграций."""
+from sqlalchemy import BigInteger, Column, Date, DateTime, ForeignKey, Index, Integer, String, Table, Text, func
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.db.migrations import frozen_metadata
+
+metadata = frozen_metadata()
+
+Table(
+    "users",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("tg_id", BigInteger, unique=True, index=True, nullable=True),
+    Column("username", String(255), index=True),
+    Column("first_name", String(255)),
+    Column("last_name", String(255)),
+    Column("created_at", DateTime(timezone=True), nullable=False, server_default=func.now()),
+)
+
+Table(
+    "chats",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("tg_chat_id", BigInteger, unique=True, index=True, nullable=False),
+    Column("title", String(255)),
+    Column("type", String(32)),
+    Column("created_at", DateTime(timezone=True), nullable=False, server_default=func.now()),
+)
+
+Table(
+    "tasks",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("chat_id", Integer, ForeignKey("chats.id", ondelete="RESTRICT"), nullable=False),
+    Column("creator_id", Integer, ForeignKey("users.id", ondelete="RESTRICT"), nullable=False),
+    Column("assignee_id", Integer, ForeignKey("users.id", ondelete="RESTRICT"), nullable=False),
+    Column("title", String(500), nullable=False),
+    Column("description", Text),
+    Column("deadline", Date, index=True, nullable=False),
+    Column("status", String(20), index=True, nullable=False),
+    Column("created_at", DateTime(timezone=True), nullable=False, server_default=func.now()),
+    Column("closed_at", DateTime(timezone=True)),
+    Column("origin_message_id", BigInteger),
+    Index("tasks_assignee_status_idx", "assignee_id", "status"),
+)
+
+
+async def upgrade(conn: AsyncConnection) -> None:
+    # checkfirst: на существующей БД не трогает уже созданные таблицы
+    await conn.run_sync(metadata.create_all)
@@ -0,0 +1,31 @@
+"""Пометка недоступных пользователей (доставка) и таблица outbox."""
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Index, Integer, String, Table, Text, func, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.db.migrations import frozen_metadata
+
+metadata = frozen_metadata()
+
+# Только как цель внешнего ключа — не создаётся
+Table("users", metadata, Column("id", Integer, primary_key=True))
+
+outbox = Table(
+    "notification_outbox",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("chat_id", BigInteger, nullable=False),
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True),
+    Column("text", Text, nullable=False),
+    Column("status", String(20), nullable=False),
+    Column("attempts", Integer, nullable=False),
+    Column("next_attempt_at", DateTime(timezone=True), nullable=False, server_default=func.now()),
+    Column("last_error", Text),
+    Column("created_at", DateTime(timezone=True), nullable=False, server_default=func.now()),
+    Column("sent_at", DateTime(timezone=True)),
+    Index("notification_outbox_pending_idx", "next_attempt_at", postgresql_where=text("status = 'pending'")),
+)
+
+
+async def upgrade(conn: AsyncConnection) -> None:
+    await conn.execute(text("ALTER TABLE users ADD COLUMN IF NOT EXISTS unreachable_at TIMESTAMPTZ"))
+    await conn.run_sync(lambda sync_conn: outbox.create(sync_conn, checkfirst=True))
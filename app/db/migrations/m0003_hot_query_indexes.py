@@ -0,0 +1,24 @@
+"""
+Индексы под горячие запросы:
+  * представления и дайджест — assignee_id + status='open' + диапазон deadline;
+  * выборки по чату — chat_id + status + deadline.
+"""
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.db.migrations import create_index_concurrently
+
+# CREATE INDEX CONCURRENTLY нельзя выполнять в транзакции
+TRANSACTIONAL = False
+
+
+async def upgrade(conn: AsyncConnection) -> None:
+    await create_index_concurrently(
+        conn,
+        "tasks_open_assignee_deadline_idx",
+        "ON tasks (assignee_id, deadline, id) WHERE status = 'open'",
+    )
+    await create_index_concurrently(
+        conn,
+        "tasks_chat_status_deadline_idx",
+        "ON tasks (chat_id, status, deadline)",
+    )
@@ -0,0 +1,53 @@
+"""
+Нормализованный username (нижний регистр) с уникальным индексом.
+
+Бэкфилл: заглушки (tg_id IS NULL) сливаются в настоящих пользователей с тем же
+именем, дубли заглушек — в самую раннюю, а среди реальных пользователей ключ
+остаётся у самого нового (старые, скорее всего, сменили ник).
+
+Бэкфилл идёт одной транзакцией на отдельном соединении, уникальный индекс
+строится после неё через CONCURRENTLY — запись в users на это время не встаёт.
+"""
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.db.migrations import create_index_concurrently
+
+# CREATE INDEX CONCURRENTLY нельзя выполнять в транзакции
+TRANSACTIONAL = False
+
+_BACKFILL = [
+    "ALTER TABLE users ADD COLUMN IF NOT EXISTS username_lc VARCHAR(255)",
+    """
+    UPDATE users SET username_lc = lower(ltrim(username, '@'))
+    WHERE username IS NOT NULL AND username <> ''
+      AND username_lc IS DISTINCT FROM lower(ltrim(username, '@'))
+    """,
+    # Заглушка -> сразу конечный пользователь: самый новый реальный с тем же именем,
+    # а если реальных нет — самая ранняя заглушка (у неё самой пары нет), без цепочек
+    """
+    CREATE TEMP TABLE user_merge ON COMMIT DROP AS
+    SELECT DISTINCT ON (s.id) s.id AS stub_id, t.id AS into_id
+    FROM users s
+    JOIN users t ON t.username_lc = s.username_lc AND t.id <> s.id
+    WHERE s.tg_id IS NULL
+      AND (t.tg_id IS NOT NULL OR t.id < s.id)
+    ORDER BY s.id, (t.tg_id IS NOT NULL) DESC, CASE WHEN t.tg_id IS NOT NULL THEN -t.id ELSE t.id END
+    """,
+    "UPDATE tasks t SET assignee_id = m.into_id FROM user_merge m WHERE t.assignee_id = m.stub_id",
+    "UPDATE tasks t SET creator_id = m.into_id FROM user_merge m WHERE t.creator_id = m.stub_id",
+    "DELETE FROM users u USING user_merge m WHERE u.id = m.stub_id",
+    # Среди реальных пользователей ключ остаётся у самого нового
+    """
+    UPDATE users u SET username_lc = NULL
+    WHERE u.username_lc IS NOT NULL
+      AND EXISTS (SELECT 1 FROM users o WHERE o.username_lc = u.username_lc AND o.id > u.id)
+    """,
+]
+
+
+async def upgrade(conn: AsyncConnection) -> None:
+    async with conn.engine.begin() as tx:
+        for stmt in _BACKFILL:
+            await tx.execute(text(stmt))
+    await create_index_concurrently(conn, "users_username_lc_uq", "ON users (username_lc)", unique=True)
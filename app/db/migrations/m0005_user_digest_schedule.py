@@ -0,0 +1,11 @@
+"""Часовой пояс и время дайджеста пользователя, индекс по next_digest_at."""
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+
+async def upgrade(conn: AsyncConnection) -> None:
+    await conn.execute(text("ALTER TABLE users ADD COLUMN IF NOT EXISTS timezone VARCHAR(64)"))
+    await conn.execute(text("ALTER TABLE users ADD COLUMN IF NOT EXISTS digest_time TIME"))
+    await conn.execute(text("ALTER TABLE users ADD COLUMN IF NOT EXISTS next_digest_at TIMESTAMPTZ"))
+    # next_digest_at заполнит планировщик при первом проходе (пользователи с NULL)
+    await conn.execute(text("CREATE INDEX IF NOT EXISTS users_next_digest_at_idx ON users (next_digest_at)"))
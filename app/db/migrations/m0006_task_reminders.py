@@ -0,0 +1,25 @@
+"""Таблица напоминаний по задачам."""
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, Table, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.db.migrations import frozen_metadata
+
+metadata = frozen_metadata()
+
+# Только как цель внешнего ключа — не создаётся
+Table("tasks", metadata, Column("id", Integer, primary_key=True))
+
+task_reminders = Table(
+    "task_reminders",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("task_id", Integer, ForeignKey("tasks.id", ondelete="CASCADE"), index=True, nullable=False),
+    Column("fire_at", DateTime(timezone=True), nullable=False),
+    Column("offset_minutes", Integer, nullable=False),
+    Column("sent_at", DateTime(timezone=True)),
+    Index("task_reminders_pending_idx", "fire_at", postgresql_where=text("sent_at IS NULL")),
+)
+
+
+async def upgrade(conn: AsyncConnection) -> None:
+    await conn.run_sync(lambda sync_conn: task_reminders.create(sync_conn, checkfirst=True))
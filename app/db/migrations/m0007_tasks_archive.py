@@ -0,0 +1,39 @@
+"""Архив закрытых задач и индекс для поиска кандидатов на перенос."""
+from sqlalchemy import BigInteger, Column, Date, DateTime, Index, Integer, String, Table, Text, func
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.db.migrations import create_index_concurrently, frozen_metadata
+
+# CREATE INDEX CONCURRENTLY нельзя выполнять в транзакции
+TRANSACTIONAL = False
+
+metadata = frozen_metadata()
+
+tasks_archive = Table(
+    "tasks_archive",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=False),
+    Column("chat_id", Integer, nullable=False),
+    Column("creator_id", Integer, nullable=False),
+    Column("assignee_id", Integer, nullable=False),
+    Column("title", String(500), nullable=False),
+    Column("description", Text),
+    Column("deadline", Date, nullable=False),
+    Column("status", String(20), nullable=False),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+    Column("closed_at", DateTime(timezone=True)),
+    Column("origin_message_id", BigInteger),
+    Column("archived_at", DateTime(timezone=True), nullable=False, server_default=func.now()),
+    Index("tasks_archive_assignee_closed_idx", "assignee_id", "closed_at"),
+    Index("tasks_archive_chat_closed_idx", "chat_id", "closed_at"),
+)
+
+
+async def upgrade(conn: AsyncConnection) -> None:
+    # Архив пуст — его индексы создаются вместе с таблицей
+    await conn.run_sync(lambda sync_conn: tasks_archive.create(sync_conn, checkfirst=True))
+    await create_index_concurrently(
+        conn,
+        "tasks_closed_at_idx",
+        "ON tasks (closed_at) WHERE status <> 'open'",
+    )
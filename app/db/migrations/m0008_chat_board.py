@@ -0,0 +1,7 @@
+"""Закреплённая доска задач группового чата."""
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+
+async def upgrade(conn: AsyncConnection) -> None:
+    await conn.execute(text("ALTER TABLE chats ADD COLUMN IF NOT EXISTS board_message_id BIGINT"))
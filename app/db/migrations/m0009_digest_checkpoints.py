@@ -0,0 +1,7 @@
+"""Чекпоинт рассылки дайджестов: за какую дату пользователю уже отправлен дайджест."""
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+
+async def upgrade(conn: AsyncConnection) -> None:
+    await conn.execute(text("ALTER TABLE users ADD COLUMN IF NOT EXISTS digest_sent_on DATE"))
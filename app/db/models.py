@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from datetime import datetime, date
+from datetime import datetime, date, time
 from typing import Optional, List
 
 from sqlalchemy import (
@@ -9,9 +9,12 @@ from sqlalchemy import (
     DateTime,
     ForeignKey,
     Index,
+    Integer,
     String,
     Text,
+    Time,
     func,
+    text as sa_text,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -24,8 +27,19 @@ class User(Base):
     id: Mapped[int] = mapped_column(primary_key=True)
     tg_id: Mapped[Optional[int]] = mapped_column(BigInteger, unique=True, index=True, nullable=True)
     username: Mapped[Optional[str]] = mapped_column(String(255), index=True)
+    # username в нижнем регистре — ключ поиска исполнителя (уникальный индекс)
+    username_lc: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
     first_name: Mapped[Optional[str]] = mapped_column(String(255))
     last_name: Mapped[Optional[str]] = mapped_column(String(255))
+    # Когда Telegram ответил, что писать пользователю нельзя (бот заблокирован и т.п.)
+    unreachable_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    # Часовой пояс (IANA, напр. Europe/Moscow) и время дайджеста; пусто — значения по умолчанию
+    timezone: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    digest_time: Mapped[Optional[time]] = mapped_column(Time, nullable=True)
+    # Когда отправить следующий дайджест (UTC); планировщик берёт тех, у кого время подошло
+    next_digest_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    # Локальная дата последнего отправленного дайджеста — чекпоинт, чтобы после падения посреди рассылки не слать повторно
+    digest_sent_on: Mapped[Optional[date]] = mapped_column(Date, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
     tasks_assigned: Mapped[List["Task"]] = relationship(
@@ -35,6 +49,11 @@ class User(Base):
         back_populates="creator", foreign_keys="Task.creator_id"
     )
 
+    __table_args__ = (
+        Index("users_username_lc_uq", "username_lc", unique=True),
+        Index("users_next_digest_at_idx", "next_digest_at"),
+    )
+
 
 class Chat(Base):
     __tablename__ = "chats"  # 👈 явное имя
@@ -44,6 +63,8 @@ class Chat(Base):
     title: Mapped[Optional[str]] = mapped_column(String(255))
     type: Mapped[Optional[str]] = mapped_column(String(32))
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    # Закреплённое сообщение-доска с открытыми задачами чата (/board)
+    board_message_id: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
 
     tasks: Mapped[List["Task"]] = relationship(back_populates="chat")
 
@@ -75,5 +96,83 @@ class Task(Base):
 
     __table_args__ = (
         Index("tasks_assignee_status_idx", "assignee_id", "status"),
-        
+        # Горячие запросы (представления, дайджест) — только открытые задачи исполнителя
+        Index(
+            "tasks_open_assignee_deadline_idx",
+            "assignee_id",
+            "deadline",
+            "id",
+            postgresql_where=sa_text("status = 'open'"),
+        ),
+        Index("tasks_chat_status_deadline_idx", "chat_id", "status", "deadline"),
+        # Кандидаты в архив
+        Index("tasks_closed_at_idx", "closed_at", postgresql_where=sa_text("status <> 'open'")),
+    )
+
+
+class TaskArchive(Base):
+    """Закрытые задачи, давно вышедшие из оборота: переносятся из tasks фоновым заданием, id сохраняется."""
+    __tablename__ = "tasks_archive"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    chat_id: Mapped[int] = mapped_column(Integer)
+    creator_id: Mapped[int] = mapped_column(Integer)
+    assignee_id: Mapped[int] = mapped_column(Integer)
+    title: Mapped[str] = mapped_column(String(500))
+    description: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    deadline: Mapped[date] = mapped_column(Date)
+    status: Mapped[str] = mapped_column(String(20))
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    closed_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    origin_message_id: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+    archived_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # Выгрузки истории — по исполнителю и по чату
+        Index("tasks_archive_assignee_closed_idx", "assignee_id", "closed_at"),
+        Index("tasks_archive_chat_closed_idx", "chat_id", "closed_at"),
+    )
+
+
+class OutboxMessage(Base):
+    """Уведомление, записанное в той же транзакции, что и изменение задачи."""
+    __tablename__ = "notification_outbox"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    # Telegram id чата-получателя
+    chat_id: Mapped[int] = mapped_column(BigInteger)
+    # Пользователь-получатель (для пометки недоступности), для групп — пусто
+    user_id: Mapped[Optional[int]] = mapped_column(ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    text: Mapped[str] = mapped_column(Text)
+
+    status: Mapped[str] = mapped_column(String(20), default="pending")  # pending/sent/failed
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    sent_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index(
+            "notification_outbox_pending_idx",
+            "next_attempt_at",
+            postgresql_where=sa_text("status = 'pending'"),
+        ),
+    )
+
+
+class TaskReminder(Base):
+    """Напоминание исполнителю о задаче: за offset_minutes до дедлайна."""
+    __tablename__ = "task_reminders"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    task_id: Mapped[int] = mapped_column(ForeignKey("tasks.id", ondelete="CASCADE"), index=True)
+    fire_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    offset_minutes: Mapped[int] = mapped_column(Integer, default=0)
+    sent_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Планировщик читает только ближайшее окно неотправленных напоминаний
+        Index("task_reminders_pending_idx", "fire_at", postgresql_where=sa_text("sent_at IS NULL")),
     )
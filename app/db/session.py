@@ -1,5 +1,355 @@
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from __future__ import annotations
 
-def build_session_maker(database_url: str) -> async_sessionmaker[AsyncSession]:
-    engine = create_async_engine(database_url, echo=False, pool_pre_ping=True)
-    return async_sessionmaker(engine, expire_on_commit=False)
+import asyncio
+import itertools
+import logging
+import math
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Sequence
+from uuid import uuid4
+
+from sqlalchemy import Select, event, exc, make_url, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from app.metrics import DB_REPLICA_LAG_SECONDS, TimedQueuePool, instrument_engine
+
+if TYPE_CHECKING:
+    from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+_ON_COMMIT_KEY = "on_commit_callbacks"
+_REPLICAS_KEY = "replicas"
+_POOL_KEY = "pool_settings"
+_USE_REPLICA_KEY = "use_replica"
+
+# Как часто перепроверять отставание реплик, сек
+REPLICA_CHECK_INTERVAL = 2.0
+
+# Реплика догнала primary (или это обычная БД, не standby) — отставание 0
+_REPLICA_LAG_SQL = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+    """
+)
+
+# "log" — в проде только пишем в лог, "raise" — в проверке бюджетов запросов
+_lazy_load_mode = "log"
+
+
+class LazyLoadError(RuntimeError):
+    """Ленивая загрузка связи под AsyncSession: лишний запрос (N+1) или MissingGreenlet."""
+
+
+@dataclass(frozen=True)
+class PoolSettings:
+    size: int = 5
+    max_overflow: int = 10
+    # Пересоздавать соединения старше стольких секунд (-1 — никогда)
+    recycle: int = 1800
+    # always — пинг на каждый checkout, idle — только если соединение простояло
+    # дольше pre_ping_idle секунд, never — не пинговать
+    pre_ping: str = "idle"
+    pre_ping_idle: float = 30.0
+    # Кэш prepared statements на соединение (asyncpg)
+    statement_cache_size: int = 100
+    # За pgbouncer в режиме transaction: без кэша и с уникальными именами prepared statements
+    pgbouncer: bool = False
+    # Сколько соединений каждого пула открыть при старте
+    warmup: int = 2
+
+    @classmethod
+    def from_config(cls, config: Config) -> "PoolSettings":
+        return cls(
+            size=config.db_pool_size,
+            max_overflow=config.db_max_overflow,
+            recycle=config.db_pool_recycle,
+            pre_ping=config.db_pre_ping,
+            pre_ping_idle=config.db_pre_ping_idle,
+            statement_cache_size=config.db_statement_cache_size,
+            pgbouncer=config.db_pgbouncer,
+            warmup=config.db_pool_warmup,
+        )
+
+
+def _connect_args(url: str, pool: PoolSettings) -> Dict[str, Any]:
+    if make_url(url).get_driver_name() != "asyncpg":
+        return {}
+    if pool.pgbouncer:
+        # Между транзакциями pgbouncer отдаёт другое серверное соединение: закэшированный
+        # prepared statement там не существует, а одинаковые имена конфликтуют
+        return {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        }
+    return {"prepared_statement_cache_size": pool.statement_cache_size}
+
+
+def _ping_idle_connections(engine: AsyncEngine, idle: float) -> None:
+    """Пинг при checkout только для давно простаивавших соединений — свежие отдаются без лишнего запроса."""
+    dialect = engine.sync_engine.dialect
+
+    @event.listens_for(engine.sync_engine, "checkin")
+    def _checkin(dbapi_connection, connection_record) -> None:
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(engine.sync_engine, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy) -> None:
+        checked_in_at = connection_record.info.get("checked_in_at")
+        if checked_in_at is None or time.monotonic() - checked_in_at < idle:
+            return
+        try:
+            dialect.do_ping(dbapi_connection)
+        except Exception as e:
+            # Пул выбросит соединение и повторит checkout с новым
+            raise exc.DisconnectionError(f"Соединение не отвечает: {e}") from e
+
+
+def _create_engine(url: str, pool: PoolSettings, *, name: str) -> AsyncEngine:
+    engine = create_async_engine(
+        url,
+        echo=False,
+        poolclass=TimedQueuePool,
+        pool_size=pool.size,
+        max_overflow=pool.max_overflow,
+        pool_recycle=pool.recycle,
+        pool_pre_ping=pool.pre_ping == "always",
+        connect_args=_connect_args(url, pool),
+    )
+    if pool.pre_ping == "idle":
+        _ping_idle_connections(engine, pool.pre_ping_idle)
+    instrument_engine(engine, name=name)
+    return engine
+
+
+def _url_label(url: Any) -> str:
+    # Без пароля: метка уходит в метрики и логи
+    return f"{url.host}:{url.port or 5432}/{url.database}"
+
+
+def _engine_label(engine: AsyncEngine) -> str:
+    return _url_label(engine.url)
+
+
+class ReplicaSet:
+    """
+    Реплики для чтения. В ротации только те, что отстают от primary не больше
+    `max_lag` секунд; до первой проверки и когда подходящих нет, читаем с primary.
+    """
+
+    def __init__(
+        self,
+        engines: Sequence[AsyncEngine],
+        *,
+        max_lag: float,
+        check_interval: float = REPLICA_CHECK_INTERVAL,
+    ) -> None:
+        self.engines = list(engines)
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._healthy: List[AsyncEngine] = []
+        self._rr = itertools.count()
+
+    @property
+    def stale_window(self) -> float:
+        # Отставание могло вырасти с последней проверки
+        return self.max_lag + self.check_interval
+
+    def pick(self) -> Optional[AsyncEngine]:
+        healthy = self._healthy
+        if not healthy:
+            return None
+        return healthy[next(self._rr) % len(healthy)]
+
+    async def _lag(self, engine: AsyncEngine) -> float:
+        async with engine.connect() as conn:
+            return float((await conn.execute(_REPLICA_LAG_SQL)).scalar_one())
+
+    async def check(self) -> None:
+        healthy = []
+        for engine in self.engines:
+            label = _engine_label(engine)
+            try:
+                lag = await asyncio.wait_for(self._lag(engine), timeout=max(1.0, self.check_interval))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if engine in self._healthy:
+                    logger.warning("Реплика %s недоступна: %s", label, e)
+                lag = math.inf
+            DB_REPLICA_LAG_SECONDS.labels(label).set(lag)
+            if lag <= self.max_lag:
+                healthy.append(engine)
+            elif engine in self._healthy and math.isfinite(lag):
+                logger.warning("Реплика %s отстаёт на %.1f с — читаем с primary", label, lag)
+        self._healthy = healthy
+
+    async def monitor(self) -> None:
+        """Фоновая задача: держит список подходящих реплик актуальным."""
+        while True:
+            await self.check()
+            await asyncio.sleep(self.check_interval)
+
+
+class RoutingSession(Session):
+    """Чтения (SELECT) внутри use_replica() уходят на реплику, всё остальное — на primary."""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        replicas: Optional[ReplicaSet] = self.info.get(_REPLICAS_KEY)
+        if (
+            replicas is not None
+            and self.info.get(_USE_REPLICA_KEY)
+            and not self._flushing
+            and isinstance(clause, Select)
+        ):
+            engine = replicas.pick()
+            if engine is not None:
+                return engine.sync_engine
+        return super().get_bind(mapper, clause=clause, **kw)
+
+
+def build_session_maker(
+    database_url: str,
+    *,
+    replica_urls: Sequence[str] = (),
+    replica_max_lag: float = 5.0,
+    pool: PoolSettings = PoolSettings(),
+) -> async_sessionmaker[AsyncSession]:
+    engine = _create_engine(database_url, pool, name="primary")
+    if not replica_urls:
+        return async_sessionmaker(engine, expire_on_commit=False, info={_POOL_KEY: pool})
+    replicas = ReplicaSet(
+        [_create_engine(url, pool, name=_url_label(make_url(url))) for url in replica_urls],
+        max_lag=replica_max_lag,
+    )
+    return async_sessionmaker(
+        engine,
+        expire_on_commit=False,
+        sync_session_class=RoutingSession,
+        info={_REPLICAS_KEY: replicas, _POOL_KEY: pool},
+    )
+
+
+def pool_stats(engine: AsyncEngine) -> Dict[str, int]:
+    pool = engine.pool
+    if not hasattr(pool, "checkedout"):
+        return {}
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(0, pool.overflow()),
+    }
+
+
+def _all_engines(session_maker: async_sessionmaker[AsyncSession]) -> List[AsyncEngine]:
+    engines = [session_maker.kw["bind"]]
+    replicas = replica_set(session_maker)
+    if replicas is not None:
+        engines.extend(replicas.engines)
+    return engines
+
+
+async def warm_up(session_maker: async_sessionmaker[AsyncSession]) -> None:
+    """
+    Открывает заранее PoolSettings.warmup соединений в каждом пуле, чтобы первый
+    апдейт не ждал TCP/TLS и аутентификацию. Ошибки только логируются.
+    """
+    pool = pool_settings(session_maker)
+    for engine in _all_engines(session_maker):
+        count = min(pool.warmup, pool.size)
+        if count <= 0:
+            continue
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(engine.connect().start() for _ in range(count)),
+            return_exceptions=True,
+        )
+        errors = [r for r in results if isinstance(r, BaseException)]
+        for conn in results:
+            if not isinstance(conn, BaseException):
+                await conn.close()
+        if errors:
+            logger.warning(
+                "Прогрев пула %s: не открылись %s из %s соединений: %s",
+                _engine_label(engine), len(errors), count, errors[0],
+            )
+        logger.info(
+            "Пул %s прогрет за %.0f мс: %s",
+            _engine_label(engine), (time.perf_counter() - started) * 1000, pool_stats(engine),
+        )
+
+
+def pool_settings(session_maker: async_sessionmaker[AsyncSession]) -> PoolSettings:
+    return session_maker.kw.get("info", {}).get(_POOL_KEY, PoolSettings())
+
+
+def replica_set(session_maker: async_sessionmaker[AsyncSession]) -> Optional[ReplicaSet]:
+    return session_maker.kw.get("info", {}).get(_REPLICAS_KEY)
+
+
+@contextmanager
+def use_replica(session: AsyncSession, *, changed_at: Optional[float] = None) -> Iterator[None]:
+    """
+    Чтения внутри блока можно отдать реплике. `changed_at` — time.monotonic()
+    последнего изменения читаемых данных: если оно свежее допустимого отставания,
+    читаем с primary, чтобы пользователь увидел свою запись.
+    """
+    replicas: Optional[ReplicaSet] = session.info.get(_REPLICAS_KEY)
+    allowed = replicas is not None and (
+        changed_at is None or time.monotonic() - changed_at > replicas.stale_window
+    )
+    previous = session.info.get(_USE_REPLICA_KEY, False)
+    session.info[_USE_REPLICA_KEY] = allowed
+    try:
+        yield
+    finally:
+        session.info[_USE_REPLICA_KEY] = previous
+
+
+def on_commit(session: AsyncSession, callback: Callable[[], None]) -> None:
+    """
+    Выполнить `callback` после успешного commit текущей транзакции.
+    При rollback колбэки отбрасываются — так in-process кэши не увидят
+    незакоммиченных данных.
+    """
+    session.info.setdefault(_ON_COMMIT_KEY, []).append(callback)
+
+
+@event.listens_for(Session, "after_commit")
+def _run_on_commit(session: Session) -> None:
+    callbacks = session.info.pop(_ON_COMMIT_KEY, None)
+    for cb in callbacks or ():
+        cb()
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_on_commit(session: Session) -> None:
+    session.info.pop(_ON_COMMIT_KEY, None)
+
+
+def set_lazy_load_mode(mode: str) -> None:
+    global _lazy_load_mode
+    if mode not in {"log", "raise"}:
+        raise ValueError(f"Неизвестный режим: {mode}")
+    _lazy_load_mode = mode
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _report_lazy_load(state: ORMExecuteState) -> None:
+    # Связи нужно грузить явно (join / selectinload / session.get), а не обращением к атрибуту
+    # lazy_loaded_from есть только у SELECT; на ORM INSERT/UPDATE/DELETE обращение к нему падает
+    if not state.is_select or state.lazy_loaded_from is None:
+        return
+    message = f"Ленивая загрузка {state.lazy_loaded_from.mapper.class_.__name__}: {state.loader_strategy_path}"
+    if _lazy_load_mode == "raise":
+        raise LazyLoadError(message)
+    logger.error(message)
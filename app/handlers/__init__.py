@@ -1,5 +1,8 @@
 from .common import router as common_router
 from .tasks import router as tasks_router
+from .settings import router as settings_router
+from .export import router as export_router
+from .board import router as board_router
 
 def setup_routers(dp):
     """
@@ -7,3 +10,6 @@ def setup_routers(dp):
     """
     dp.include_router(common_router)
     dp.include_router(tasks_router)
+    dp.include_router(settings_router)
+    dp.include_router(export_router)
+    dp.include_router(board_router)
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import logging
+
+from aiogram import Router, types, F
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+from aiogram.filters import Command, CommandObject
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import Config
+from app.services.board import board_query, render_board, set_board_message
+from app.services.tasks import GET_CHAT_QUERIES, get_or_create_chat
+from app.utils.timezones import local_today
+
+logger = logging.getLogger(__name__)
+
+router = Router(name="board")
+
+_OFF_WORDS = {"off", "выкл", "стоп"}
+
+
+async def _unpin(message: types.Message, message_id: int) -> None:
+    try:
+        await message.bot.unpin_chat_message(message.chat.id, message_id=message_id)
+    except (TelegramBadRequest, TelegramForbiddenError) as e:
+        logger.info("Не удалось открепить старую доску в чате %s: %s", message.chat.id, e)
+
+
+# Чат, доска и UPDATE chats.board_message_id
+@router.message(
+    Command("board"),
+    F.chat.type.in_({"group", "supergroup"}),
+    flags={"query_budget": GET_CHAT_QUERIES + 2},
+)
+async def board_cmd(message: types.Message, command: CommandObject, session: AsyncSession, config: Config):
+    """Закреплённая доска открытых задач: /board — создать (заново), /board off — убрать."""
+    chat = await get_or_create_chat(session, message.chat)
+    rows = (await session.execute(board_query(chat.id))).all()
+    old_message_id = rows[0].board_message_id if rows else None
+
+    if (command.args or "").strip().lower() in _OFF_WORDS:
+        if old_message_id is None:
+            return await message.reply("Доски в этом чате нет.")
+        await set_board_message(session, chat.id, None)
+        await session.commit()
+        await _unpin(message, old_message_id)
+        return await message.reply("Доска больше не обновляется.")
+
+    board = await message.answer(render_board(rows, local_today(None, config.default_timezone)), parse_mode="HTML")
+    await set_board_message(session, chat.id, board.message_id)
+    await session.commit()
+    if old_message_id is not None:
+        await _unpin(message, old_message_id)
+    try:
+        await message.bot.pin_chat_message(message.chat.id, board.message_id, disable_notification=True)
+    except (TelegramBadRequest, TelegramForbiddenError):
+        await message.reply("Не получилось закрепить доску — дайте боту право закреплять сообщения. Обновляться она будет и так.")
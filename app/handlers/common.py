@@ -6,14 +6,23 @@ from aiogram.filters import CommandStart, Command
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.keyboards import main_menu_kb
-from app.services.tasks import upsert_user_from_tg, get_or_create_chat
+from app.services.tasks import (
+    GET_CHAT_QUERIES,
+    UPSERT_USER_QUERIES,
+    get_or_create_chat,
+    mark_user_reachable,
+    upsert_user_from_tg,
+)
 
 router = Router(name="common")
 
-@router.message(CommandStart(), F.chat.type == "private")
+# + UPDATE unreachable_at
+@router.message(CommandStart(), F.chat.type == "private", flags={"query_budget": UPSERT_USER_QUERIES + 1})
 async def start_private(message: types.Message, session: AsyncSession):
     """Регистрация пользователя и краткая инструкция."""
-    await upsert_user_from_tg(session, message.from_user)
+    user = await upsert_user_from_tg(session, message.from_user)
+    # /start в личке — пользователь снова доступен для рассылок
+    await mark_user_reachable(session, user.id)
     await session.commit()
 
     text = (
@@ -21,18 +30,22 @@ async def start_private(message: types.Message, session: AsyncSession):
         "Я помогаю создавать задачи с дедлайнами прямо в чатах и следить за ними.\n\n"
         "➕ Создать задачу в группе:\n"
         "`/task сделать лендинг до 20.11 @username`\n"
-        "`/task настроить оплату до 2025-11-20 @username`\n\n"
+        "`/task настроить оплату до 2025-11-20 @username`\n"
+        "`/task отчёт до 20.11 @username напомнить 2h 30m` — свои напоминания\n"
+        "Много задач сразу — по одной на строку после `/task` или CSV-файл с подписью `/task`\n\n"
         "📋 Смотреть задачи (в ЛС):\n"
         "`/my` — все открытые\n"
         "`/today` — на сегодня\n"
         "`/week` — на 7 дней вперёд\n"
         "`/overdue` — просроченные\n\n"
-        "✅ Отметить выполненной: `/done 123`\n\n"
+        "✅ Отметить выполненной: `/done 123` или сразу несколько: `/done 12 15 20-25`\n\n"
+        "🕘 Дайджест: `/tz Europe/Moscow` — часовой пояс, `/digest 08:30` — время\n\n"
+        "📤 Выгрузка: `/export csv` или `/export ics` — в ЛС свои задачи, в группе — все задачи чата\n\n"
         "_Важно_: напишите мне `/start`, чтобы я мог присылать личные уведомления."
     )
     await message.answer(text, reply_markup=main_menu_kb(), parse_mode="HTML")
 
-@router.message(CommandStart(), F.chat.type.in_({"group", "supergroup"}))
+@router.message(CommandStart(), F.chat.type.in_({"group", "supergroup"}), flags={"query_budget": GET_CHAT_QUERIES})
 async def start_group(message: types.Message, session: AsyncSession):
     """Регистрация группового чата."""
     await get_or_create_chat(session, message.chat)
@@ -41,16 +54,20 @@ async def start_group(message: types.Message, session: AsyncSession):
         "Привет! Я здесь, чтобы помогать со сроками.\n\n"
         "Создайте задачу так:\n"
         "`/task сделать лендинг до 20.11 @username`\n\n"
+        "Доска открытых задач чата, которая обновляется сама: `/board`\n\n"
         "Чтобы получать личные уведомления — участники должны написать мне `/start` в ЛС."
     )
     await message.reply(text, parse_mode="HTML")
 
-@router.message(Command("help"))
+@router.message(Command("help"), flags={"query_budget": 0})
 async def help_cmd(message: types.Message):
     await message.answer(
         "Справка по командам:\n"
         "/task <что> до <дата> @username — создать задачу в чате\n"
         "/my, /today, /week, /overdue — смотреть задачи (в ЛС)\n"
-        "/done <id> — отметить задачу выполненной",
+        "/done 12 15 20-25 — отметить задачи выполненными\n"
+        "/tz Europe/Moscow, /digest 08:30 — часовой пояс и время дайджеста\n"
+        "/export csv, /export ics — выгрузить задачи файлом\n"
+        "/board — закреплённая доска открытых задач группы (/board off — убрать)",
         parse_mode="HTML",
     )
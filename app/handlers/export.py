@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+from typing import Optional, Set, Tuple
+
+from aiogram import Router, types, F
+from aiogram.filters import Command, CommandObject
+from aiogram.types import FSInputFile
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import use_replica
+from app.services.export import EXPORT_FORMATS, EXPORT_QUERIES, ExportTooLarge, export_tasks
+from app.services.identity import user_cache
+from app.services.tasks import GET_CHAT_QUERIES, UPSERT_USER_QUERIES, get_or_create_chat, upsert_user_from_tg
+from app.services.view_cache import last_change
+
+router = Router(name="export")
+
+_USAGE = "Формат: /export csv (все задачи, с закрытыми) или /export ics (открытые — для календаря)."
+
+# Выгрузка тяжёлая — одновременно не больше одной на пользователя и на чат
+_running: Set[Tuple[str, int]] = set()
+
+
+def _parse_format(command: CommandObject) -> str | None:
+    fmt = (command.args or "csv").strip().lower().lstrip(".")
+    return fmt if fmt in EXPORT_FORMATS else None
+
+
+async def _send_export(
+    message: types.Message, session: AsyncSession, fmt: str, *, changed_at: Optional[float], **scope
+) -> None:
+    with use_replica(session, changed_at=changed_at):
+        try:
+            export = await export_tasks(session, fmt, **scope)
+        except ExportTooLarge as e:
+            await message.reply(f"❌ {e}. Попробуйте /export ics — только открытые задачи.")
+            return
+    # Транзакция чтения больше не нужна — не держим соединение, пока файл уходит в Telegram
+    await session.commit()
+    try:
+        if not export.rows:
+            await message.reply("Задач для выгрузки нет.")
+            return
+        await message.reply_document(
+            FSInputFile(export.path, filename=export.filename),
+            caption=f"Задач в выгрузке: {export.rows}",
+        )
+    finally:
+        export.remove()
+
+
+@router.message(
+    Command("export"),
+    F.chat.type == "private",
+    flags={"query_budget": UPSERT_USER_QUERIES + EXPORT_QUERIES},
+)
+async def export_private(message: types.Message, command: CommandObject, session: AsyncSession):
+    """Свои задачи (как исполнителя): /export csv | /export ics."""
+    fmt = _parse_format(command)
+    if fmt is None:
+        return await message.answer(_USAGE)
+    key = ("user", message.from_user.id)
+    if key in _running:
+        return await message.answer("Выгрузка уже готовится, подождите.")
+    _running.add(key)
+    try:
+        user = await upsert_user_from_tg(session, message.from_user)
+        await session.commit()
+        await _send_export(
+            message, session, fmt, changed_at=last_change(user.id), assignee_id=user.id, name="my-tasks",
+        )
+    finally:
+        _running.discard(key)
+
+
+@router.message(
+    Command("export"),
+    F.chat.type.in_({"group", "supergroup"}),
+    flags={"query_budget": GET_CHAT_QUERIES + EXPORT_QUERIES},
+)
+async def export_group(message: types.Message, command: CommandObject, session: AsyncSession):
+    """Все задачи группового чата: /export csv | /export ics."""
+    fmt = _parse_format(command)
+    if fmt is None:
+        return await message.reply(_USAGE)
+    key = ("chat", message.chat.id)
+    if key in _running:
+        return await message.reply("Выгрузка уже готовится, подождите.")
+    _running.add(key)
+    try:
+        chat = await get_or_create_chat(session, message.chat)
+        await session.commit()
+        # Свои свежие изменения автор команды увидит: читаем с primary, если они были только что
+        cached = user_cache.get(message.from_user.id)
+        await _send_export(
+            message,
+            session,
+            fmt,
+            changed_at=last_change(cached.id) if cached is not None else None,
+            chat_id=chat.id,
+            name=f"chat-{abs(message.chat.id)}",
+        )
+    finally:
+        _running.discard(key)
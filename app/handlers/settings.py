@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import re
+from datetime import datetime, time, timezone
+
+from aiogram import Router, types, F
+from aiogram.filters import Command, CommandObject
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import Config
+from app.db.models import User
+from app.services.tasks import UPSERT_USER_QUERIES, update_digest_settings, upsert_user_from_tg
+from app.utils.timezones import is_valid_timezone, next_occurrence, resolve_timezone
+
+router = Router(name="settings")
+
+_TIME_RE = re.compile(r"^(?P<h>\d{1,2})[:.](?P<m>\d{2})$")
+
+# Пользователь, текущие настройки и UPDATE
+SETTINGS_QUERY_BUDGET = UPSERT_USER_QUERIES + 2
+
+
+async def _current_settings(session: AsyncSession, user_id: int) -> tuple[str | None, time | None]:
+    q = await session.execute(select(User.timezone, User.digest_time).where(User.id == user_id))
+    tz_name, digest_time = q.one()
+    return tz_name, digest_time
+
+
+@router.message(Command("tz"), F.chat.type == "private", flags={"query_budget": SETTINGS_QUERY_BUDGET})
+async def tz_cmd(message: types.Message, command: CommandObject, session: AsyncSession, config: Config):
+    """Часовой пояс пользователя: /tz Europe/Moscow."""
+    user = await upsert_user_from_tg(session, message.from_user)
+    tz_name, digest_time = await _current_settings(session, user.id)
+
+    arg = (command.args or "").strip()
+    if not arg:
+        return await message.answer(
+            f"Твой часовой пояс: {tz_name or config.default_timezone}\n"
+            "Сменить: /tz Europe/Moscow (названия из базы IANA)"
+        )
+    if not is_valid_timezone(arg):
+        return await message.answer("❌ Не знаю такого часового пояса. Пример: /tz Asia/Yekaterinburg")
+
+    next_at = next_occurrence(
+        datetime.now(timezone.utc),
+        resolve_timezone(arg, config.default_timezone),
+        digest_time or time(hour=config.daily_digest_hour),
+    )
+    await update_digest_settings(session, user, tz_name=arg, digest_time=digest_time, next_digest_at=next_at)
+    await session.commit()
+    await message.answer(f"✅ Часовой пояс: {arg}")
+
+
+@router.message(Command("digest"), F.chat.type == "private", flags={"query_budget": SETTINGS_QUERY_BUDGET})
+async def digest_time_cmd(message: types.Message, command: CommandObject, session: AsyncSession, config: Config):
+    """Время ежедневного дайджеста: /digest 08:30."""
+    user = await upsert_user_from_tg(session, message.from_user)
+    tz_name, digest_time = await _current_settings(session, user.id)
+
+    arg = (command.args or "").strip()
+    current = digest_time or time(hour=config.daily_digest_hour)
+    if not arg:
+        return await message.answer(
+            f"Дайджест приходит в {current.strftime('%H:%M')} ({tz_name or config.default_timezone}).\n"
+            "Сменить: /digest 08:30"
+        )
+    m = _TIME_RE.match(arg)
+    if not m or int(m["h"]) > 23 or int(m["m"]) > 59:
+        return await message.answer("❌ Время в формате ЧЧ:ММ, например /digest 08:30")
+
+    new_time = time(hour=int(m["h"]), minute=int(m["m"]))
+    next_at = next_occurrence(
+        datetime.now(timezone.utc),
+        resolve_timezone(tz_name, config.default_timezone),
+        new_time,
+    )
+    await update_digest_settings(session, user, tz_name=tz_name, digest_time=new_time, next_digest_at=next_at)
+    await session.commit()
+    await message.answer(f"✅ Дайджест будет приходить в {new_time.strftime('%H:%M')}")
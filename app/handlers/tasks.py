@@ -1,37 +1,141 @@
 from __future__ import annotations
 
-from datetime import date, timedelta
-from typing import List
+import html
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Tuple
 
 from aiogram import Router, types, F
 from aiogram.filters import Command
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 
 from app.config import Config
-from app.db.models import Task, Chat
+from app.keyboards import TaskPageCb, task_page_kb
+from app.db.session import use_replica
 from app.services.tasks import (
     upsert_user_from_tg,
     get_or_create_chat,
     get_or_stub_user_by_username,
     create_task,
-    fetch_open_tasks_for_user,
-    fetch_tasks_today,
-    fetch_tasks_week,
-    fetch_tasks_overdue,
-    mark_task_done,
+    create_tasks_bulk,
+    Assignee,
+    fetch_task_view,
+    close_tasks,
+    TaskPage,
+    TaskRow,
+    TASK_VIEWS,
+    ViewCursor,
+    BULK_CREATE_QUERIES,
+    CREATE_TASK_QUERIES,
+    GET_CHAT_QUERIES,
+    MAX_BULK_TASKS,
+    CLOSE_TASKS_QUERIES,
+    STUB_USER_QUERIES,
+    UPSERT_USER_QUERIES,
 )
-from app.utils.parsing import parse_task_command, ParseError
+from app.services.identity import user_cache, user_profile
+from app.services.outbox import enqueue_notification, wake_dispatcher
+from app.services.view_cache import current_version, get_view, last_change, put_view
+from app.services.reminders import cancel_reminders, deadline_moment, reminder_rows, schedule_reminders
+from app.utils.parsing import (
+    TaskCommand,
+    ParseError,
+    parse_task_command,
+    parse_task_csv,
+    parse_task_ids,
+    parse_task_lines,
+)
+from app.utils.timezones import local_today
 
 router = Router(name="tasks")
 
-def _fmt_task_line(task: Task, chat_title: str | None) -> str:
-    d = task.deadline.strftime("%d.%m.%Y")
-    chat_part = f", чат: {chat_title}" if chat_title else ""
-    return f"#{task.id} — {task.title} (до {d}{chat_part})"
+# CSV больше этого не скачиваем (Bot API отдаёт файлы до 20 МБ, но столько задач нам не нужно)
+BULK_FILE_MAX_BYTES = 2 * 1024 * 1024
+_BULK_ERRORS_SHOWN = 10
+_BULK_NOTIFY_SHOWN = 20
 
 
-@router.message(Command("task"), F.chat.type.in_({"group", "supergroup"}))
+def _decode_csv(raw: bytes) -> str:
+    try:
+        return raw.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        # Excel в русской локали сохраняет CSV в cp1251
+        return raw.decode("cp1251")
+
+
+def _bulk_notice(chat_title: str | None, tasks: List[Tuple[int, TaskCommand]]) -> str:
+    lines = [f"Тебе назначено задач: {len(tasks)}" + (f" в «{html.escape(chat_title)}»" if chat_title else "")]
+    for task_id, item in tasks[:_BULK_NOTIFY_SHOWN]:
+        lines.append(f"#{task_id} — {html.escape(item.title)} (к {item.deadline.strftime('%d.%m.%Y')})")
+    if len(tasks) > _BULK_NOTIFY_SHOWN:
+        lines.append(f"…и ещё {len(tasks) - _BULK_NOTIFY_SHOWN}")
+    return "\n".join(lines)
+
+
+# Пакетный режим: много строк '... до <дата> @user' в одном /task или CSV-файл с подписью /task.
+# Бюджет — на пачку до 1000 строк; плюс INSERT напоминаний и outbox
+@router.message(
+    Command("task"),
+    F.chat.type.in_({"group", "supergroup"}),
+    F.document | F.text.contains("\n"),
+    flags={"query_budget": UPSERT_USER_QUERIES + GET_CHAT_QUERIES + BULK_CREATE_QUERIES + 2},
+)
+async def task_bulk_group(message: types.Message, session: AsyncSession, config: Config):
+    """Создание многих задач одним сообщением: один IN по исполнителям и один INSERT ... RETURNING."""
+    if message.document is not None:
+        document = message.document
+        if not (document.file_name or "").lower().endswith(".csv"):
+            return await message.reply("❌ Пришлите таблицу в формате .csv: что, дедлайн, исполнитель[, напоминания]")
+        if (document.file_size or 0) > BULK_FILE_MAX_BYTES:
+            return await message.reply(f"❌ Файл больше {BULK_FILE_MAX_BYTES // (1024 * 1024)} МБ")
+        buffer = await message.bot.download(document)
+        parsed = parse_task_csv(_decode_csv(buffer.read()))
+    else:
+        parsed = parse_task_lines(message.text or "")
+
+    if len(parsed.items) > MAX_BULK_TASKS:
+        return await message.reply(f"❌ Не больше {MAX_BULK_TASKS} задач за раз, в сообщении — {len(parsed.items)}")
+
+    created = []
+    if parsed.items:
+        creator = await upsert_user_from_tg(session, message.from_user)
+        chat = await get_or_create_chat(session, message.chat)
+        created = await create_tasks_bulk(
+            session, chat=chat, creator=creator, items=parsed.items, origin_message_id=message.message_id,
+        )
+
+        now = datetime.now(timezone.utc)
+        reminders = []
+        by_assignee: Dict[Assignee, List[Tuple[int, TaskCommand]]] = defaultdict(list)
+        for task_id, item, assignee in created:
+            deadline_at = deadline_moment(item.deadline, assignee.timezone or config.default_timezone, config.deadline_time)
+            offsets = item.reminders if item.reminders is not None else config.reminder_offsets
+            reminders.extend(reminder_rows(task_id, deadline_at, offsets, now))
+            if assignee.tg_id:
+                by_assignee[assignee].append((task_id, item))
+        await schedule_reminders(session, reminders)
+
+        # Одно сообщение на исполнителя, а не на каждую задачу
+        for assignee, tasks in by_assignee.items():
+            enqueue_notification(session, assignee.tg_id, _bulk_notice(chat.title, tasks), user_id=assignee.id)
+        await session.commit()
+        wake_dispatcher()
+
+    lines = [f"✅ Создано задач: {len(created)}, исполнителей: {len({a.id for _, _, a in created})}"]
+    if parsed.errors:
+        lines.append(f"⚠️ Пропущено строк: {len(parsed.errors)}")
+        lines.extend(f"строка {line_no}: {error}" for line_no, error in parsed.errors[:_BULK_ERRORS_SHOWN])
+        if len(parsed.errors) > _BULK_ERRORS_SHOWN:
+            lines.append(f"…и ещё {len(parsed.errors) - _BULK_ERRORS_SHOWN}")
+    await message.reply("\n".join(lines), parse_mode=None)
+
+
+# Плюс INSERT напоминаний и outbox
+@router.message(
+    Command("task"),
+    F.chat.type.in_({"group", "supergroup"}),
+    flags={"query_budget": UPSERT_USER_QUERIES + GET_CHAT_QUERIES + STUB_USER_QUERIES + CREATE_TASK_QUERIES + 2},
+)
 async def task_create_group(message: types.Message, session: AsyncSession, config: Config):
     """Создание задачи из группового чата."""
     raw = message.text or message.caption or ""
@@ -59,10 +163,30 @@ async def task_create_group(message: types.Message, session: AsyncSession, confi
         deadline=data.deadline,
         origin_message_id=message.message_id,
     )
+    deadline_str = data.deadline.strftime("%d.%m.%Y")
+
+    # Напоминания исполнителю (по умолчанию или из 'напомнить ...')
+    deadline_at = deadline_moment(data.deadline, assignee.timezone or config.default_timezone, config.deadline_time)
+    await schedule_reminders(session, reminder_rows(
+        task.id,
+        deadline_at,
+        data.reminders if data.reminders is not None else config.reminder_offsets,
+        datetime.now(timezone.utc),
+    ))
+
+    # ЛС исполнителю (если он писал /start и у нас есть tg_id) — через outbox,
+    # в той же транзакции, что и сама задача
+    if assignee.tg_id:
+        enqueue_notification(
+            session,
+            assignee.tg_id,
+            f"Тебе назначена задача #{task.id}: «{task.title}» к {deadline_str}.",
+            user_id=assignee.id,
+        )
     await session.commit()
+    wake_dispatcher()
 
     # Ответ в чат
-    deadline_str = data.deadline.strftime("%d.%m.%Y")
     resp = (
         f"✅ Задача #{task.id} создана\n"
         f"<b>Что:</b> {task.title}\n"
@@ -71,17 +195,6 @@ async def task_create_group(message: types.Message, session: AsyncSession, confi
     )
     await message.reply(resp, parse_mode="HTML")
 
-    # ЛС исполнителю (если он писал /start и у нас есть tg_id)
-    if assignee.tg_id:
-        try:
-            await message.bot.send_message(
-                assignee.tg_id,
-                f"Тебе назначена задача #{task.id}: «{task.title}» к {deadline_str}.",
-            )
-        except Exception:
-            # Например, бот в бане у пользователя — не фейлимся
-            pass
-
 
 # --- Личные команды просмотра ---
 
@@ -92,103 +205,176 @@ async def _ensure_user(session: AsyncSession, tg_user: types.User):
     return user
 
 
-@router.message(Command("my"), F.chat.type == "private")
-async def my_tasks(message: types.Message, session: AsyncSession):
-    user = await _ensure_user(session, message.from_user)
-    tasks = await fetch_open_tasks_for_user(session, user)
-
-    if not tasks:
-        return await message.answer("У тебя нет открытых задач.")
-
-    # Подтягиваем названия чатов
-    chat_ids = sorted({t.chat_id for t in tasks})
-    from sqlalchemy import select
-    q = await session.execute(select(Chat).where(Chat.id.in_(chat_ids)))
-    chats_map = {c.id: c.title for c in q.scalars().all()}
-
-    lines = ["Твои задачи:"]
-    for t in tasks:
-        lines.append(_fmt_task_line(t, chats_map.get(t.chat_id)))
-    await message.answer("\n".join(lines))
-
-
-@router.message(Command("today"), F.chat.type == "private")
-async def today_tasks(message: types.Message, session: AsyncSession):
-    user = await _ensure_user(session, message.from_user)
-    tasks = await fetch_tasks_today(session, user, date.today())
-    if not tasks:
-        return await message.answer("На сегодня задач нет.")
-    chat_ids = sorted({t.chat_id for t in tasks})
-    q = await session.execute(select(Chat).where(Chat.id.in_(chat_ids)))
-    chats_map = {c.id: c.title for c in q.scalars().all()}
-
-    lines = ["Задачи на сегодня:"]
-    for t in tasks:
-        lines.append(_fmt_task_line(t, chats_map.get(t.chat_id)))
-    await message.answer("\n".join(lines))
+_VIEW_HEADERS = {
+    "my": "Твои задачи:",
+    "today": "Задачи на сегодня:",
+    "week": "Задачи на неделю:",
+    "overdue": "Просроченные задачи:",
+}
+_VIEW_EMPTY = {
+    "my": "У тебя нет открытых задач.",
+    "today": "На сегодня задач нет.",
+    "week": "На ближайшую неделю задач нет.",
+    "overdue": "Просроченных задач нет 🎉",
+}
+# Сообщение Telegram ограничено 4096 символами — режем длинные названия
+_TITLE_MAX = 100
+_CHAT_TITLE_MAX = 40
+
+
+def _short(text: str | None, limit: int) -> str | None:
+    if text is None or len(text) <= limit:
+        return text
+    return text[: limit - 1] + "…"
+
+
+def _fmt_row(view: str, row: TaskRow) -> str:
+    d = row.deadline.strftime("%d.%m.%Y")
+    title = _short(row.title, _TITLE_MAX)
+    chat_title = _short(row.chat_title, _CHAT_TITLE_MAX)
+    if view == "overdue":
+        return f"#{row.id} — {title} (дедлайн: {d}, чат: {chat_title})"
+    chat_part = f", чат: {chat_title}" if chat_title else ""
+    return f"#{row.id} — {title} (до {d}{chat_part})"
+
+
+def _render_page(page: TaskPage) -> tuple[str, types.InlineKeyboardMarkup | None]:
+    lines = [_VIEW_HEADERS[page.view]]
+    lines.extend(_fmt_row(page.view, r) for r in page.rows)
+    first, last = page.first, page.last
+    kb = task_page_kb(
+        page.view,
+        (first.deadline.toordinal(), first.id) if first else None,
+        (last.deadline.toordinal(), last.id) if last else None,
+        page.has_prev,
+        page.has_next,
+    )
+    return "\n".join(lines), kb
 
 
-@router.message(Command("week"), F.chat.type == "private")
-async def week_tasks(message: types.Message, session: AsyncSession):
-    user = await _ensure_user(session, message.from_user)
-    tasks = await fetch_tasks_week(session, user, date.today())
-    if not tasks:
-        return await message.answer("На ближайшую неделю задач нет.")
-    chat_ids = sorted({t.chat_id for t in tasks})
-    q = await session.execute(select(Chat).where(Chat.id.in_(chat_ids)))
-    chats_map = {c.id: c.title for c in q.scalars().all()}
+# Пользователь и одна страница представления
+VIEW_QUERY_BUDGET = UPSERT_USER_QUERIES + 1
 
-    lines = ["Задачи на неделю:"]
-    for t in tasks:
-        lines.append(_fmt_task_line(t, chats_map.get(t.chat_id)))
-    await message.answer("\n".join(lines))
 
+async def _send_view(message: types.Message, session: AsyncSession, config: Config, view: str):
+    # Повторное нажатие кнопки: пользователь и страница уже в памяти — в БД не ходим
+    cached_user = user_cache.get(message.from_user.id)
+    if cached_user is not None and cached_user.profile == user_profile(message.from_user):
+        today = local_today(cached_user.timezone, config.default_timezone)
+        cached = get_view(cached_user.id, view, today)
+        if cached is not None:
+            return await message.answer(cached.text, reply_markup=cached.markup)
 
-@router.message(Command("overdue"), F.chat.type == "private")
-async def overdue_tasks(message: types.Message, session: AsyncSession):
     user = await _ensure_user(session, message.from_user)
-    tasks = await fetch_tasks_overdue(session, user, date.today())
-    if not tasks:
-        return await message.answer("Просроченных задач нет 🎉")
-    chat_ids = sorted({t.chat_id for t in tasks})
-    q = await session.execute(select(Chat).where(Chat.id.in_(chat_ids)))
-    chats_map = {c.id: c.title for c in q.scalars().all()}
-
-    lines = ["Просроченные задачи:"]
-    for t in tasks:
-        d = t.deadline.strftime("%d.%m.%Y")
-        lines.append(f"#{t.id} — {t.title} (дедлайн: {d}, чат: {chats_map.get(t.chat_id)})")
-    await message.answer("\n".join(lines))
+    today = local_today(user.timezone, config.default_timezone)
+    # Версию берём до запроса: если задачи поменяются параллельно, запись сразу устареет
+    version = current_version(user.id)
+    # Только чтение — можно с реплики, если задачи пользователя не менялись только что
+    with use_replica(session, changed_at=last_change(user.id)):
+        page = await fetch_task_view(session, user.id, view, today)
+    if page.rows:
+        text, kb = _render_page(page)
+    else:
+        text, kb = _VIEW_EMPTY[view], None
+    put_view(user.id, view, today, version, text, kb)
+    await message.answer(text, reply_markup=kb)
+
+
+@router.message(Command("my"), F.chat.type == "private", flags={"query_budget": VIEW_QUERY_BUDGET})
+async def my_tasks(message: types.Message, session: AsyncSession, config: Config):
+    await _send_view(message, session, config, "my")
+
+
+@router.message(Command("today"), F.chat.type == "private", flags={"query_budget": VIEW_QUERY_BUDGET})
+async def today_tasks(message: types.Message, session: AsyncSession, config: Config):
+    await _send_view(message, session, config, "today")
+
+
+@router.message(Command("week"), F.chat.type == "private", flags={"query_budget": VIEW_QUERY_BUDGET})
+async def week_tasks(message: types.Message, session: AsyncSession, config: Config):
+    await _send_view(message, session, config, "week")
+
+
+@router.message(Command("overdue"), F.chat.type == "private", flags={"query_budget": VIEW_QUERY_BUDGET})
+async def overdue_tasks(message: types.Message, session: AsyncSession, config: Config):
+    await _send_view(message, session, config, "overdue")
+
+
+@router.callback_query(TaskPageCb.filter(F.view.in_(TASK_VIEWS)), flags={"query_budget": VIEW_QUERY_BUDGET})
+async def task_page_nav(
+    callback: types.CallbackQuery,
+    callback_data: TaskPageCb,
+    session: AsyncSession,
+    config: Config,
+):
+    """Листание страниц: редактируем то же сообщение."""
+    user = await _ensure_user(session, callback.from_user)
+    cursor = ViewCursor(date.fromordinal(callback_data.day), callback_data.task_id)
+    with use_replica(session, changed_at=last_change(user.id)):
+        page = await fetch_task_view(
+            session,
+            user.id,
+            callback_data.view,
+            local_today(user.timezone, config.default_timezone),
+            after=cursor if callback_data.dir == "next" else None,
+            before=cursor if callback_data.dir == "prev" else None,
+        )
+    if not page.rows:
+        await callback.answer("Больше задач нет")
+        return
+    text, kb = _render_page(page)
+    if isinstance(callback.message, types.Message):
+        await callback.message.edit_text(text, reply_markup=kb)
+    await callback.answer()
 
 
 # --- Закрытие задачи ---
 
-@router.message(Command("done"))
+# Отмена напоминаний и outbox
+@router.message(Command("done"), flags={"query_budget": UPSERT_USER_QUERIES + CLOSE_TASKS_QUERIES + 2})
 async def done_cmd(message: types.Message, session: AsyncSession, config: Config):
+    """Закрытие задач: /done 12, /done 12 15 19, /done 20-25."""
     raw = (message.text or "").strip()
     parts = raw.split(maxsplit=1)
     if len(parts) < 2:
-        return await message.reply("Использование: `/done <id>`", parse_mode="HTML")
+        return await message.reply("Использование: `/done <id>` или `/done 12 15 20-25`", parse_mode="HTML")
     try:
-        task_id = int(parts[1].strip())
-    except ValueError:
-        return await message.reply("ID должен быть числом.", parse_mode="HTML")
+        task_ids = parse_task_ids(parts[1])
+    except ParseError as e:
+        return await message.reply(f"❌ {e}", parse_mode="HTML")
 
     closer = await upsert_user_from_tg(session, message.from_user)
-    task, result = await mark_task_done(session, task_id=task_id, closer=closer, allow_creator_close=True)
-    if result != "ok":
+    result = await close_tasks(session, task_ids=task_ids, closer_id=closer.id, allow_creator_close=True)
+    if not result.closed:
         await session.rollback()
-        return await message.reply(f"❌ {result}")
-
+        if len(task_ids) == 1:
+            return await message.reply(f"❌ {result.failed[task_ids[0]]}")
+        return await message.reply("❌ Ни одна задача не закрыта:\n" + _fmt_failed(result.failed))
+    await cancel_reminders(session, [t.id for t in result.closed])
+
+    # Уведомление в исходные чаты (опционально) — через outbox, по сообщению на чат;
+    # в чатах с доской (/board) закрытие видно на ней, отдельное сообщение не пишем
+    if config.notify_done_in_chat:
+        by_chat: Dict[int, List[int]] = defaultdict(list)
+        for t in result.closed:
+            if t.board_message_id is None:
+                by_chat[t.tg_chat_id].append(t.id)
+        who = f"@{closer.username or closer.tg_id}"
+        for tg_chat_id, ids in by_chat.items():
+            numbers = ", ".join(f"#{i}" for i in ids)
+            text = f"✅ Задача {numbers} выполнена {who}" if len(ids) == 1 else f"✅ Задачи {numbers} выполнены {who}"
+            enqueue_notification(session, tg_chat_id, text)
     await session.commit()
-    await message.reply(f"✅ Задача #{task.id} отмечена как выполненная")
-
-    # Уведомление в исходный чат (опционально)
-    if config.notify_done_in_chat and task and task.chat:
-        try:
-            await message.bot.send_message(
-                task.chat.tg_chat_id,
-                f"✅ Задача #{task.id} выполнена @{closer.username or closer.tg_id}",
-            )
-        except Exception:
-            pass
+    wake_dispatcher()
+
+    if len(task_ids) == 1:
+        return await message.reply(f"✅ Задача #{result.closed[0].id} отмечена как выполненная")
+    lines = [f"✅ Закрыто: {', '.join(f'#{t.id}' for t in result.closed)}"]
+    if result.failed:
+        lines.append("❌ Не закрыто:")
+        lines.append(_fmt_failed(result.failed))
+    await message.reply("\n".join(lines))
+
+
+def _fmt_failed(failed: Dict[int, str]) -> str:
+    return "\n".join(f"#{task_id}: {reason}" for task_id, reason in sorted(failed.items()))
@@ -1,4 +1,12 @@
-from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
+from __future__ import annotations
+
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import (
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    KeyboardButton,
+    ReplyKeyboardMarkup,
+)
 
 def main_menu_kb() -> ReplyKeyboardMarkup:
     # Небольшая «клава» с быстрыми командами
@@ -10,3 +18,29 @@ def main_menu_kb() -> ReplyKeyboardMarkup:
         resize_keyboard=True,
         input_field_placeholder="Быстрые команды",
     )
+
+
+class TaskPageCb(CallbackData, prefix="tp"):
+    """Листание списка задач: направление и ключ (deadline, id) крайней задачи страницы."""
+    view: str
+    dir: str  # "next" / "prev"
+    day: int  # date.toordinal() дедлайна
+    task_id: int
+
+
+def task_page_kb(view: str, first: tuple[int, int] | None, last: tuple[int, int] | None,
+                 has_prev: bool, has_next: bool) -> InlineKeyboardMarkup | None:
+    buttons = []
+    if has_prev and first is not None:
+        buttons.append(InlineKeyboardButton(
+            text="◀️ Назад",
+            callback_data=TaskPageCb(view=view, dir="prev", day=first[0], task_id=first[1]).pack(),
+        ))
+    if has_next and last is not None:
+        buttons.append(InlineKeyboardButton(
+            text="Дальше ▶️",
+            callback_data=TaskPageCb(view=view, dir="next", day=last[0], task_id=last[1]).pack(),
+        ))
+    if not buttons:
+        return None
+    return InlineKeyboardMarkup(inline_keyboard=[buttons])
@@ -1,39 +1,55 @@
 from __future__ import annotations
 
+import time
+
+# Отсюда считается время импортов в отчёте о старте (app.startup)
+_IMPORT_STARTED = time.perf_counter()
+
 import asyncio
 import logging
 
-from aiogram import Bot, Dispatcher
-from aiogram.client.default import DefaultBotProperties
-
-from app.config import load_config
-from app.db.session import build_session_maker
-from app.handlers import setup_routers
-from app.middlewares import ConfigMiddleware, DbSessionMiddleware
+from app.bot import build_bot, build_dispatcher
+from app.config import Config, load_config
+from app.db.session import PoolSettings, build_session_maker
+from app.metrics import start_metrics_server
+from app.services.identity import configure_identity_cache
+from app.services.view_cache import configure_view_cache
+from app.startup import begin_startup
 from app.utils.logging import setup_logging
 
 
-async def main() -> None:
-    config = load_config()
-    setup_logging(config.log_level)
+async def main(config: Config) -> None:
+    session_maker = build_session_maker(
+        config.database_url,
+        replica_urls=config.database_replica_urls,
+        replica_max_lag=config.replica_max_lag,
+        pool=PoolSettings.from_config(config),
+    )
+    configure_identity_cache(maxsize=config.identity_cache_size, ttl=config.identity_cache_ttl)
+    configure_view_cache(maxsize=config.view_cache_size, ttl=config.view_cache_ttl)
+    start_metrics_server(config.metrics_host, config.metrics_port)
+
+    bot = build_bot(config)
+    dp = build_dispatcher(config, session_maker)
 
-    logging.getLogger(__name__).info("Старт бота 'Мастер дедлайнов'")
+    # Запускаем polling
+    await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
 
-    session_maker = build_session_maker(config.database_url)
 
-    bot = Bot(token=config.bot_token, default=DefaultBotProperties(parse_mode="HTML"))
-    dp = Dispatcher()
+def run() -> None:
+    config = load_config()
+    setup_logging(config.log_level)
+    begin_startup("bot", _IMPORT_STARTED)
 
-    # Подключаем роутеры
-    setup_routers(dp)
+    logging.getLogger(__name__).info("Старт бота 'Мастер дедлайнов' (%s)", config.run_mode)
 
-    # Миддлвары для всех апдейтов
-    dp.update.middleware(ConfigMiddleware(config))
-    dp.update.middleware(DbSessionMiddleware(session_maker))
+    if config.run_mode == "webhook":
+        from app.webhook import run_webhook
 
-    # Запускаем polling
-    await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+        run_webhook(config)
+    else:
+        asyncio.run(main(config))
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run()
@@ -0,0 +1,162 @@
+"""
+Метрики Prometheus: время старта, длительность хендлеров, очередь апдейтов, стоимость апдейта
+в SQL, ожидание соединения из пула, задержки Bot API и прогоны дайджестов.
+
+Стоимость апдейта копится в `UpdateCost` из contextvar: MetricsMiddleware
+создаёт его на апдейт, а события движка SQLAlchemy дописывают туда запросы.
+"""
+from __future__ import annotations
+
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+STARTUP_SECONDS = Gauge(
+    "startup_seconds",
+    "Холодный старт по фазам: imports, mappers, pool, statements, ready (всего до готовности), first_update",
+    ["process", "phase"],
+)
+HANDLER_SECONDS = Histogram(
+    "bot_handler_duration_seconds",
+    "Время обработки апдейта, по хендлеру",
+    ["handler", "status"],
+    buckets=_LATENCY_BUCKETS,
+)
+UPDATE_SQL_STATEMENTS = Histogram(
+    "bot_update_sql_statements",
+    "Число SQL-запросов на апдейт",
+    ["handler"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100),
+)
+UPDATE_DB_SECONDS = Histogram(
+    "bot_update_db_seconds",
+    "Суммарное время SQL-запросов на апдейт",
+    ["handler"],
+    buckets=_LATENCY_BUCKETS,
+)
+DB_STATEMENTS = Counter("db_statements_total", "Выполненные SQL-запросы (все, не только в апдейтах)")
+DB_POOL_WAIT_SECONDS = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Ожидание свободного соединения в пуле",
+    buckets=_WAIT_BUCKETS,
+)
+UPDATES_THROTTLED = Counter(
+    "bot_updates_throttled_total",
+    "Команды сверх лимита: dropped — выброшены, coalesced — заменены более новой, delayed — выполнены с задержкой",
+    ["scope", "action"],
+)
+UPDATES_QUEUED = Gauge("bot_updates_queued", "Апдейты, ждущие своей очереди (чат/пользователь) или свободного слота")
+UPDATES_IN_FLIGHT = Gauge("bot_updates_in_flight", "Апдейты, обрабатываемые прямо сейчас")
+UPDATE_QUEUE_SECONDS = Histogram(
+    "bot_update_queue_seconds",
+    "Ожидание апдейта в очереди до начала обработки",
+    buckets=_LATENCY_BUCKETS,
+)
+DB_POOL_SIZE = Gauge("db_pool_size", "Постоянный размер пула соединений", ["pool"])
+DB_POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Соединения, выданные из пула", ["pool"])
+DB_POOL_OVERFLOW = Gauge("db_pool_overflow", "Открытые сверх размера пула (max_overflow)", ["pool"])
+DB_REPLICA_LAG_SECONDS = Gauge(
+    "db_replica_lag_seconds",
+    "Отставание реплики для чтения от primary (+Inf — недоступна)",
+    ["replica"],
+)
+TELEGRAM_API_SECONDS = Histogram(
+    "telegram_api_request_seconds",
+    "Длительность вызовов Bot API",
+    ["method", "status"],
+    buckets=_LATENCY_BUCKETS,
+)
+QUERY_BUDGET_EXCEEDED = Counter(
+    "bot_query_budget_exceeded_total",
+    "Апдейты, превысившие объявленный бюджет SQL-запросов хендлера",
+    ["handler"],
+)
+DIGEST_RUN_SECONDS = Histogram(
+    "digest_run_seconds",
+    "Длительность рассылки дайджестов",
+    ["kind"],
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600),
+)
+DIGEST_MESSAGES = Counter("digest_messages_total", "Сообщения дайджестов по исходу", ["outcome"])
+DIGEST_SHARD_RUNS = Counter(
+    "digest_shard_runs_total",
+    "Заходы планировщика в шарды дайджестов: taken — разослал сам, busy — шард занят другим экземпляром",
+    ["outcome"],
+)
+
+
+@dataclass
+class UpdateCost:
+    handler: str = "unhandled"
+    # Объявленный бюджет запросов хендлера (flags={"query_budget": N})
+    budget: Optional[int] = None
+    statements: int = 0
+    db_seconds: float = 0.0
+
+
+current_update_cost: ContextVar[Optional[UpdateCost]] = ContextVar("current_update_cost", default=None)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Пул, замеряющий ожидание соединения (событие checkout срабатывает уже после него)."""
+
+    def _do_get(self) -> Any:
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - started)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    started = conn.info["query_started"].pop()
+    DB_STATEMENTS.inc()
+    cost = current_update_cost.get()
+    if cost is not None:
+        cost.statements += 1
+        cost.db_seconds += time.perf_counter() - started
+
+
+def _handle_error(exception_context) -> None:
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_started"):
+        conn.info["query_started"].pop()
+
+
+def instrument_engine(engine: AsyncEngine, *, name: str = "primary") -> None:
+    sync_engine = engine.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+    # Состояние пула читается при сборе метрик; engine.pool — т.к. dispose() пересоздаёт пул
+    if hasattr(engine.pool, "checkedout"):
+        DB_POOL_SIZE.labels(name).set_function(lambda: engine.pool.size())
+        DB_POOL_CHECKED_OUT.labels(name).set_function(lambda: engine.pool.checkedout())
+        DB_POOL_OVERFLOW.labels(name).set_function(lambda: max(0, engine.pool.overflow()))
+
+
+def observe_digest_stats(stats: Any) -> None:
+    """Учитывает исходы отправки из DeliveryStats одного прогона."""
+    DIGEST_MESSAGES.labels("sent").inc(stats.sent)
+    DIGEST_MESSAGES.labels("failed_permanent").inc(stats.failed_permanent)
+    DIGEST_MESSAGES.labels("failed_transient").inc(stats.failed_transient)
+    DIGEST_MESSAGES.labels("retried").inc(stats.retried)
+
+
+def start_metrics_server(host: str, port: int) -> None:
+    """Поднимает /metrics в фоновом потоке; port=0 — метрики не публикуются."""
+    if port:
+        start_http_server(port, addr=host)
@@ -1,7 +1,160 @@
-from typing import Any, Awaitable, Callable, Dict
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
 from aiogram import BaseMiddleware
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from app.config import Config
+from app.services.throttling import COALESCE_MAX_DELAY, COALESCED_COMMANDS, Throttler, update_command
+from app.startup import record_first_update
+from app.metrics import (
+    HANDLER_SECONDS,
+    QUERY_BUDGET_EXCEEDED,
+    TELEGRAM_API_SECONDS,
+    UPDATE_DB_SECONDS,
+    UPDATE_QUEUE_SECONDS,
+    UPDATE_SQL_STATEMENTS,
+    UPDATES_IN_FLIGHT,
+    UPDATES_QUEUED,
+    UPDATES_THROTTLED,
+    UpdateCost,
+    current_update_cost,
+)
+
+logger = logging.getLogger(__name__)
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Внешняя миддлвара апдейта: команды и нажатия кнопок сверх лимитов (Throttler)
+    не доходят до очереди и сессии БД. Лишние списки (/my, листание) схлопываются:
+    ждёт только последний, остальные выбрасываются; прочие команды сверх лимита
+    выбрасываются сразу. На выброшенное нажатие кнопки (и сверх лимита, и схлопнутое)
+    отвечаем, чтобы в клиенте не крутился индикатор.
+    """
+    def __init__(self, throttler: Throttler) -> None:
+        super().__init__()
+        self._throttler = throttler
+        # (пользователь, команда) -> апдейт, который ждёт токена
+        self._waiting: Dict[Hashable, object] = {}
+
+    async def __call__(self, handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]], event: Any, data: Dict[str, Any]) -> Any:
+        command = update_command(event)
+        if command is None:
+            return await handler(event, data)
+        user = data.get("event_from_user")
+        chat = data.get("event_chat")
+        user_id = user.id if user is not None else None
+        # Личный чат — тот же пользователь, его ведра хватает
+        chat_id = chat.id if chat is not None and chat.type != "private" else None
+
+        wait, scope = await self._throttler.check(user_id, chat_id, command)
+        if not wait:
+            return await handler(event, data)
+
+        if command in COALESCED_COMMANDS and wait <= COALESCE_MAX_DELAY:
+            key = (user_id, command)
+            ticket = object()
+            superseded = self._waiting.get(key)
+            self._waiting[key] = ticket
+            if superseded is not None:
+                UPDATES_THROTTLED.labels(scope, "coalesced").inc()
+            await asyncio.sleep(wait)
+            if self._waiting.get(key) is not ticket:
+                await self._answer_callback(event, data)
+                return None
+            del self._waiting[key]
+            wait, retry_scope = await self._throttler.check(user_id, chat_id, command)
+            if not wait:
+                UPDATES_THROTTLED.labels(scope, "delayed").inc()
+                return await handler(event, data)
+            scope = retry_scope
+
+        UPDATES_THROTTLED.labels(scope, "dropped").inc()
+        await self._answer_callback(event, data, "Не так часто 🙂")
+        return None
+
+    @staticmethod
+    async def _answer_callback(event: Any, data: Dict[str, Any], text: Optional[str] = None) -> None:
+        if event.callback_query is None:
+            return
+        try:
+            await data["bot"].answer_callback_query(event.callback_query.id, text=text)
+        except TelegramBadRequest:
+            pass
+
+
+class OrderedExecutorMiddleware(BaseMiddleware):
+    """
+    Внешняя миддлвара апдейта: апдейты одного чата (в ЛС — пользователя) выполняются
+    строго по очереди, разных — параллельно, но не больше `concurrency` одновременно.
+
+    Очередь ключа — asyncio.Lock (ожидающие просыпаются в порядке прихода), глобальный
+    лимит — семафор; слот берётся уже после очереди ключа, так что всплеск в одном чате
+    не занимает слоты остальных. Лимит стоит брать не больше ёмкости пула БД — тогда
+    апдейты ждут здесь, а не соединения внутри открытой сессии.
+    Порядок: после ThrottlingMiddleware (отброшенный лимитом апдейт не занимает место
+    в очереди), до MetricsMiddleware и сессии БД — ожидание в очереди не входит во
+    время хендлера, а соединение берётся только после получения слота.
+
+    Порядок гарантирован только внутри одного процесса: webhook-воркеры (SO_REUSEPORT)
+    получают апдейты одного чата вперемешку и выполняют их параллельно. И только при
+    синхронном бэкенде лимитов (в памяти): с Redis проверка лимита — сетевой запрос
+    до входа в очередь, и более поздний апдейт может её обогнать.
+    """
+    def __init__(self, concurrency: int) -> None:
+        super().__init__()
+        self._slots = asyncio.Semaphore(max(1, concurrency))
+        # ключ -> [замок, число апдейтов в очереди и в работе]
+        self._lanes: Dict[Hashable, List[Any]] = {}
+
+    @staticmethod
+    def _key(data: Dict[str, Any]) -> Optional[Hashable]:
+        chat = data.get("event_chat")
+        if chat is not None:
+            return "chat", chat.id
+        user = data.get("event_from_user")
+        if user is not None:
+            return "user", user.id
+        return None
+
+    async def __call__(self, handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]], event: Any, data: Dict[str, Any]) -> Any:
+        key = self._key(data)
+        lane = None
+        if key is not None:
+            lane = self._lanes.get(key)
+            if lane is None:
+                lane = self._lanes[key] = [asyncio.Lock(), 0]
+            lane[1] += 1
+
+        UPDATES_QUEUED.inc()
+        queued = True
+        started = time.perf_counter()
+        try:
+            if lane is not None:
+                await lane[0].acquire()
+            try:
+                async with self._slots:
+                    UPDATES_QUEUED.dec()
+                    queued = False
+                    UPDATE_QUEUE_SECONDS.observe(time.perf_counter() - started)
+                    UPDATES_IN_FLIGHT.inc()
+                    try:
+                        return await handler(event, data)
+                    finally:
+                        UPDATES_IN_FLIGHT.dec()
+            finally:
+                if lane is not None:
+                    lane[0].release()
+        finally:
+            if queued:
+                UPDATES_QUEUED.dec()
+            if lane is not None:
+                lane[1] -= 1
+                if not lane[1]:
+                    del self._lanes[key]
+
 
 class ConfigMiddleware(BaseMiddleware):
     def __init__(self, config: Config) -> None:
@@ -33,3 +186,64 @@ class DbSessionMiddleware(BaseMiddleware):
             except Exception:
                 await session.rollback() # 🔁 откатываем в случае ошибки
                 raise
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """
+    Внешняя миддлвара апдейта: время обработки, число SQL-запросов и время в БД.
+    Порядок: после OrderedExecutorMiddleware (ожидание в очереди меряет своя метрика
+    и во время обработки не попадает), но до DbSessionMiddleware — чтобы учесть
+    и открытие/commit сессии.
+    """
+    async def __call__(self, handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]], event: Any, data: Dict[str, Any]) -> Any:
+        cost = UpdateCost()
+        token = current_update_cost.set(cost)
+        status = "ok"
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            HANDLER_SECONDS.labels(cost.handler, status).observe(elapsed)
+            record_first_update(elapsed)
+            UPDATE_SQL_STATEMENTS.labels(cost.handler).observe(cost.statements)
+            UPDATE_DB_SECONDS.labels(cost.handler).observe(cost.db_seconds)
+            if cost.budget is not None and cost.statements > cost.budget:
+                QUERY_BUDGET_EXCEEDED.labels(cost.handler).inc()
+                logger.warning(
+                    "Хендлер %s выполнил %s SQL-запросов при бюджете %s",
+                    cost.handler, cost.statements, cost.budget,
+                )
+            current_update_cost.reset(token)
+
+
+class HandlerNameMiddleware(BaseMiddleware):
+    """
+    Внутренняя миддлвара: подписывает метрики апдейта именем сработавшего хендлера
+    (ограниченный набор меток, в отличие от произвольного текста команд).
+    """
+    async def __call__(self, handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]], event: Any, data: Dict[str, Any]) -> Any:
+        cost = current_update_cost.get()
+        handler_object = data.get("handler")
+        if cost is not None and handler_object is not None:
+            cost.handler = getattr(handler_object.callback, "__name__", "unknown")
+            cost.budget = handler_object.flags.get("query_budget")
+        return await handler(event, data)
+
+
+class TelegramMetricsMiddleware(BaseRequestMiddleware):
+    """Длительность и исход каждого вызова Bot API."""
+    async def __call__(self, make_request: NextRequestMiddlewareType, bot: Any, method: Any) -> Any:
+        name = type(method).__name__
+        status = "ok"
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            status = type(e).__name__
+            raise
+        finally:
+            TELEGRAM_API_SECONDS.labels(name, status).observe(time.perf_counter() - started)
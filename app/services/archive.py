@@ -0,0 +1,84 @@
+"""
+Перенос давно закрытых задач из tasks в tasks_archive.
+
+Горячие запросы (представления, дайджест, напоминания) читают только открытые
+задачи, но индексы и страницы таблицы растут вместе с историей. Задание
+переносит закрытые больше N дней назад пачками: каждая пачка — один запрос
+(DELETE ... RETURNING внутри INSERT ... SELECT) и своя короткая транзакция.
+FOR UPDATE SKIP LOCKED не даёт двум планировщикам взять одни и те же строки.
+Напоминания архивных задач удаляются каскадом — они уже не нужны.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Task, TaskArchive
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_BATCH_SIZE = 1000
+
+# Колонки, общие у tasks и tasks_archive
+_COLUMNS = (
+    "id",
+    "chat_id",
+    "creator_id",
+    "assignee_id",
+    "title",
+    "description",
+    "deadline",
+    "status",
+    "created_at",
+    "closed_at",
+    "origin_message_id",
+)
+
+
+def archive_candidates_query(cutoff: datetime, batch_size: int):
+    return (
+        select(Task.id)
+        .where(Task.status != "open", Task.closed_at < cutoff)
+        .order_by(Task.closed_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+
+
+def archive_batch_statement(cutoff: datetime, batch_size: int):
+    moved = (
+        delete(Task)
+        .where(Task.id.in_(archive_candidates_query(cutoff, batch_size).scalar_subquery()))
+        .returning(*(getattr(Task, name) for name in _COLUMNS))
+        .cte("moved")
+    )
+    return insert(TaskArchive).from_select(_COLUMNS, select(*(moved.c[name] for name in _COLUMNS)))
+
+
+async def archive_closed_tasks(
+    session: AsyncSession,
+    *,
+    older_than_days: int,
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+    max_batches: Optional[int] = None,
+    now: Optional[datetime] = None,
+) -> int:
+    """Переносит задачи, закрытые раньше `older_than_days` дней назад. Возвращает число перенесённых."""
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=older_than_days)
+    moved = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        q = await session.execute(archive_batch_statement(cutoff, batch_size))
+        count = q.rowcount
+        await session.commit()
+        moved += count
+        batches += 1
+        if count < batch_size:
+            break
+    if moved:
+        logger.info("В архив перенесено задач: %s", moved)
+    return moved
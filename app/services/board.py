@@ -0,0 +1,187 @@
+"""
+Доска группового чата: одно закреплённое сообщение со списком открытых задач.
+
+Изменения задач чата (создание, закрытие) после commit помечают доску
+«грязной»; перерисовка откладывается на `debounce` секунд, и все изменения за
+это окно попадают в одно edit_message_text. Содержимое доски — один запрос
+по (chat_id, status, deadline), поэтому цена изменения не зависит от их числа.
+"""
+from __future__ import annotations
+
+import asyncio
+import html
+import logging
+from datetime import date
+from typing import Dict, Iterable, Optional, Sequence, Set
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from sqlalchemy import Select, and_, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.models import Chat, Task, User
+from app.db.session import on_commit
+from app.utils.timezones import local_today
+
+logger = logging.getLogger(__name__)
+
+BOARD_DEBOUNCE_SECONDS = 10.0
+# Сообщение Telegram ограничено 4096 символами
+BOARD_MAX_ROWS = 30
+_TITLE_MAX = 80
+
+_updater: Optional["BoardUpdater"] = None
+
+
+def board_query(chat_id: int) -> Select:
+    """
+    Всё для доски одним запросом: куда её писать (tg_chat_id, board_message_id),
+    первые открытые задачи по дедлайну и их общее число (оконная функция — до LIMIT).
+    Для чата без открытых задач — одна строка с пустыми колонками задачи.
+    """
+    return (
+        select(
+            Chat.tg_chat_id,
+            Chat.board_message_id,
+            Task.id,
+            Task.title,
+            Task.deadline,
+            User.username,
+            func.count(Task.id).over().label("total"),
+        )
+        .select_from(Chat)
+        .outerjoin(Task, and_(Task.chat_id == Chat.id, Task.status == "open"))
+        .outerjoin(User, User.id == Task.assignee_id)
+        .where(Chat.id == chat_id)
+        .order_by(Task.deadline, Task.id)
+        .limit(BOARD_MAX_ROWS)
+    )
+
+
+def render_board(rows: Sequence, today: date) -> str:
+    tasks = [r for r in rows if r.id is not None]
+    if not tasks:
+        return "📌 <b>Доска задач</b>\n\nОткрытых задач нет 🎉"
+    total = tasks[0].total
+    lines = [f"📌 <b>Доска задач</b> — открытых: {total}", ""]
+    for r in tasks:
+        title = r.title if len(r.title) <= _TITLE_MAX else r.title[: _TITLE_MAX - 1] + "…"
+        mark = "⚠️ " if r.deadline < today else ("🔥 " if r.deadline == today else "")
+        who = f" — @{html.escape(r.username)}" if r.username else ""
+        lines.append(f"{mark}#{r.id} {html.escape(title)} (до {r.deadline.strftime('%d.%m')}){who}")
+    if total > len(tasks):
+        lines.append(f"\n…и ещё {total - len(tasks)}")
+    return "\n".join(lines)
+
+
+async def set_board_message(session: AsyncSession, chat_id: int, message_id: Optional[int]) -> None:
+    await session.execute(update(Chat).where(Chat.id == chat_id).values(board_message_id=message_id))
+
+
+def boards_changed(session: AsyncSession, chat_ids: Iterable[int]) -> None:
+    """Задачи этих чатов изменились: после commit перерисовать их доски (с задержкой)."""
+    ids = set(chat_ids)
+    if ids and _updater is not None:
+        updater = _updater
+        on_commit(session, lambda: updater.schedule_many(ids))
+
+
+class BoardUpdater:
+    """Отложенная перерисовка досок: не больше одного edit на чат за окно `debounce`."""
+
+    def __init__(
+        self,
+        session_maker: async_sessionmaker[AsyncSession],
+        bot: Bot,
+        *,
+        default_tz: str,
+        debounce: float = BOARD_DEBOUNCE_SECONDS,
+    ) -> None:
+        self._session_maker = session_maker
+        self._bot = bot
+        self._default_tz = default_tz
+        self._debounce = debounce
+        self._pending: Dict[int, asyncio.Task] = {}
+        # Изменения, пришедшие во время перерисовки, — нужна ещё одна
+        self._dirty: Set[int] = set()
+
+    def schedule(self, chat_id: int) -> None:
+        if chat_id in self._pending:
+            self._dirty.add(chat_id)
+            return
+        self._pending[chat_id] = asyncio.create_task(self._run(chat_id), name=f"board-{chat_id}")
+
+    def schedule_many(self, chat_ids: Iterable[int]) -> None:
+        for chat_id in chat_ids:
+            self.schedule(chat_id)
+
+    async def _run(self, chat_id: int) -> None:
+        delay = self._debounce
+        try:
+            while True:
+                await asyncio.sleep(delay)
+                # Всё, что изменилось за окно, перерисовка прочитает сама
+                self._dirty.discard(chat_id)
+                delay = await self.refresh(chat_id) or self._debounce
+                if chat_id not in self._dirty:
+                    break
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Не удалось обновить доску чата %s", chat_id)
+        finally:
+            self._pending.pop(chat_id, None)
+            self._dirty.discard(chat_id)
+
+    async def refresh(self, chat_id: int) -> Optional[float]:
+        """
+        Перерисовывает доску сейчас. Возвращает задержку перед повтором, если
+        Telegram попросил подождать (в этом случае доска помечается грязной).
+        """
+        async with self._session_maker() as session:
+            rows = (await session.execute(board_query(chat_id))).all()
+        if not rows or rows[0].board_message_id is None:
+            return None
+        tg_chat_id, message_id = rows[0].tg_chat_id, rows[0].board_message_id
+        text = render_board(rows, local_today(None, self._default_tz))
+        try:
+            await self._bot.edit_message_text(text, chat_id=tg_chat_id, message_id=message_id, parse_mode="HTML")
+        except TelegramRetryAfter as e:
+            self._dirty.add(chat_id)
+            return float(e.retry_after)
+        except TelegramBadRequest as e:
+            if "not modified" in e.message:
+                return None
+            if "not found" not in e.message and "can't be edited" not in e.message:
+                raise
+            # Доску удалили из чата — больше не обновляем
+            logger.info("Доска чата %s пропала: %s", chat_id, e.message)
+            async with self._session_maker() as session:
+                await set_board_message(session, chat_id, None)
+                await session.commit()
+        return None
+
+    async def close(self) -> None:
+        tasks = list(self._pending.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def start_board_updater(
+    session_maker: async_sessionmaker[AsyncSession],
+    bot: Bot,
+    *,
+    default_tz: str,
+    debounce: float = BOARD_DEBOUNCE_SECONDS,
+) -> BoardUpdater:
+    global _updater
+    _updater = BoardUpdater(session_maker, bot, default_tz=default_tz, debounce=debounce)
+    return _updater
+
+
+async def stop_board_updater() -> None:
+    global _updater
+    if _updater is not None:
+        await _updater.close()
+        _updater = None
@@ -0,0 +1,296 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+
+from app.config import Config
+from app.utils.ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Когда ведер по чатам становится больше — выкидываем простаивающие
+_CHAT_BUCKETS_SOFT_LIMIT = 10_000
+
+
+@dataclass(frozen=True)
+class DeliverySettings:
+    workers: int = 8
+    # Глобальный лимит Telegram — около 30 сообщений в секунду на бота
+    global_rate: float = 30.0
+    # Не чаще одного сообщения в секунду в личный чат
+    private_chat_rate: float = 1.0
+    # Не больше 20 сообщений в минуту в группу
+    group_chat_rate: float = 20 / 60
+    max_attempts: int = 5
+    # Начальная задержка для повторов при сетевых/серверных ошибках
+    retry_backoff: float = 1.0
+    queue_size: int = 1000
+
+    @classmethod
+    def from_config(cls, config: Config) -> "DeliverySettings":
+        return cls(
+            workers=config.delivery_workers,
+            global_rate=config.delivery_global_rate,
+            max_attempts=config.delivery_max_attempts,
+        )
+
+
+@dataclass
+class OutgoingMessage:
+    chat_id: int
+    text: str
+    # Пользователь-получатель (для пометки «недоступен» при Forbidden)
+    user_id: Optional[int] = None
+    # Произвольная ссылка вызывающего кода (например, id строки outbox)
+    ref: Any = None
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+    attempts: int = 0
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+@dataclass
+class DeliveryStats:
+    submitted: int = 0
+    sent: int = 0
+    retried: int = 0
+    failed_permanent: int = 0
+    failed_transient: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+    finished_at: Optional[float] = None
+    # Длительность вызова send_message и полная задержка от постановки в очередь
+    send_latencies: List[float] = field(default_factory=list)
+    delivery_delays: List[float] = field(default_factory=list)
+
+    @property
+    def duration(self) -> float:
+        end = self.finished_at if self.finished_at is not None else time.monotonic()
+        return end - self.started_at
+
+    def summary(self) -> Dict[str, Any]:
+        duration = self.duration
+        return {
+            "submitted": self.submitted,
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed_permanent": self.failed_permanent,
+            "failed_transient": self.failed_transient,
+            "duration_s": round(duration, 3),
+            "throughput_per_s": round(self.sent / duration, 2) if duration > 0 else 0.0,
+            "send_p50_ms": round(_percentile(self.send_latencies, 0.50) * 1000, 1),
+            "send_p95_ms": round(_percentile(self.send_latencies, 0.95) * 1000, 1),
+            "delay_p50_ms": round(_percentile(self.delivery_delays, 0.50) * 1000, 1),
+            "delay_p95_ms": round(_percentile(self.delivery_delays, 0.95) * 1000, 1),
+        }
+
+
+def is_unreachable_error(exc: BaseException) -> bool:
+    """Ошибка означает, что писать этому чату бессмысленно (бот заблокирован, чата нет)."""
+    if isinstance(exc, TelegramForbiddenError):
+        return True
+    if isinstance(exc, TelegramBadRequest):
+        return "chat not found" in str(exc).lower()
+    return False
+
+
+FailureCallback = Callable[[OutgoingMessage, BaseException], Awaitable[None]]
+
+
+class DeliveryPipeline:
+    """
+    Пул воркеров, отправляющих сообщения с учётом лимитов Telegram.
+
+        async with DeliveryPipeline(bot, settings) as pipeline:
+            await pipeline.submit(OutgoingMessage(chat_id, text))
+        logger.info("%s", pipeline.stats.summary())
+
+    RetryAfter и сетевые ошибки переотправляются позже, постоянные ошибки
+    (Forbidden, «chat not found» и т.п.) передаются в `on_permanent_failure`,
+    исчерпанные повторы — в `on_transient_failure`.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        settings: DeliverySettings = DeliverySettings(),
+        *,
+        on_permanent_failure: Optional[FailureCallback] = None,
+        on_transient_failure: Optional[FailureCallback] = None,
+        on_sent: Optional[Callable[[OutgoingMessage], Awaitable[None]]] = None,
+    ) -> None:
+        self._bot = bot
+        self._settings = settings
+        self._on_permanent_failure = on_permanent_failure
+        self._on_transient_failure = on_transient_failure
+        self._on_sent = on_sent
+        self._global = TokenBucket(settings.global_rate)
+        self._chats: Dict[int, TokenBucket] = {}
+        self._queue: asyncio.Queue[OutgoingMessage] = asyncio.Queue(maxsize=settings.queue_size)
+        self._workers: List[asyncio.Task] = []
+        self._delayed: set[asyncio.Task] = set()
+        self._pending = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.stats = DeliveryStats()
+
+    # --- Жизненный цикл ---
+
+    async def __aenter__(self) -> "DeliveryPipeline":
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    def start(self) -> None:
+        if self._workers:
+            return
+        self.stats = DeliveryStats()
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"delivery-worker-{i}")
+            for i in range(self._settings.workers)
+        ]
+
+    async def join(self) -> None:
+        """Ждёт, пока все поставленные сообщения дойдут до конечного статуса."""
+        await self._idle.wait()
+
+    async def close(self) -> None:
+        await self.join()
+        for w in self._workers:
+            w.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self.stats.finished_at = time.monotonic()
+
+    # --- Постановка в очередь ---
+
+    async def submit(self, message: OutgoingMessage) -> None:
+        """Ставит сообщение в очередь; ждёт, если очередь заполнена (backpressure)."""
+        self._pending += 1
+        self._idle.clear()
+        self.stats.submitted += 1
+        await self._queue.put(message)
+
+    def _requeue_later(self, message: OutgoingMessage, delay: float) -> None:
+        async def _later() -> None:
+            await asyncio.sleep(delay)
+            await self._queue.put(message)
+
+        task = asyncio.create_task(_later())
+        self._delayed.add(task)
+        task.add_done_callback(self._delayed.discard)
+
+    def _finish(self) -> None:
+        self._pending -= 1
+        if self._pending <= 0:
+            self._pending = 0
+            self._idle.set()
+
+    # --- Лимиты ---
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= _CHAT_BUCKETS_SOFT_LIMIT:
+                now = time.monotonic()
+                for key in [k for k, b in self._chats.items() if b.is_idle(now)]:
+                    del self._chats[key]
+            # Отрицательные id в Telegram — группы и каналы
+            rate = self._settings.group_chat_rate if chat_id < 0 else self._settings.private_chat_rate
+            bucket = TokenBucket(rate, capacity=1.0)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    # --- Воркер ---
+
+    async def _worker(self) -> None:
+        while True:
+            message = await self._queue.get()
+            try:
+                await self._process(message)
+            except Exception:
+                logger.exception("Сбой воркера доставки для чата %s", message.chat_id)
+                self._finish()
+            finally:
+                self._queue.task_done()
+
+    async def _process(self, message: OutgoingMessage) -> None:
+        # Лимит чата не должен блокировать воркер: откладываем сообщение
+        chat_delay = self._chat_bucket(message.chat_id).try_acquire()
+        if chat_delay > 0:
+            self._requeue_later(message, chat_delay)
+            return
+
+        await self._global.acquire()
+        message.attempts += 1
+        started = time.monotonic()
+        try:
+            await self._bot.send_message(message.chat_id, message.text, **message.kwargs)
+        except TelegramRetryAfter as e:
+            # Флуд-лимит у Telegram общий на бота: стоп не только этому чату, но и всей отправке
+            self._global.block_for(e.retry_after)
+            self._chat_bucket(message.chat_id).block_for(e.retry_after)
+            await self._retry(message, float(e.retry_after), e)
+            return
+        except (TelegramNetworkError, TelegramServerError) as e:
+            await self._retry(message, self._settings.retry_backoff * 2 ** (message.attempts - 1), e)
+            return
+        except Exception as e:
+            self.stats.failed_permanent += 1
+            logger.warning("Не удалось доставить сообщение в чат %s: %s", message.chat_id, e)
+            await self._notify_permanent_failure(message, e)
+            self._finish()
+            return
+
+        now = time.monotonic()
+        self.stats.sent += 1
+        self.stats.send_latencies.append(now - started)
+        self.stats.delivery_delays.append(now - message.enqueued_at)
+        if self._on_sent is not None:
+            await self._on_sent(message)
+        self._finish()
+
+    async def _retry(self, message: OutgoingMessage, delay: float, exc: BaseException) -> None:
+        if message.attempts >= self._settings.max_attempts:
+            self.stats.failed_transient += 1
+            logger.warning(
+                "Сообщение в чат %s не доставлено после %s попыток: %s",
+                message.chat_id, message.attempts, exc,
+            )
+            await self._run_callback(self._on_transient_failure, message, exc)
+            self._finish()
+            return
+        self.stats.retried += 1
+        self._requeue_later(message, delay)
+
+    async def _notify_permanent_failure(self, message: OutgoingMessage, exc: BaseException) -> None:
+        await self._run_callback(self._on_permanent_failure, message, exc)
+
+    @staticmethod
+    async def _run_callback(callback: Optional[FailureCallback], message: OutgoingMessage, exc: BaseException) -> None:
+        if callback is None:
+            return
+        try:
+            await callback(message, exc)
+        except Exception:
+            logger.exception("Ошибка в обработчике недоставленного сообщения")
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import date
+from typing import AsyncIterator, List, Optional, Sequence
+
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Chat, Task, User
+
+# Сколько строк за раз тянем из серверного курсора
+DIGEST_YIELD_PER = 1000
+
+
+@dataclass(frozen=True)
+class DigestTask:
+    id: int
+    title: str
+    deadline: date
+    chat_title: Optional[str]
+
+
+@dataclass
+class Digest:
+    """Дайджест одного пользователя: задачи на сегодня и просроченные."""
+    user_id: int
+    tg_id: int
+    username: Optional[str]
+    today: List[DigestTask] = field(default_factory=list)
+    overdue: List[DigestTask] = field(default_factory=list)
+
+
+def digest_rows_query(today: date, user_ids: Optional[Sequence[int]] = None) -> Select:
+    """
+    Один запрос на все дайджесты: открытые задачи на сегодня и просроченные
+    вместе с названием чата и получателем, упорядоченные по исполнителю.
+    `user_ids` ограничивает выборку срезом пользователей (например, теми, у кого подошло время).
+    """
+    stmt = (
+        select(
+            Task.assignee_id,
+            User.tg_id,
+            User.username,
+            Task.id,
+            Task.title,
+            Task.deadline,
+            Chat.title,
+        )
+        .join(User, User.id == Task.assignee_id)
+        .join(Chat, Chat.id == Task.chat_id)
+        .where(
+            Task.status == "open",
+            Task.deadline <= today,
+            User.tg_id.is_not(None),
+            User.unreachable_at.is_(None),
+        )
+        .order_by(Task.assignee_id.asc(), Task.deadline.asc(), Task.id.asc())
+    )
+    if user_ids is not None:
+        stmt = stmt.where(Task.assignee_id.in_(user_ids))
+    return stmt
+
+
+async def iter_digests(
+    session: AsyncSession,
+    today: date,
+    *,
+    user_ids: Optional[Sequence[int]] = None,
+    yield_per: int = DIGEST_YIELD_PER,
+) -> AsyncIterator[Digest]:
+    """
+    Стримит строки серверным курсором и собирает их в дайджесты по пользователям.
+    В памяти одновременно держится только текущий пользователь и одна пачка строк.
+    """
+    stmt = digest_rows_query(today, user_ids).execution_options(yield_per=yield_per)
+    result = await session.stream(stmt)
+
+    current: Optional[Digest] = None
+    async for assignee_id, tg_id, username, task_id, title, deadline, chat_title in result:
+        if current is None or current.user_id != assignee_id:
+            if current is not None:
+                yield current
+            current = Digest(user_id=assignee_id, tg_id=tg_id, username=username)
+        item = DigestTask(id=task_id, title=title, deadline=deadline, chat_title=chat_title)
+        if deadline == today:
+            current.today.append(item)
+        else:
+            current.overdue.append(item)
+
+    if current is not None:
+        yield current
+
+
+def render_digest(digest: Digest) -> Optional[str]:
+    """Текст дайджеста; None — если отправлять нечего."""
+    lines: List[str] = []
+    if digest.today:
+        lines.append("🎯 Твои задачи на сегодня:")
+        for t in digest.today:
+            d = t.deadline.strftime("%d.%m.%Y")
+            chat_part = f", чат: {t.chat_title}" if t.chat_title else ""
+            lines.append(f"#{t.id} — {t.title} (до {d}{chat_part})")
+    if digest.overdue:
+        if lines:
+            lines.append("")  # пустая строка-разделитель
+        lines.append("⏰ Просрочены:")
+        for t in digest.overdue:
+            d = t.deadline.strftime("%d.%m.%Y")
+            chat_part = f", чат: {t.chat_title}" if t.chat_title else ""
+            lines.append(f"#{t.id} — {t.title} (дедлайн: {d}{chat_part})")
+    if not lines:
+        return None
+    return "\n".join(lines)
@@ -0,0 +1,235 @@
+"""
+Выгрузка задач пользователя или группового чата в CSV и iCalendar.
+
+Строки идут из серверного курсора пачками по EXPORT_YIELD_PER и сразу
+кодируются во временный файл на диске, поэтому память процесса не зависит от
+числа задач. Архивные задачи (tasks_archive) попадают в CSV тем же запросом.
+Файл больше лимита Bot API сжимается gzip — тоже потоково.
+"""
+from __future__ import annotations
+
+import asyncio
+import csv
+import gzip
+import io
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterable, Optional, Sequence
+
+from sqlalchemy import Select, literal, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Chat, Task, TaskArchive, User
+
+EXPORT_YIELD_PER = 2000
+EXPORT_FORMATS = ("csv", "ics")
+# Один запрос (серверный курсор)
+EXPORT_QUERIES = 1
+# Bot API принимает документы до 50 МБ
+EXPORT_MAX_BYTES = 50 * 1024 * 1024
+
+_STATUS_LABELS = {"open": "открыта", "done": "выполнена", "canceled": "отменена"}
+_CSV_HEADER = ["id", "задача", "дедлайн", "исполнитель", "статус", "чат", "создана", "закрыта", "в архиве"]
+
+
+class ExportTooLarge(Exception):
+    pass
+
+
+@dataclass
+class ExportFile:
+    path: str
+    filename: str
+    rows: int
+
+    def remove(self) -> None:
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def export_rows_query(
+    *,
+    assignee_id: Optional[int] = None,
+    chat_id: Optional[int] = None,
+    include_closed: bool = True,
+) -> Select:
+    """
+    Задачи исполнителя или чата (ровно один фильтр) вместе с названием чата и ником
+    исполнителя. С include_closed — и закрытые, включая архив.
+    """
+    if (assignee_id is None) == (chat_id is None):
+        raise ValueError("Нужен ровно один фильтр: assignee_id или chat_id")
+
+    def part(model, archived: bool) -> Select:
+        stmt = (
+            select(
+                model.id,
+                model.title,
+                model.deadline,
+                User.username,
+                model.status,
+                Chat.title.label("chat_title"),
+                model.created_at,
+                model.closed_at,
+                literal(archived).label("archived"),
+            )
+            .join(User, User.id == model.assignee_id)
+            .join(Chat, Chat.id == model.chat_id)
+        )
+        if assignee_id is not None:
+            stmt = stmt.where(model.assignee_id == assignee_id)
+        else:
+            stmt = stmt.where(model.chat_id == chat_id)
+        if not include_closed:
+            stmt = stmt.where(model.status == "open")
+        return stmt
+
+    if not include_closed:
+        # В архиве открытых задач нет
+        return part(Task, False).order_by(Task.deadline, Task.id)
+    combined = union_all(part(Task, False), part(TaskArchive, True)).subquery()
+    return select(combined).order_by(combined.c.deadline, combined.c.id)
+
+
+def _fmt_dt(value: Optional[datetime]) -> str:
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M UTC") if value else ""
+
+
+def _csv_bytes(rows: Iterable[Sequence]) -> bytes:
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    return buf.getvalue().encode("utf-8")
+
+
+def _csv_chunk(rows: Sequence) -> bytes:
+    return _csv_bytes(
+        [
+            task_id,
+            title,
+            deadline.strftime("%d.%m.%Y"),
+            f"@{username}" if username else "",
+            _STATUS_LABELS.get(status, status),
+            chat_title or "",
+            _fmt_dt(created_at),
+            _fmt_dt(closed_at),
+            "да" if archived else "",
+        ]
+        for task_id, title, deadline, username, status, chat_title, created_at, closed_at, archived in rows
+    )
+
+
+def _ics_escape(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\r", "").replace("\n", "\\n")
+    )
+
+
+def _ics_fold(line: str) -> bytes:
+    """Строки iCalendar — не длиннее 75 октетов, продолжение начинается с пробела (RFC 5545)."""
+    raw = line.encode("utf-8")
+    if len(raw) <= 75:
+        return raw + b"\r\n"
+    out = bytearray()
+    chunk = bytearray()
+    limit = 75
+    for ch in line:
+        encoded = ch.encode("utf-8")
+        if len(chunk) + len(encoded) > limit:
+            out += chunk + b"\r\n "
+            chunk = bytearray()
+            limit = 74
+        chunk += encoded
+    out += chunk + b"\r\n"
+    return bytes(out)
+
+
+def _ics_lines(lines: Iterable[str]) -> bytes:
+    return b"".join(_ics_fold(line) for line in lines)
+
+
+def _ics_chunk(rows: Sequence, stamp: str) -> bytes:
+    lines = []
+    for task_id, title, deadline, username, status, chat_title, created_at, closed_at, archived in rows:
+        details = [f"Задача #{task_id}"]
+        if chat_title:
+            details.append(f"Чат: {chat_title}")
+        if username:
+            details.append(f"Исполнитель: @{username}")
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:task-{task_id}@deadline-master",
+            f"DTSTAMP:{stamp}",
+            # Событие на весь день дедлайна
+            f"DTSTART;VALUE=DATE:{deadline.strftime('%Y%m%d')}",
+            f"DTEND;VALUE=DATE:{(deadline + timedelta(days=1)).strftime('%Y%m%d')}",
+            f"SUMMARY:{_ics_escape(f'#{task_id} {title}')}",
+            f"DESCRIPTION:{_ics_escape(chr(10).join(details))}",
+            "END:VEVENT",
+        ]
+    return _ics_lines(lines)
+
+
+def _gzip_file(path: str) -> str:
+    gz_path = path + ".gz"
+    with open(path, "rb") as src, gzip.open(gz_path, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.unlink(path)
+    return gz_path
+
+
+async def export_tasks(
+    session: AsyncSession,
+    fmt: str,
+    *,
+    assignee_id: Optional[int] = None,
+    chat_id: Optional[int] = None,
+    name: str = "tasks",
+    today: Optional[date] = None,
+) -> ExportFile:
+    """
+    Пишет выгрузку во временный файл и возвращает его (удалить — ExportFile.remove).
+    CSV — все задачи с архивом, iCalendar — только открытые (дедлайны для календаря).
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Неизвестный формат: {fmt}")
+    stmt = export_rows_query(assignee_id=assignee_id, chat_id=chat_id, include_closed=fmt == "csv")
+    fd, path = tempfile.mkstemp(prefix="export-", suffix=f".{fmt}")
+    rows = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+            if fmt == "csv":
+                # BOM — чтобы Excel открыл UTF-8 без мастера импорта
+                out.write(b"\xef\xbb\xbf" + _csv_bytes([_CSV_HEADER]))
+            else:
+                out.write(_ics_lines([
+                    "BEGIN:VCALENDAR",
+                    "VERSION:2.0",
+                    "PRODID:-//Deadline Master//RU",
+                    "CALSCALE:GREGORIAN",
+                    f"X-WR-CALNAME:{_ics_escape(name)}",
+                ]))
+            result = await session.stream(stmt.execution_options(yield_per=EXPORT_YIELD_PER))
+            async for partition in result.partitions():
+                out.write(_csv_chunk(partition) if fmt == "csv" else _ics_chunk(partition, stamp))
+                rows += len(partition)
+            if fmt == "ics":
+                out.write(_ics_lines(["END:VCALENDAR"]))
+
+        filename = f"{name}-{(today or date.today()).isoformat()}.{fmt}"
+        if os.path.getsize(path) > EXPORT_MAX_BYTES:
+            path = await asyncio.to_thread(_gzip_file, path)
+            filename += ".gz"
+            if os.path.getsize(path) > EXPORT_MAX_BYTES:
+                raise ExportTooLarge(f"Выгрузка больше {EXPORT_MAX_BYTES // 2 ** 20} МБ даже в gzip")
+    except BaseException:
+        for leftover in (path, path + ".gz"):
+            if os.path.exists(leftover):
+                os.unlink(leftover)
+        raise
+    return ExportFile(path=path, filename=filename, rows=rows)
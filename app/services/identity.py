@@ -0,0 +1,76 @@
+"""
+In-process кэш «tg_id → строка в БД» для пользователей и чатов.
+
+Запись попадает в кэш только после commit (см. `app.db.session.on_commit`),
+поэтому откатанные вставки не оставляют в нём несуществующих id. TTL ограничивает
+время, в течение которого кэш может не видеть изменений из других процессов.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from app.utils.lru import TTLCache
+
+UserProfile = Tuple[Optional[str], Optional[str], Optional[str]]
+ChatProfile = Tuple[Optional[str], Optional[str]]
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    id: int
+    tg_id: int
+    profile: UserProfile  # username, first_name, last_name
+    # Не часть профиля Telegram, но нужен почти каждому хендлеру (локальная дата)
+    timezone: Optional[str] = None
+
+    @property
+    def username(self) -> Optional[str]:
+        return self.profile[0]
+
+
+@dataclass(frozen=True)
+class CachedChat:
+    id: int
+    tg_chat_id: int
+    profile: ChatProfile  # title, type
+
+    @property
+    def title(self) -> Optional[str]:
+        return self.profile[0]
+
+
+user_cache: TTLCache[int, CachedUser] = TTLCache(maxsize=50_000, ttl=600)
+chat_cache: TTLCache[int, CachedChat] = TTLCache(maxsize=10_000, ttl=600)
+
+# Сколько раз пришлось писать в БД и сколько записей удалось избежать
+_writes = {"users": 0, "chats": 0}
+_skipped_writes = {"users": 0, "chats": 0}
+
+
+def configure_identity_cache(*, maxsize: int, ttl: float) -> None:
+    user_cache.configure(maxsize=maxsize, ttl=ttl)
+    chat_cache.configure(maxsize=max(1, maxsize // 5), ttl=ttl)
+
+
+def user_profile(tg_user: Any) -> UserProfile:
+    return (tg_user.username, tg_user.first_name, tg_user.last_name)
+
+
+def chat_profile(title: Optional[str], type_: Optional[str]) -> ChatProfile:
+    return (title, type_)
+
+
+def record_write(kind: str) -> None:
+    _writes[kind] += 1
+
+
+def record_skipped_write(kind: str) -> None:
+    _skipped_writes[kind] += 1
+
+
+def identity_cache_stats() -> Dict[str, Dict[str, int]]:
+    return {
+        "users": {**user_cache.stats(), "writes": _writes["users"], "skipped_writes": _skipped_writes["users"]},
+        "chats": {**chat_cache.stats(), "writes": _writes["chats"], "skipped_writes": _skipped_writes["chats"]},
+    }
@@ -1,72 +1,248 @@
 from __future__ import annotations
 
-from datetime import date
-from typing import List
+import asyncio
+import logging
+import random
+from collections import defaultdict
+from datetime import date, datetime, time
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Set
 
 from aiogram import Bot
 
-from sqlalchemy.ext.asyncio import AsyncSession
-
-from app.db.models import Task, Chat, User
-from app.services.tasks import (
-    users_with_open_tasks,
-    fetch_tasks_today,
-    fetch_tasks_overdue,
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.models import User
+from app.db.session import use_replica
+from app.metrics import DIGEST_MESSAGES, DIGEST_RUN_SECONDS, DIGEST_SHARD_RUNS, observe_digest_stats
+from app.services.delivery import (
+    DeliveryPipeline,
+    DeliverySettings,
+    DeliveryStats,
+    OutgoingMessage,
+    is_unreachable_error,
 )
-
-
-def _fmt_task_line(t: Task, chat: Chat | None = None) -> str:
-    d = t.deadline.strftime("%d.%m.%Y")
-    chat_part = f", чат: {chat.title}" if chat and chat.title else ""
-    return f"#{t.id} — {t.title} (до {d}{chat_part})"
-
-
-async def _load_chats_for_tasks(session: AsyncSession, tasks: List[Task]) -> dict[int, Chat]:
-    # Сопоставим chat_id -> chat одним запросом
-    if not tasks:
-        return {}
-    chat_ids = sorted({t.chat_id for t in tasks})
-    from sqlalchemy import select
-    q = await session.execute(select(Chat).where(Chat.id.in_(chat_ids)))
-    return {c.id: c for c in q.scalars().all()}
-
-
-async def send_daily_digests(session: AsyncSession, bot: Bot) -> None:
-    """Формирует и отправляет пользователям дайджесты задач на сегодня и просроченных."""
-    today = date.today()
-    users = await users_with_open_tasks(session)
-
-    for user in users:
-        if not user.tg_id:
-            continue
-
-        tasks_today = await fetch_tasks_today(session, user, today)
-        tasks_overdue = await fetch_tasks_overdue(session, user, today)
-
-        chats_map = await _load_chats_for_tasks(session, tasks_today + tasks_overdue)
-
-        lines = []
-        if tasks_today:
-            lines.append("🎯 Твои задачи на сегодня:")
-            for t in tasks_today:
-                lines.append(f"{_fmt_task_line(t, chats_map.get(t.chat_id))}")
-        if tasks_overdue:
-            if lines:
-                lines.append("")  # пустая строка-разделитель
-            lines.append("⏰ Просрочены:")
-            for t in tasks_overdue:
-                d = t.deadline.strftime("%d.%m.%Y")
-                chat_part = f", чат: {chats_map.get(t.chat_id).title}" if chats_map.get(t.chat_id) else ""
-                lines.append(f"#{t.id} — {t.title} (дедлайн: {d}{chat_part})")
-
-        if not lines:
-            # Ничего важного — можно не слать сообщение
-            continue
-
-        text = "\n".join(lines)
-        try:
-            await bot.send_message(user.tg_id, text)
-        except Exception as e:
-            # Например, юзер не писал /start — Forbidden
-            import logging
-            logging.getLogger(__name__).warning("Не удалось отправить дайджест пользователю %s: %s", user.username, e)
+from app.services.digest import iter_digests, render_digest
+from app.services.tasks import mark_users_unreachable
+from app.utils.timezones import next_occurrence, resolve_timezone
+
+logger = logging.getLogger(__name__)
+
+# Сколько пользователей обрабатываем за один заход планировщика
+DUE_BATCH_SIZE = 1000
+# Пользователи делятся на шарды по id % shards; шард рассылает тот планировщик,
+# что взял advisory-lock (DIGEST_LOCK_CLASS, номер шарда)
+DIGEST_SHARDS = 16
+DIGEST_LOCK_CLASS = 7_310_002
+
+
+async def send_daily_digests(
+    session: AsyncSession,
+    bot: Bot,
+    settings: DeliverySettings = DeliverySettings(),
+    *,
+    today: Optional[date] = None,
+    user_ids: Optional[Sequence[int]] = None,
+    on_sent: Optional[Callable[[OutgoingMessage], Awaitable[None]]] = None,
+) -> DeliveryStats:
+    """
+    Формирует и отправляет пользователям дайджесты задач на сегодня и просроченных.
+    `on_sent` вызывается после каждой успешной отправки (например, для чекпоинта).
+    """
+    today = today or date.today()
+    unreachable: Set[int] = set()
+
+    async def on_permanent_failure(message: OutgoingMessage, exc: BaseException) -> None:
+        # Например, юзер заблокировал бота — Forbidden; в следующий раз не пишем
+        if message.user_id is not None and is_unreachable_error(exc):
+            unreachable.add(message.user_id)
+
+    pipeline = DeliveryPipeline(bot, settings, on_permanent_failure=on_permanent_failure, on_sent=on_sent)
+    # Скан задач — с реплики (устаревание не больше REPLICA_MAX_LAG); выбор «кому пора» и отметки — на primary
+    with DIGEST_RUN_SECONDS.labels("daily").time(), use_replica(session):
+        async with pipeline:
+            async for digest in iter_digests(session, today, user_ids=user_ids):
+                text = render_digest(digest)
+                if not text:
+                    # Ничего важного — можно не слать сообщение
+                    continue
+                await pipeline.submit(OutgoingMessage(chat_id=digest.tg_id, text=text, user_id=digest.user_id))
+    observe_digest_stats(pipeline.stats)
+
+    if unreachable:
+        await mark_users_unreachable(session, unreachable)
+        await session.commit()
+
+    logger.info("Дайджесты разосланы: %s, недоступных: %s", pipeline.stats.summary(), len(unreachable))
+    return pipeline.stats
+
+
+async def schedule_new_users(
+    session: AsyncSession,
+    now: datetime,
+    *,
+    default_tz: str,
+    default_time: time,
+    batch_size: int = DUE_BATCH_SIZE,
+    shard: int = 0,
+    shards: int = 1,
+) -> int:
+    """
+    Проставляет next_digest_at пользователям, у которых его ещё нет (новые, после миграции).
+    При shards > 1 — только пользователям шарда: каждый экземпляр трогает лишь тех, чей шард держит.
+    """
+    stmt = (
+        select(User.id, User.timezone, User.digest_time)
+        .where(User.next_digest_at.is_(None), User.tg_id.is_not(None))
+        .limit(batch_size)
+    )
+    if shards > 1:
+        stmt = stmt.where(User.id % shards == shard)
+    rows = (await session.execute(stmt)).all()
+    if not rows:
+        return 0
+    await session.execute(update(User), [
+        {
+            "id": user_id,
+            "next_digest_at": next_occurrence(now, resolve_timezone(tz_name, default_tz), digest_time or default_time),
+        }
+        for user_id, tz_name, digest_time in rows
+    ])
+    await session.commit()
+    return len(rows)
+
+
+async def send_due_digests(
+    session: AsyncSession,
+    bot: Bot,
+    settings: DeliverySettings = DeliverySettings(),
+    *,
+    now: datetime,
+    default_tz: str,
+    default_time: time,
+    batch_size: int = DUE_BATCH_SIZE,
+    shard: int = 0,
+    shards: int = 1,
+    checkpoints: Optional[AsyncSession] = None,
+) -> int:
+    """
+    Один заход планировщика: дайджесты тем, у кого next_digest_at <= now (при shards > 1 —
+    только пользователям шарда). «Сегодня» у каждого своё — по его часовому поясу.
+
+    С `checkpoints` (отдельная сессия: основная занята курсором дайджестов) после каждой
+    отправки коммитится users.digest_sent_on, и перезапуск после падения продолжает с
+    того же места: кому дайджест за эту дату уже ушёл, тому не шлём. Возвращает число
+    обработанных пользователей.
+    """
+    while await schedule_new_users(
+        session, now, default_tz=default_tz, default_time=default_time, batch_size=batch_size,
+        shard=shard, shards=shards,
+    ) >= batch_size:
+        pass
+
+    checkpoint_lock = asyncio.Lock()
+
+    def checkpoint(day: date) -> Optional[Callable[[OutgoingMessage], Awaitable[None]]]:
+        if checkpoints is None:
+            return None
+
+        async def on_sent(message: OutgoingMessage) -> None:
+            # Воркеры доставки шлют параллельно, а сессия одна
+            async with checkpoint_lock:
+                await checkpoints.execute(
+                    update(User).where(User.id == message.user_id).values(digest_sent_on=day)
+                )
+                await checkpoints.commit()
+
+        return on_sent
+
+    processed = 0
+    while True:
+        stmt = (
+            select(User.id, User.timezone, User.digest_time, User.digest_sent_on)
+            .where(
+                User.next_digest_at <= now,
+                User.tg_id.is_not(None),
+                User.unreachable_at.is_(None),
+            )
+            .order_by(User.next_digest_at)
+            .limit(batch_size)
+        )
+        if shards > 1:
+            stmt = stmt.where(User.id % shards == shard)
+        due = (await session.execute(stmt)).all()
+        if not due:
+            break
+
+        # Группируем срез по локальной дате: одновременно их не больше двух-трёх
+        by_date: Dict[date, List[int]] = defaultdict(list)
+        next_at = []
+        resumed = 0
+        for user_id, tz_name, digest_time, sent_on in due:
+            tz = resolve_timezone(tz_name, default_tz)
+            local_date = now.astimezone(tz).date()
+            next_at.append({"id": user_id, "next_digest_at": next_occurrence(now, tz, digest_time or default_time)})
+            if sent_on == local_date:
+                # Отправлен до падения прошлого захода — только сдвигаем next_digest_at
+                resumed += 1
+                continue
+            by_date[local_date].append(user_id)
+        if resumed:
+            DIGEST_MESSAGES.labels("already_sent").inc(resumed)
+            logger.info("Дайджест уже отправлен до перезапуска: %s", resumed)
+
+        for local_date, user_ids in by_date.items():
+            await send_daily_digests(
+                session, bot, settings, today=local_date, user_ids=user_ids, on_sent=checkpoint(local_date)
+            )
+
+        await session.execute(update(User), next_at)
+        await session.commit()
+        processed += len(due)
+        if len(due) < batch_size:
+            break
+    return processed
+
+
+async def send_due_digests_sharded(
+    session_maker: async_sessionmaker[AsyncSession],
+    bot: Bot,
+    settings: DeliverySettings = DeliverySettings(),
+    *,
+    now: datetime,
+    default_tz: str,
+    default_time: time,
+    shards: int = DIGEST_SHARDS,
+) -> int:
+    """
+    Заход планировщика, безопасный для нескольких экземпляров: шарды обходятся со
+    случайного, каждый — под pg_try_advisory_xact_lock; занятый другим экземпляром
+    шард пропускается. Так экземпляры делят рассылку между собой, а упавший
+    экземпляр подменяют оставшиеся — его шарды свободны уже на следующей минуте.
+
+    Блокировка транзакционная на отдельном соединении: сессионная через pgbouncer
+    в режиме transaction осталась бы на чужом серверном соединении.
+    """
+    engine = session_maker.kw["bind"]
+    start = random.randrange(shards)
+    processed = 0
+    for shard in ((start + i) % shards for i in range(shards)):
+        async with engine.connect() as lock_conn, lock_conn.begin():
+            taken = await lock_conn.scalar(select(func.pg_try_advisory_xact_lock(DIGEST_LOCK_CLASS, shard)))
+            if not taken:
+                DIGEST_SHARD_RUNS.labels("busy").inc()
+                continue
+            DIGEST_SHARD_RUNS.labels("taken").inc()
+            async with session_maker() as session, session_maker() as checkpoints:
+                processed += await send_due_digests(
+                    session,
+                    bot,
+                    settings,
+                    now=now,
+                    default_tz=default_tz,
+                    default_time=default_time,
+                    shard=shard,
+                    shards=shards,
+                    checkpoints=checkpoints,
+                )
+    return processed
@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set
+
+from aiogram import Bot
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.models import OutboxMessage
+from app.services.delivery import (
+    DeliveryPipeline,
+    DeliverySettings,
+    OutgoingMessage,
+    is_unreachable_error,
+)
+from app.services.tasks import mark_users_unreachable
+
+logger = logging.getLogger(__name__)
+
+# Будильник диспетчера в этом процессе: хендлер дёргает его после commit
+_wakeup = asyncio.Event()
+
+
+def enqueue_notification(
+    session: AsyncSession,
+    chat_id: int,
+    text: str,
+    *,
+    user_id: Optional[int] = None,
+) -> OutboxMessage:
+    """
+    Кладёт уведомление в outbox. Запись попадёт в БД вместе с остальными
+    изменениями транзакции, отправит её фоновый OutboxDispatcher.
+    """
+    msg = OutboxMessage(chat_id=chat_id, user_id=user_id, text=text, status="pending", attempts=0)
+    session.add(msg)
+    return msg
+
+
+def wake_dispatcher() -> None:
+    """Просит диспетчер разобрать outbox сразу, не дожидаясь следующего опроса."""
+    _wakeup.set()
+
+
+class OutboxDispatcher:
+    """
+    Фоновая разборка outbox пачками.
+
+    Строки захватываются через `FOR UPDATE SKIP LOCKED` с «арендой» на
+    `lease_seconds`: если процесс упадёт посреди отправки, после истечения аренды
+    их подхватит следующий запуск. Поэтому несколько диспетчеров (например,
+    в разных воркерах) могут работать параллельно.
+    """
+
+    def __init__(
+        self,
+        session_maker: async_sessionmaker[AsyncSession],
+        bot: Bot,
+        settings: DeliverySettings = DeliverySettings(),
+        *,
+        batch_size: int = 100,
+        poll_interval: float = 2.0,
+        lease_seconds: int = 120,
+        max_claims: int = 10,
+        keep_sent_for: timedelta = timedelta(days=7),
+    ) -> None:
+        self._session_maker = session_maker
+        self._bot = bot
+        self._settings = settings
+        self._batch_size = batch_size
+        self._poll_interval = poll_interval
+        self._lease = timedelta(seconds=lease_seconds)
+        self._max_claims = max_claims
+        self._keep_sent_for = keep_sent_for
+        self._last_purge = 0.0
+
+    async def run(self) -> None:
+        """Бесконечный цикл; останавливается отменой задачи."""
+        logger.info("Запуск диспетчера outbox")
+        while True:
+            try:
+                processed = await self.drain_once()
+                await self._maybe_purge()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Ошибка при разборе outbox")
+                processed = 0
+            if processed >= self._batch_size:
+                # Очередь не пуста — сразу берём следующую пачку
+                continue
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=self._poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            _wakeup.clear()
+
+    async def _claim(self) -> List[OutboxMessage]:
+        now = datetime.now(timezone.utc)
+        due = (
+            select(OutboxMessage.id)
+            .where(OutboxMessage.status == "pending", OutboxMessage.next_attempt_at <= now)
+            .order_by(OutboxMessage.id)
+            .limit(self._batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        async with self._session_maker() as session:
+            q = await session.execute(
+                update(OutboxMessage)
+                .where(OutboxMessage.id.in_(due.scalar_subquery()))
+                .values(next_attempt_at=now + self._lease, attempts=OutboxMessage.attempts + 1)
+                .returning(OutboxMessage)
+                .execution_options(synchronize_session=False)
+            )
+            claimed = list(q.scalars().all())
+            await session.commit()
+        return claimed
+
+    async def drain_once(self) -> int:
+        """Захватывает и отправляет одну пачку; возвращает её размер."""
+        claimed = await self._claim()
+        if not claimed:
+            return 0
+
+        sent: List[int] = []
+        failed: Dict[int, str] = {}
+        retry: List[int] = []
+        unreachable: Set[int] = set()
+
+        async def on_sent(message: OutgoingMessage) -> None:
+            sent.append(message.ref)
+
+        async def on_permanent_failure(message: OutgoingMessage, exc: BaseException) -> None:
+            failed[message.ref] = str(exc)[:1000]
+            if message.user_id is not None and is_unreachable_error(exc):
+                unreachable.add(message.user_id)
+
+        async def on_transient_failure(message: OutgoingMessage, exc: BaseException) -> None:
+            retry.append(message.ref)
+
+        pipeline = DeliveryPipeline(
+            self._bot,
+            self._settings,
+            on_sent=on_sent,
+            on_permanent_failure=on_permanent_failure,
+            on_transient_failure=on_transient_failure,
+        )
+        async with pipeline:
+            for row in claimed:
+                await pipeline.submit(
+                    OutgoingMessage(chat_id=row.chat_id, text=row.text, user_id=row.user_id, ref=row.id)
+                )
+
+        await self._record_outcomes(sent, failed, retry, unreachable)
+        logger.debug("outbox: пачка %s, %s", len(claimed), pipeline.stats.summary())
+        return len(claimed)
+
+    async def _record_outcomes(
+        self,
+        sent: List[int],
+        failed: Dict[int, str],
+        retry: List[int],
+        unreachable: Set[int],
+    ) -> None:
+        now = datetime.now(timezone.utc)
+        async with self._session_maker() as session:
+            if sent:
+                await session.execute(
+                    update(OutboxMessage)
+                    .where(OutboxMessage.id.in_(sent))
+                    .values(status="sent", sent_at=now, last_error=None)
+                )
+            if failed:
+                await session.execute(
+                    update(OutboxMessage),
+                    [{"id": i, "status": "failed", "last_error": err} for i, err in failed.items()],
+                )
+            if retry:
+                # Повторим позже, но не бесконечно
+                await session.execute(
+                    update(OutboxMessage)
+                    .where(OutboxMessage.id.in_(retry), OutboxMessage.attempts >= self._max_claims)
+                    .values(status="failed", last_error="retries exhausted")
+                )
+                await session.execute(
+                    update(OutboxMessage)
+                    .where(OutboxMessage.id.in_(retry), OutboxMessage.status == "pending")
+                    .values(next_attempt_at=now + timedelta(seconds=self._poll_interval * 10))
+                )
+            await mark_users_unreachable(session, unreachable)
+            await session.commit()
+
+    async def _maybe_purge(self) -> None:
+        # Раз в час подчищаем давно отправленные уведомления
+        if time.monotonic() - self._last_purge < 3600:
+            return
+        self._last_purge = time.monotonic()
+        cutoff = datetime.now(timezone.utc) - self._keep_sent_for
+        async with self._session_maker() as session:
+            await session.execute(
+                delete(OutboxMessage).where(OutboxMessage.status == "sent", OutboxMessage.sent_at < cutoff)
+            )
+            await session.commit()
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import logging
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.models import Task, TaskReminder, User
+from app.services.outbox import enqueue_notification, wake_dispatcher
+from app.utils.timezones import get_timezone
+
+logger = logging.getLogger(__name__)
+
+# Напоминания срабатывают пачками не больше такого размера
+FIRE_BATCH_SIZE = 500
+
+
+def deadline_moment(deadline: date, tz_name: str, deadline_time: time) -> datetime:
+    """Дедлайн задачи как момент времени (UTC): дата дедлайна, `deadline_time` в поясе исполнителя."""
+    return datetime.combine(deadline, deadline_time, tzinfo=get_timezone(tz_name)).astimezone(timezone.utc)
+
+
+def reminder_rows(
+    task_id: int,
+    deadline_at: datetime,
+    offsets_minutes: Iterable[int],
+    now: datetime,
+) -> List[dict]:
+    """Строки task_reminders для задачи; напоминания в прошлом не создаём."""
+    rows = []
+    for offset in sorted(set(offsets_minutes), reverse=True):
+        fire_at = deadline_at - timedelta(minutes=offset)
+        if fire_at > now:
+            rows.append({"task_id": task_id, "fire_at": fire_at, "offset_minutes": offset})
+    return rows
+
+
+async def schedule_reminders(session: AsyncSession, rows: Sequence[dict]) -> None:
+    if rows:
+        await session.execute(insert(TaskReminder), list(rows))
+
+
+async def cancel_reminders(session: AsyncSession, task_ids: Iterable[int]) -> None:
+    """Убирает неотправленные напоминания закрытых задач."""
+    ids = sorted(set(task_ids))
+    if ids:
+        await session.execute(
+            delete(TaskReminder).where(TaskReminder.task_id.in_(ids), TaskReminder.sent_at.is_(None))
+        )
+
+
+def _fmt_offset(minutes: int) -> str:
+    if minutes == 0:
+        return "дедлайн наступил"
+    if minutes % 1440 == 0:
+        return f"до дедлайна {minutes // 1440} дн."
+    if minutes % 60 == 0:
+        return f"до дедлайна {minutes // 60} ч"
+    return f"до дедлайна {minutes} мин"
+
+
+def render_reminder(task_id: int, title: str, deadline: date, offset_minutes: int) -> str:
+    d = deadline.strftime("%d.%m.%Y")
+    return f"⏰ Напоминание: #{task_id} — {title} ({_fmt_offset(offset_minutes)}, {d})"
+
+
+class ReminderEngine:
+    """
+    Срабатывание напоминаний без периодического сканирования всей таблицы.
+
+    В памяти — только min-heap (время, id) ближайшего окна (`window`). Окно
+    подгружается по частичному индексу `fire_at WHERE sent_at IS NULL`; новые
+    напоминания внутри уже загруженного окна подтягиваются дельта-запросом по
+    возрастающему id. Закрытые задачи отсеиваются в момент срабатывания.
+    Сработавшие напоминания помечаются sent_at и кладутся в outbox в одной транзакции.
+    """
+
+    def __init__(
+        self,
+        session_maker: async_sessionmaker[AsyncSession],
+        *,
+        window: timedelta = timedelta(minutes=10),
+        refresh_interval: float = 15.0,
+    ) -> None:
+        self._session_maker = session_maker
+        self._window = window
+        self._refresh_interval = refresh_interval
+        self._heap: List[Tuple[float, int]] = []
+        self._known: Set[int] = set()
+        self._loaded_until: Optional[datetime] = None
+        self._max_seen_id = 0
+        self.fired = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._heap)
+
+    async def run(self) -> None:
+        logger.info("Запуск напоминаний (окно %s)", self._window)
+        last_refresh = 0.0
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                now = datetime.now(timezone.utc)
+                if self._loaded_until is None or now + self._window / 2 >= self._loaded_until:
+                    await self._load_window(now)
+                    last_refresh = loop.time()
+                elif loop.time() - last_refresh >= self._refresh_interval:
+                    await self._load_new()
+                    last_refresh = loop.time()
+                await self._fire_due(datetime.now(timezone.utc))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Ошибка в цикле напоминаний")
+
+            # Спим до ближайшего напоминания или до следующей подгрузки
+            sleep_for = self._refresh_interval
+            if self._heap:
+                sleep_for = min(sleep_for, max(0.0, self._heap[0][0] - datetime.now(timezone.utc).timestamp()))
+            await asyncio.sleep(max(sleep_for, 0.05))
+
+    def _push(self, rows: Iterable[Tuple[int, datetime]]) -> None:
+        for reminder_id, fire_at in rows:
+            self._max_seen_id = max(self._max_seen_id, reminder_id)
+            if reminder_id in self._known:
+                continue
+            self._known.add(reminder_id)
+            heapq.heappush(self._heap, (fire_at.timestamp(), reminder_id))
+
+    async def _load_window(self, now: datetime) -> None:
+        """
+        Сдвигает окно: всё неотправленное до now + window. Без нижней границы —
+        чтобы подобрать пропущенное во время простоя и поздно закоммиченные строки
+        (частичный индекс содержит только неотправленные, их немного).
+        """
+        until = now + self._window
+        stmt = select(TaskReminder.id, TaskReminder.fire_at).where(
+            TaskReminder.sent_at.is_(None), TaskReminder.fire_at < until
+        )
+        async with self._session_maker() as session:
+            q = await session.execute(stmt)
+            self._push(q.all())
+            if self._loaded_until is None:
+                q = await session.execute(select(func.max(TaskReminder.id)))
+                self._max_seen_id = max(self._max_seen_id, q.scalar() or 0)
+        self._loaded_until = until
+
+    async def _load_new(self) -> None:
+        """Напоминания, созданные после последней подгрузки и попадающие в текущее окно."""
+        async with self._session_maker() as session:
+            q = await session.execute(
+                select(TaskReminder.id, TaskReminder.fire_at).where(
+                    TaskReminder.id > self._max_seen_id,
+                    TaskReminder.sent_at.is_(None),
+                )
+            )
+            rows = q.all()
+        self._max_seen_id = max([self._max_seen_id, *(r[0] for r in rows)])
+        self._push((rid, fire_at) for rid, fire_at in rows if fire_at < self._loaded_until)
+
+    async def _fire_due(self, now: datetime) -> None:
+        ts = now.timestamp()
+        while self._heap and self._heap[0][0] <= ts:
+            batch: List[int] = []
+            while self._heap and self._heap[0][0] <= ts and len(batch) < FIRE_BATCH_SIZE:
+                _, reminder_id = heapq.heappop(self._heap)
+                self._known.discard(reminder_id)
+                batch.append(reminder_id)
+            await self._fire(batch, now)
+
+    async def _fire(self, reminder_ids: List[int], now: datetime) -> None:
+        async with self._session_maker() as session:
+            # Помечаем сразу все — и отменённые задачи тоже, чтобы не возвращаться к ним
+            q = await session.execute(
+                update(TaskReminder)
+                .where(TaskReminder.id.in_(reminder_ids), TaskReminder.sent_at.is_(None))
+                .values(sent_at=now)
+                .returning(TaskReminder.id)
+            )
+            claimed = [r[0] for r in q.all()]
+            if not claimed:
+                await session.commit()
+                return
+            q = await session.execute(
+                select(User.id, User.tg_id, Task.id, Task.title, Task.deadline, TaskReminder.offset_minutes)
+                .join(Task, Task.id == TaskReminder.task_id)
+                .join(User, User.id == Task.assignee_id)
+                .where(
+                    TaskReminder.id.in_(claimed),
+                    Task.status == "open",
+                    User.tg_id.is_not(None),
+                    User.unreachable_at.is_(None),
+                )
+            )
+            rows = q.all()
+            for user_id, tg_id, task_id, title, deadline, offset in rows:
+                enqueue_notification(session, tg_id, render_reminder(task_id, title, deadline, offset), user_id=user_id)
+            await session.commit()
+        self.fired += len(rows)
+        wake_dispatcher()
@@ -1,20 +1,116 @@
 from __future__ import annotations
 
-from datetime import date, datetime, timedelta, timezone
-from typing import Iterable, List, Optional, Tuple
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
 from aiogram.types import Chat as TgChat, User as TgUser
-from sqlalchemy import and_, select, update
+from sqlalchemy import Integer, Select, and_, any_, bindparam, delete, insert, literal, or_, select, tuple_, update
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.models import User, Chat, Task
+from app.db.models import User, Chat, Task, TaskArchive
+from app.db.session import on_commit
+from app.services.board import boards_changed
+from app.services.view_cache import views_changed
+from app.utils.parsing import TaskCommand
+from app.services.identity import (
+    CachedChat,
+    CachedUser,
+    chat_cache,
+    chat_profile,
+    record_skipped_write,
+    record_write,
+    user_cache,
+    user_profile,
+)
 
 
 # --- Вспомогательные функции по пользователям/чатам ---
 
-async def upsert_user_from_tg(session: AsyncSession, tg_user: TgUser) -> User:
-    """Найти пользователя по tg_id или создать/обновить его профиль."""
-    q = await session.execute(select(User).where(User.tg_id == tg_user.id))
+# Горячие поиски — готовые конструкции с bindparam: строятся один раз при импорте,
+# ключ кэша компиляции у них постоянный, и prime_statements компилирует их до первого апдейта
+_USER_BY_TG_ID = select(User).where(User.tg_id == bindparam("tg_id"))
+_CHAT_BY_TG_ID = select(Chat).where(Chat.tg_chat_id == bindparam("tg_chat_id"))
+_USER_BY_USERNAME_LC = select(User).where(User.username_lc == bindparam("username_lc"))
+
+# Худший случай по числу SQL-запросов (холодный кэш) — из них складываются
+# бюджеты хендлеров, flags={"query_budget": ...}
+# NOTIFY — инвалидация кэша представлений, только если webhook-воркеров несколько
+UPSERT_USER_QUERIES = 7      # SELECT, INSERT, поиск ника, слияние заглушки (2 + NOTIFY), username_lc
+GET_CHAT_QUERIES = 2         # SELECT, INSERT/UPDATE
+STUB_USER_QUERIES = 3        # SELECT, INSERT ... ON CONFLICT, повторный SELECT
+CREATE_TASK_QUERIES = 2      # INSERT задачи, NOTIFY
+BULK_CREATE_QUERIES = 5      # на пачку до 1000 строк: исполнители (SELECT, INSERT, SELECT), INSERT задач, NOTIFY
+CLOSE_TASKS_QUERIES = 3      # UPDATE ... RETURNING, NOTIFY, SELECT причин отказа (tasks + архив)
+
+def normalize_username(username: Optional[str]) -> Optional[str]:
+    """Ключ для поиска по username: без '@' и в нижнем регистре."""
+    if not username:
+        return None
+    return username.lstrip("@").lower() or None
+
+
+async def merge_stub_user(session: AsyncSession, *, stub_id: int, into_id: int) -> None:
+    """Переносит задачи заглушки на настоящего пользователя и удаляет заглушку."""
+    # Заглушки не создают задач и не получают уведомлений — достаточно assignee_id
+    await session.execute(update(Task).where(Task.assignee_id == stub_id).values(assignee_id=into_id))
+    await session.execute(delete(User).where(User.id == stub_id, User.tg_id.is_(None)))
+    await views_changed(session, [into_id])
+
+
+async def _claim_username(session: AsyncSession, user_id: int, username_lc: str) -> None:
+    """
+    Освобождает username для пользователя user_id перед записью в уникальный username_lc:
+    заглушку с тем же именем сливаем в него, у другого реального пользователя
+    (сменившего ник в Telegram) ключ сбрасываем.
+    """
+    q = await session.execute(
+        select(User.id, User.tg_id).where(User.username_lc == username_lc, User.id != user_id)
+    )
+    other = q.one_or_none()
+    if other is None:
+        return
+    if other.tg_id is None:
+        await merge_stub_user(session, stub_id=other.id, into_id=user_id)
+    else:
+        await session.execute(update(User).where(User.id == other.id).values(username_lc=None))
+
+
+async def upsert_user_from_tg(session: AsyncSession, tg_user: TgUser) -> CachedUser:
+    """
+    Найти пользователя по tg_id или создать/обновить его профиль.
+    Если пользователь есть в кэше и профиль не менялся — в БД не ходим вовсе.
+    Возвращает не ORM-объект, а CachedUser (id, tg_id, профиль, пояс): остальные
+    столбцы из кэша неизвестны — кому нужны, читает их запросом.
+    """
+    profile = user_profile(tg_user)
+    username_lc = normalize_username(tg_user.username)
+    cached = user_cache.get(tg_user.id)
+    if cached is not None:
+        if cached.profile == profile:
+            record_skipped_write("users")
+            return cached
+        # Профиль поменялся — UPDATE по первичному ключу, без SELECT
+        username, first_name, last_name = profile
+        q = await session.execute(
+            update(User)
+            .where(User.id == cached.id)
+            .values(username=username, first_name=first_name, last_name=last_name)
+        )
+        if q.rowcount:
+            if username_lc != normalize_username(cached.profile[0]):
+                if username_lc:
+                    await _claim_username(session, cached.id, username_lc)
+                await session.execute(update(User).where(User.id == cached.id).values(username_lc=username_lc))
+            record_write("users")
+            fresh = CachedUser(id=cached.id, tg_id=tg_user.id, profile=profile, timezone=cached.timezone)
+            on_commit(session, lambda: user_cache.put(tg_user.id, fresh))
+            return fresh
+        # Строки уже нет — идём обычным путём
+        user_cache.pop(tg_user.id)
+
+    q = await session.execute(_USER_BY_TG_ID, {"tg_id": tg_user.id})
     user = q.scalar_one_or_none()
     if user is None:
         user = User(
@@ -22,20 +118,83 @@ async def upsert_user_from_tg(session: AsyncSession, tg_user: TgUser) -> User:
             username=tg_user.username,
             first_name=tg_user.first_name,
             last_name=tg_user.last_name,
+            timezone=None,
         )
         session.add(user)
         await session.flush()
-    else:
-        # Обновим основные поля, если изменились
+        if username_lc:
+            # Если кто-то уже ставил задачи на этот @username — забираем их себе
+            await _claim_username(session, user.id, username_lc)
+            user.username_lc = username_lc
+            await session.flush()
+        record_write("users")
+    elif (user.username, user.first_name, user.last_name, user.username_lc) != (*profile, username_lc):
+        # Обновим основные поля, только если изменились
+        if username_lc and user.username_lc != username_lc:
+            await _claim_username(session, user.id, username_lc)
         user.username = tg_user.username
+        user.username_lc = username_lc
         user.first_name = tg_user.first_name
         user.last_name = tg_user.last_name
         await session.flush()
-    return user
+        record_write("users")
+    else:
+        record_skipped_write("users")
+
+    entry = CachedUser(id=user.id, tg_id=tg_user.id, profile=profile, timezone=user.timezone)
+    on_commit(session, lambda: user_cache.put(tg_user.id, entry))
+    return entry
+
+
+async def update_digest_settings(
+    session: AsyncSession,
+    user: CachedUser,
+    *,
+    tz_name: Optional[str],
+    digest_time: Optional[time],
+    next_digest_at: datetime,
+) -> None:
+    """Сохраняет пояс/время дайджеста и сбрасывает кэш пользователя после commit."""
+    await session.execute(
+        update(User)
+        .where(User.id == user.id)
+        .values(timezone=tz_name, digest_time=digest_time, next_digest_at=next_digest_at)
+    )
+    tg_id = user.tg_id
+    on_commit(session, lambda: user_cache.pop(tg_id))
 
 
-async def get_or_create_chat(session: AsyncSession, tg_chat: TgChat) -> Chat:
-    q = await session.execute(select(Chat).where(Chat.tg_chat_id == tg_chat.id))
+async def mark_user_reachable(session: AsyncSession, user_id: int) -> None:
+    """Снимает пометку «недоступен» (пользователь снова написал боту)."""
+    await session.execute(
+        update(User).where(User.id == user_id, User.unreachable_at.is_not(None)).values(unreachable_at=None)
+    )
+
+
+async def mark_users_unreachable(session: AsyncSession, user_ids: Iterable[int]) -> None:
+    """Помечает пользователей недоступными, чтобы следующие рассылки их пропускали."""
+    ids = sorted(set(user_ids))
+    if not ids:
+        return
+    await session.execute(
+        update(User)
+        .where(User.id.in_(ids), User.unreachable_at.is_(None))
+        .values(unreachable_at=datetime.now(timezone.utc))
+    )
+
+
+async def get_or_create_chat(session: AsyncSession, tg_chat: TgChat) -> CachedChat:
+    """
+    Найти чат по tg_chat_id или создать; пишет в БД, только если что-то изменилось.
+    Возвращает CachedChat, как upsert_user_from_tg, — не ORM-объект.
+    """
+    profile = chat_profile(getattr(tg_chat, "title", None), tg_chat.type)
+    cached = chat_cache.get(tg_chat.id)
+    if cached is not None and cached.profile == profile:
+        record_skipped_write("chats")
+        return cached
+
+    q = await session.execute(_CHAT_BY_TG_ID, {"tg_chat_id": tg_chat.id})
     chat = q.scalar_one_or_none()
     if chat is None:
         chat = Chat(
@@ -45,27 +204,47 @@ async def get_or_create_chat(session: AsyncSession, tg_chat: TgChat) -> Chat:
         )
         session.add(chat)
         await session.flush()
+        record_write("chats")
     else:
-        chat.title = getattr(tg_chat, "title", chat.title)
-        chat.type = tg_chat.type or chat.type
-        await session.flush()
-    return chat
+        title = getattr(tg_chat, "title", chat.title)
+        type_ = tg_chat.type or chat.type
+        if (chat.title, chat.type) != (title, type_):
+            chat.title = title
+            chat.type = type_
+            await session.flush()
+            record_write("chats")
+        else:
+            record_skipped_write("chats")
+
+    entry = CachedChat(id=chat.id, tg_chat_id=tg_chat.id, profile=(chat.title, chat.type))
+    on_commit(session, lambda: chat_cache.put(tg_chat.id, entry))
+    return entry
 
 
 async def get_or_stub_user_by_username(session: AsyncSession, username: str) -> User:
-    """Получить исполнителя по username, создать заглушку если нет (tg_id=None)."""
-    username = username.lower()
-    q = await session.execute(select(User).where(User.username.ilike(username)))
+    """
+    Получить исполнителя по username, создать заглушку если нет (tg_id=None).
+    Поиск — одно обращение к уникальному индексу по username_lc.
+    """
+    username_lc = normalize_username(username)
+    if username_lc is None:
+        raise ValueError("Пустой username")
+    q = await session.execute(_USER_BY_USERNAME_LC, {"username_lc": username_lc})
+    user = q.scalar_one_or_none()
+    if user is not None:
+        return user
+
+    # Параллельный /task мог успеть создать ту же заглушку — не падаем на уникальном индексе
+    q = await session.execute(
+        pg_insert(User)
+        .values(tg_id=None, username=username_lc, username_lc=username_lc)
+        .on_conflict_do_nothing(index_elements=[User.username_lc])
+        .returning(User)
+    )
     user = q.scalar_one_or_none()
     if user is None:
-        user = User(
-            tg_id=None,
-            username=username,
-            first_name=None,
-            last_name=None,
-        )
-        session.add(user)
-        await session.flush()
+        q = await session.execute(_USER_BY_USERNAME_LC, {"username_lc": username_lc})
+        user = q.scalar_one()
     return user
 
 
@@ -74,8 +253,8 @@ async def get_or_stub_user_by_username(session: AsyncSession, username: str) ->
 async def create_task(
     session: AsyncSession,
     *,
-    chat: Chat,
-    creator: User,
+    chat: CachedChat,
+    creator: CachedUser,
     assignee: User,
     title: str,
     deadline: date,
@@ -94,82 +273,293 @@ async def create_task(
     )
     session.add(task)
     await session.flush()
+    await views_changed(session, [assignee.id])
+    boards_changed(session, [chat.id])
     return task
 
 
-async def fetch_open_tasks_for_user(session: AsyncSession, user: User) -> List[Task]:
-    q = await session.execute(
-        select(Task)
-        .where(Task.assignee_id == user.id, Task.status == "open")
-        .order_by(Task.deadline.asc(), Task.id.asc())
-        .limit(200)
-    )
-    return list(q.scalars().all())
+# --- Пакетное создание задач ---
 
+# Не больше стольких значений в одном IN / многострочном VALUES (лимит параметров PostgreSQL — 32767)
+IN_CHUNK = 5000
+MAX_BULK_TASKS = 10_000
 
-async def fetch_tasks_today(session: AsyncSession, user: User, today: date) -> List[Task]:
-    q = await session.execute(
-        select(Task)
-        .where(Task.assignee_id == user.id, Task.status == "open", Task.deadline == today)
-        .order_by(Task.deadline.asc(), Task.id.asc())
-    )
-    return list(q.scalars().all())
 
+@dataclass(frozen=True)
+class Assignee:
+    id: int
+    tg_id: Optional[int]
+    username: Optional[str]
+    timezone: Optional[str]
 
-async def fetch_tasks_week(session: AsyncSession, user: User, today: date) -> List[Task]:
-    end = today + timedelta(days=7)
-    q = await session.execute(
-        select(Task)
-        .where(Task.assignee_id == user.id, Task.status == "open", Task.deadline >= today, Task.deadline <= end)
-        .order_by(Task.deadline.asc(), Task.id.asc())
-    )
-    return list(q.scalars().all())
 
+def _chunks(items: List, size: int = IN_CHUNK):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
 
-async def fetch_tasks_overdue(session: AsyncSession, user: User, today: date) -> List[Task]:
-    q = await session.execute(
-        select(Task)
-        .where(Task.assignee_id == user.id, Task.status == "open", Task.deadline < today)
-        .order_by(Task.deadline.asc(), Task.id.asc())
+
+async def resolve_assignees(session: AsyncSession, usernames: Iterable[str]) -> Dict[str, Assignee]:
+    """
+    Исполнители по username (ключ — normalize_username) одним IN-запросом;
+    недостающим — заглушки одним многострочным INSERT ... ON CONFLICT DO NOTHING.
+    """
+    keys = sorted({k for k in map(normalize_username, usernames) if k})
+    columns = (User.id, User.tg_id, User.username, User.timezone, User.username_lc)
+    found: Dict[str, Assignee] = {}
+
+    async def load(chunk: List[str]) -> None:
+        q = await session.execute(select(*columns).where(User.username_lc.in_(chunk)))
+        for user_id, tg_id, username, tz_name, username_lc in q.all():
+            found[username_lc] = Assignee(user_id, tg_id, username, tz_name)
+
+    for chunk in _chunks(keys):
+        await load(chunk)
+
+    missing = [k for k in keys if k not in found]
+    for chunk in _chunks(missing):
+        q = await session.execute(
+            pg_insert(User)
+            .values([{"tg_id": None, "username": k, "username_lc": k} for k in chunk])
+            .on_conflict_do_nothing(index_elements=[User.username_lc])
+            .returning(*columns)
+        )
+        for user_id, tg_id, username, tz_name, username_lc in q.all():
+            found[username_lc] = Assignee(user_id, tg_id, username, tz_name)
+        # Заглушки, созданные параллельно другим /task, — перечитываем
+        raced = [k for k in chunk if k not in found]
+        if raced:
+            await load(raced)
+    return found
+
+
+async def create_tasks_bulk(
+    session: AsyncSession,
+    *,
+    chat: CachedChat,
+    creator: CachedUser,
+    items: Sequence[TaskCommand],
+    origin_message_id: Optional[int] = None,
+) -> List[Tuple[int, TaskCommand, Assignee]]:
+    """
+    Много задач за раз: исполнители — IN-запросом, задачи — многострочным
+    INSERT ... RETURNING (SQLAlchemy режет его на страницы по 1000 строк).
+    Возвращает (id задачи, строка, исполнитель) в порядке items.
+    """
+    if len(items) > MAX_BULK_TASKS:
+        raise ValueError(f"Не больше {MAX_BULK_TASKS} задач за раз")
+    assignees = await resolve_assignees(session, (item.assignee_username for item in items))
+    rows = []
+    for item in items:
+        rows.append({
+            "chat_id": chat.id,
+            "creator_id": creator.id,
+            "assignee_id": assignees[normalize_username(item.assignee_username)].id,
+            "title": item.title,
+            "deadline": item.deadline,
+            "status": "open",
+            "origin_message_id": origin_message_id,
+        })
+    if not rows:
+        return []
+    q = await session.execute(insert(Task).returning(Task.id, sort_by_parameter_order=True), rows)
+    task_ids = list(q.scalars().all())
+    await views_changed(session, (row["assignee_id"] for row in rows))
+    boards_changed(session, [chat.id])
+    return [
+        (task_id, item, assignees[normalize_username(item.assignee_username)])
+        for task_id, item in zip(task_ids, items)
+    ]
+
+
+# --- Постраничные представления задач (/my, /today, /week, /overdue) ---
+
+VIEW_PAGE_SIZE = 20
+TASK_VIEWS = ("my", "today", "week", "overdue")
+
+
+@dataclass(frozen=True)
+class TaskRow:
+    id: int
+    title: str
+    deadline: date
+    chat_title: Optional[str]
+
+
+@dataclass(frozen=True)
+class ViewCursor:
+    """Позиция в выборке по ключу (deadline, id)."""
+    deadline: date
+    id: int
+
+
+@dataclass
+class TaskPage:
+    view: str
+    rows: List[TaskRow]
+    has_prev: bool
+    has_next: bool
+
+    @property
+    def first(self) -> Optional[ViewCursor]:
+        return ViewCursor(self.rows[0].deadline, self.rows[0].id) if self.rows else None
+
+    @property
+    def last(self) -> Optional[ViewCursor]:
+        return ViewCursor(self.rows[-1].deadline, self.rows[-1].id) if self.rows else None
+
+
+def _view_conditions(view: str, today: date) -> list:
+    if view == "my":
+        return []
+    if view == "today":
+        return [Task.deadline == today]
+    if view == "week":
+        return [Task.deadline >= today, Task.deadline <= today + timedelta(days=7)]
+    if view == "overdue":
+        return [Task.deadline < today]
+    raise ValueError(f"Неизвестное представление: {view}")
+
+
+def task_view_query(
+    user_id: int,
+    view: str,
+    today: date,
+    *,
+    after: Optional[ViewCursor] = None,
+    before: Optional[ViewCursor] = None,
+    limit: int = VIEW_PAGE_SIZE,
+) -> Select:
+    """Запрос одной страницы представления (берёт limit + 1 строку, чтобы узнать про следующую)."""
+    key = tuple_(Task.deadline, Task.id)
+    stmt = (
+        select(Task.id, Task.title, Task.deadline, Chat.title)
+        .join(Chat, Chat.id == Task.chat_id)
+        .where(Task.assignee_id == user_id, Task.status == "open", *_view_conditions(view, today))
+        .limit(limit + 1)
     )
-    return list(q.scalars().all())
+    if before is not None:
+        return stmt.where(key < tuple_(before.deadline, before.id)).order_by(Task.deadline.desc(), Task.id.desc())
+    if after is not None:
+        stmt = stmt.where(key > tuple_(after.deadline, after.id))
+    return stmt.order_by(Task.deadline.asc(), Task.id.asc())
 
 
-async def mark_task_done(
+async def fetch_task_view(
     session: AsyncSession,
+    user_id: int,
+    view: str,
+    today: date,
     *,
-    task_id: int,
-    closer: User,
-    allow_creator_close: bool = True,
-) -> Tuple[Optional[Task], str]:
-    """Отмечает задачу выполненной, если closer — исполнитель или (опционально) создатель."""
-    q = await session.execute(select(Task).where(Task.id == task_id))
-    task = q.scalar_one_or_none()
-    if task is None:
-        return None, "Задача с таким ID не найдена."
-
-    if task.status != "open":
-        return task, f"Задача уже имеет статус '{task.status}'."
-
-    can_close = closer.id == task.assignee_id or (allow_creator_close and closer.id == task.creator_id)
-    if not can_close:
-        return None, "У вас нет прав закрывать эту задачу."
-
-    task.status = "done"
-    task.closed_at = datetime.now(timezone.utc)
-    await session.flush()
-    return task, "ok"
+    after: Optional[ViewCursor] = None,
+    before: Optional[ViewCursor] = None,
+    limit: int = VIEW_PAGE_SIZE,
+) -> TaskPage:
+    """
+    Одна страница открытых задач исполнителя вместе с названиями чатов — одним запросом.
+    Пагинация по ключу (deadline, id): `after` — следующая страница, `before` — предыдущая.
+    """
+    stmt = task_view_query(user_id, view, today, after=after, before=before, limit=limit)
+    q = await session.execute(stmt)
+    rows = [TaskRow(id=r[0], title=r[1], deadline=r[2], chat_title=r[3]) for r in q.all()]
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if before is not None:
+        rows.reverse()
+        return TaskPage(view=view, rows=rows, has_prev=has_more, has_next=True)
+    return TaskPage(view=view, rows=rows, has_prev=after is not None, has_next=has_more)
+
+
+@dataclass(frozen=True)
+class ClosedTask:
+    id: int
+    title: str
+    assignee_id: int
+    chat_id: int
+    tg_chat_id: int
+    # Есть ли в чате доска (/board) — тогда закрытие видно на ней
+    board_message_id: Optional[int] = None
 
 
-# --- Выборки для дайджестов ---
+@dataclass
+class CloseResult:
+    closed: List[ClosedTask]
+    # id → причина, по которой задача не закрыта
+    failed: Dict[int, str]
+
+
+async def close_tasks(
+    session: AsyncSession,
+    *,
+    task_ids: Sequence[int],
+    closer_id: int,
+    allow_creator_close: bool = True,
+) -> CloseResult:
+    """
+    Закрывает задачи одним условным UPDATE ... RETURNING: проверка статуса и прав —
+    в WHERE, поэтому два параллельных /done не закроют задачу дважды. Чат для
+    уведомления берётся тем же запросом (UPDATE ... FROM chats).
+    Причины отказа дочитываются вторым запросом — только если что-то не закрылось.
+    """
+    ids = sorted(set(task_ids))
+    if not ids:
+        return CloseResult(closed=[], failed={})
+    id_list = bindparam("task_ids", ids, type_=ARRAY(Integer))
+    allowed = Task.assignee_id == closer_id
+    if allow_creator_close:
+        allowed = or_(allowed, Task.creator_id == closer_id)
 
-async def users_with_open_tasks(session: AsyncSession) -> List[User]:
-    # все пользователи, у которых есть открытые задачи и есть tg_id
     q = await session.execute(
-        select(User).where(
-            User.tg_id.is_not(None)
-        ).where(
-            User.id.in_(select(Task.assignee_id).where(Task.status == "open"))
-        )
+        update(Task)
+        .where(Task.id == any_(id_list), Task.status == "open", allowed, Chat.id == Task.chat_id)
+        .values(status="done", closed_at=datetime.now(timezone.utc))
+        .returning(Task.id, Task.title, Task.assignee_id, Task.chat_id, Chat.tg_chat_id, Chat.board_message_id)
+        .execution_options(synchronize_session=False)
     )
-    return list(q.scalars().all())
+    closed = sorted((ClosedTask(*row) for row in q.all()), key=lambda t: t.id)
+    await views_changed(session, (t.assignee_id for t in closed))
+    boards_changed(session, (t.chat_id for t in closed))
+
+    failed: Dict[int, str] = {}
+    closed_ids = {t.id for t in closed}
+    rest = [task_id for task_id in ids if task_id not in closed_ids]
+    if rest:
+        rest_ids = bindparam("rest_ids", rest, type_=ARRAY(Integer))
+        # Давно закрытые задачи уже перенесены в архив — ищем и там, тем же запросом
+        q = await session.execute(
+            select(Task.id, Task.status, literal(False).label("archived"))
+            .where(Task.id == any_(rest_ids))
+            .union_all(
+                select(TaskArchive.id, TaskArchive.status, literal(True)).where(TaskArchive.id == any_(rest_ids))
+            )
+        )
+        statuses = {task_id: (status, archived) for task_id, status, archived in q.all()}
+        for task_id in rest:
+            status, archived = statuses.get(task_id, (None, False))
+            if status is None:
+                failed[task_id] = "Задача с таким ID не найдена."
+            elif archived:
+                failed[task_id] = f"Задача уже имеет статус '{status}' и перенесена в архив."
+            elif status != "open":
+                failed[task_id] = f"Задача уже имеет статус '{status}'."
+            else:
+                failed[task_id] = "У вас нет прав закрывать эту задачу."
+    return CloseResult(closed=closed, failed=failed)
+
+
+async def prime_statements(session: AsyncSession, today: date) -> int:
+    """
+    Выполняет горячие запросы с заведомо пустым результатом (id 0 в БД не бывает),
+    чтобы SQLAlchemy скомпилировал их в кэш движка, а asyncpg подготовил на этом
+    соединении. Вставки не выполняются — они расходовали бы последовательности;
+    закрытие с пустым UPDATE ничего не меняет. Вызывающий делает rollback.
+    Возвращает число выполненных запросов.
+    """
+    await session.execute(_USER_BY_TG_ID, {"tg_id": 0})
+    await session.execute(_CHAT_BY_TG_ID, {"tg_chat_id": 0})
+    await session.execute(_USER_BY_USERNAME_LC, {"username_lc": ""})
+    for view in TASK_VIEWS:
+        await fetch_task_view(session, 0, view, today)
+    # UPDATE ... RETURNING и запрос причин отказа (tasks + архив)
+    await close_tasks(session, task_ids=[0], closer_id=0)
+    return 3 + len(TASK_VIEWS) + 2
@@ -0,0 +1,208 @@
+"""
+Ограничение частоты входящих команд — до того, как апдейт откроет сессию БД.
+
+Лимиты — token bucket'ы на пользователя, на групповой чат и (если задано) на
+пользователя и команду. Состояние ведер хранит бэкенд: в памяти процесса или
+общий для всех воркеров (Redis — тогда лимит действует на весь бот, а не на
+каждый процесс отдельно).
+"""
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Protocol, Sequence, Tuple
+
+from aiogram import types
+
+from app.config import Config
+from app.utils.ratelimit import Rate, TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Идемпотентные чтения: лишние нажатия не выбрасываются, а схлопываются в последнее
+COALESCED_COMMANDS = frozenset({"my", "today", "week", "overdue", "tp"})
+# Дольше этого схлопнутый апдейт не ждёт — выбрасывается
+COALESCE_MAX_DELAY = 3.0
+
+_BUCKETS_SOFT_LIMIT = 10_000
+# Ошибки общего бэкенда логируем не чаще раза в столько секунд
+_BACKEND_ERROR_LOG_INTERVAL = 60.0
+
+
+@dataclass(frozen=True)
+class ThrottleSettings:
+    user: Optional[Rate] = Rate(capacity=5, per_second=0.5)
+    chat: Optional[Rate] = Rate(capacity=20, per_second=2.0)
+    # Отдельные лимиты команд на пользователя (поверх общего)
+    commands: Dict[str, Optional[Rate]] = field(default_factory=dict)
+
+    @classmethod
+    def from_config(cls, config: Config) -> "ThrottleSettings":
+        return cls(user=config.throttle_user, chat=config.throttle_chat, commands=dict(config.throttle_commands))
+
+    @property
+    def enabled(self) -> bool:
+        return self.user is not None or self.chat is not None or any(self.commands.values())
+
+
+class ThrottleBackend(Protocol):
+    async def take(self, buckets: Sequence[Tuple[str, Rate]]) -> Tuple[float, int]:
+        """
+        Берёт по токену из всех ведер (ключ, лимит) сразу или ни из одного. (0, -1) — можно,
+        иначе (через сколько секунд наберутся все токены, номер самого долгого ведра).
+        """
+
+    async def close(self) -> None:
+        ...
+
+
+class MemoryThrottleBackend:
+    """Ведра в памяти процесса: у каждого воркера свои лимиты."""
+
+    def __init__(self) -> None:
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    def _bucket(self, key: str, rate: Rate, now: float) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= _BUCKETS_SOFT_LIMIT:
+                for stale in [k for k, b in self._buckets.items() if b.is_idle(now)]:
+                    del self._buckets[stale]
+            bucket = self._buckets[key] = TokenBucket(rate.per_second, capacity=rate.capacity)
+        return bucket
+
+    async def take(self, buckets: Sequence[Tuple[str, Rate]]) -> Tuple[float, int]:
+        now = time.monotonic()
+        found = [self._bucket(key, rate, now) for key, rate in buckets]
+        waits = [bucket.wait_time(now=now) for bucket in found]
+        worst = max(range(len(waits)), key=waits.__getitem__, default=-1)
+        if worst >= 0 and waits[worst] > 0:
+            return waits[worst], worst
+        for bucket in found:
+            bucket.try_acquire(now=now)
+        return 0.0, -1
+
+    async def close(self) -> None:
+        self._buckets.clear()
+
+
+# Token bucket'ы целиком на стороне Redis: атомарно и по часам сервера Redis,
+# поэтому воркеры на разных машинах видят одни ведра. Сначала проверяются все
+# ведра апдейта, токены списываются, только если хватает во всех.
+# ARGV: rate, capacity для каждого ключа по порядку
+_REDIS_TAKE = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local tokens = {}
+local worst, worst_i = 0, 0
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[2 * i - 1])
+    local capacity = tonumber(ARGV[2 * i])
+    local state = redis.call('HMGET', key, 'tokens', 'updated')
+    local value = tonumber(state[1]) or capacity
+    local updated = tonumber(state[2]) or now
+    value = math.min(capacity, value + math.max(0, now - updated) * rate)
+    tokens[i] = value
+    if value < 1 and (1 - value) / rate > worst then
+        worst, worst_i = (1 - value) / rate, i
+    end
+end
+if worst > 0 then
+    return {tostring(worst), worst_i - 1}
+end
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[2 * i - 1])
+    local capacity = tonumber(ARGV[2 * i])
+    redis.call('HSET', key, 'tokens', tokens[i] - 1, 'updated', now)
+    redis.call('EXPIRE', key, math.ceil(capacity / rate) + 1)
+end
+return {'0', -1}
+"""
+
+
+class RedisThrottleBackend:
+    """
+    Общие ведра в Redis для нескольких воркеров. Если Redis недоступен, апдейты
+    пропускаются без лимита — из-за лимитов бот не должен вставать. Ведра одного
+    апдейта берутся одним скриптом по нескольким ключам — нужен один инстанс Redis,
+    не кластер.
+    """
+
+    def __init__(self, url: str, *, prefix: str = "throttle:") -> None:
+        try:
+            from redis.asyncio import Redis
+        except ImportError as e:
+            raise RuntimeError("Для THROTTLE_REDIS_URL нужен пакет redis: pip install 'redis>=5'") from e
+        self._redis = Redis.from_url(url)
+        self._take = self._redis.register_script(_REDIS_TAKE)
+        self._prefix = prefix
+        self._error_logged_at = 0.0
+
+    async def take(self, buckets: Sequence[Tuple[str, Rate]]) -> Tuple[float, int]:
+        args: List[float] = []
+        for _, rate in buckets:
+            args += [rate.per_second, rate.capacity]
+        try:
+            wait, index = await self._take(keys=[self._prefix + key for key, _ in buckets], args=args)
+        except Exception as e:
+            now = time.monotonic()
+            if now - self._error_logged_at > _BACKEND_ERROR_LOG_INTERVAL:
+                self._error_logged_at = now
+                logger.warning("Redis для лимитов недоступен, пропускаем без ограничений: %s", e)
+            return 0.0, -1
+        return float(wait), int(index)
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+def build_throttle_backend(redis_url: str = "") -> ThrottleBackend:
+    return RedisThrottleBackend(redis_url) if redis_url else MemoryThrottleBackend()
+
+
+def update_command(update: types.Update) -> Optional[str]:
+    """
+    Что ограничивать: имя команды (/my@bot 12 -> 'my', кнопки клавиатуры — тоже команды)
+    или префикс callback data. Обычные сообщения не ограничиваются.
+    """
+    if update.message is not None:
+        text = update.message.text or ""
+        if not text.startswith("/"):
+            return None
+        return text[1:].split(maxsplit=1)[0].split("@", 1)[0].lower() if len(text) > 1 else None
+    if update.callback_query is not None:
+        return (update.callback_query.data or "").split(":", 1)[0] or None
+    return None
+
+
+class Throttler:
+    def __init__(self, settings: ThrottleSettings, backend: ThrottleBackend) -> None:
+        self.settings = settings
+        self.backend = backend
+
+    def _limits(self, user_id: Optional[int], chat_id: Optional[int], command: str) -> List[Tuple[str, str, Rate]]:
+        limits: List[Tuple[str, str, Rate]] = []
+        command_rate = self.settings.commands.get(command)
+        if user_id is not None:
+            if command_rate is not None:
+                limits.append(("command", f"u:{user_id}:{command}", command_rate))
+            if self.settings.user is not None:
+                limits.append(("user", f"u:{user_id}", self.settings.user))
+        if chat_id is not None and self.settings.chat is not None:
+            limits.append(("chat", f"c:{chat_id}", self.settings.chat))
+        return limits
+
+    async def check(self, user_id: Optional[int], chat_id: Optional[int], command: str) -> Tuple[float, str]:
+        """
+        Проходит ли апдейт все лимиты. Возвращает (0, '') или (сколько ждать, какой лимит
+        сработал: command | user | chat). Токены списываются со всех ведер сразу и только
+        если хватает везде: отказ по одному лимиту не расходует остальные.
+        """
+        limits = self._limits(user_id, chat_id, command)
+        if not limits:
+            return 0.0, ""
+        wait, index = await self.backend.take([(key, rate) for _, key, rate in limits])
+        if wait > 0:
+            return wait, limits[index][0]
+        return 0.0, ""
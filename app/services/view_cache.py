@@ -0,0 +1,142 @@
+"""
+Кэш отрисованных представлений (/my, /today, /week, /overdue) по ключу
+(пользователь, представление, локальная дата).
+
+У каждого пользователя есть версия; любые изменения его задач (создание,
+закрытие, переназначение) поднимают её после commit, и записи со старой
+версией больше не отдаются. Версия читается до запроса к БД, поэтому
+страница, отрисованная параллельно с изменением, в кэше не «залипнет».
+
+При нескольких процессах (webhook-воркеры) изменения рассылаются через
+PostgreSQL NOTIFY — он доставляется только после commit транзакции.
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import time
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Iterable, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app.db.session import on_commit
+from app.utils.lru import TTLCache
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "task_views_changed"
+# Полезная нагрузка NOTIFY ограничена 8000 байт; длиннее — сбрасываем весь кэш
+_NOTIFY_MAX_PAYLOAD = 7900
+
+
+@dataclass(frozen=True)
+class CachedView:
+    version: int
+    text: str
+    markup: Any = None
+
+
+_views: TTLCache[tuple, CachedView] = TTLCache(maxsize=20_000, ttl=300)
+# Версий больше, чем страниц: вытесненная версия заменяется новой — старые записи становятся промахом
+_versions: TTLCache[int, int] = TTLCache(maxsize=100_000, ttl=3600)
+# Когда (time.monotonic()) менялись задачи пользователя — чтобы сразу после этого не читать с отстающей реплики
+_changed_at: TTLCache[int, float] = TTLCache(maxsize=100_000, ttl=3600)
+_all_changed_at = 0.0
+_counter = itertools.count(1)
+_cross_process = False
+
+
+def configure_view_cache(*, maxsize: int, ttl: float, cross_process: bool = False) -> None:
+    global _cross_process
+    _views.configure(maxsize=maxsize, ttl=ttl)
+    _versions.configure(maxsize=max(1, maxsize * 5), ttl=max(ttl * 2, 3600))
+    _cross_process = cross_process and maxsize > 0
+
+
+def is_cross_process() -> bool:
+    return _cross_process
+
+
+def current_version(user_id: int) -> int:
+    version = _versions.get(user_id)
+    if version is None:
+        version = next(_counter)
+        _versions.put(user_id, version)
+    return version
+
+
+def get_view(user_id: int, view: str, day: date) -> Optional[CachedView]:
+    cached = _views.get((user_id, view, day))
+    if cached is None or cached.version != current_version(user_id):
+        return None
+    return cached
+
+
+def put_view(user_id: int, view: str, day: date, version: int, text: str, markup: Any = None) -> None:
+    _views.put((user_id, view, day), CachedView(version, text, markup))
+
+
+def last_change(user_id: int) -> Optional[float]:
+    changed = max(_changed_at.get(user_id) or 0.0, _all_changed_at)
+    return changed or None
+
+
+def _bump(user_ids: Iterable[int]) -> None:
+    now = time.monotonic()
+    for user_id in user_ids:
+        _versions.put(user_id, next(_counter))
+        _changed_at.put(user_id, now)
+
+
+def _bump_all() -> None:
+    global _all_changed_at
+    _views.clear()
+    _all_changed_at = time.monotonic()
+
+
+async def views_changed(session: AsyncSession, user_ids: Iterable[int]) -> None:
+    """Задачи этих исполнителей изменились: инвалидировать их представления после commit."""
+    ids = sorted(set(user_ids))
+    if not ids:
+        return
+    on_commit(session, lambda: _bump(ids))
+    if _cross_process:
+        payload = ",".join(map(str, ids))
+        if len(payload) > _NOTIFY_MAX_PAYLOAD:
+            payload = "*"
+        await session.execute(select(func.pg_notify(NOTIFY_CHANNEL, payload)))
+
+
+def _on_notify(connection: Any, pid: int, channel: str, payload: str) -> None:
+    if payload == "*":
+        _bump_all()
+    else:
+        _bump(int(v) for v in payload.split(",") if v)
+
+
+async def listen_for_changes(engine: AsyncEngine, *, retry_delay: float = 5.0) -> None:
+    """Слушает NOTIFY от других процессов на отдельном соединении (фоновая задача)."""
+    while True:
+        try:
+            async with engine.connect() as conn:
+                raw = await conn.get_raw_connection()
+                await raw.driver_connection.add_listener(NOTIFY_CHANNEL, _on_notify)
+                # Пока не слушали, могли пропустить изменения
+                _bump_all()
+                logger.info("Кэш представлений слушает %s", NOTIFY_CHANNEL)
+                while not raw.driver_connection.is_closed():
+                    await asyncio.sleep(retry_delay)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Потеряно соединение для NOTIFY, переподключаемся")
+        _bump_all()
+        await asyncio.sleep(retry_delay)
+
+
+def view_cache_stats() -> dict:
+    return _views.stats()
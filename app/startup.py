@@ -0,0 +1,125 @@
+"""
+Холодный старт: прогрев до первого апдейта и отчёт о времени старта.
+
+После перезапуска первые апдейты платили за настройку мапперов SQLAlchemy,
+компиляцию запросов, открытие соединений и подготовку statement'ов в asyncpg.
+`warm_start` делает всё это заранее: мапперы, пул (db.session.warm_up) и прогон
+горячих запросов (services.tasks.prime_statements) на каждом прогретом
+соединении. Время фаз, импорта и первого апдейта пишется в лог и в метрику
+`startup_seconds{process,phase}` — регрессии видны сразу после деплоя.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Dict, Iterator, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import configure_mappers
+
+from app.db.session import pool_settings, warm_up
+from app.metrics import STARTUP_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_report: Optional["StartupReport"] = None
+
+
+@dataclass
+class StartupReport:
+    process: str
+    # time.perf_counter() в начале импортов точки входа
+    started: float
+    phases: Dict[str, float] = field(default_factory=dict)
+    first_update: Optional[float] = None
+
+    def mark(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = seconds
+        STARTUP_SECONDS.labels(self.process, phase).set(seconds)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.mark(name, time.perf_counter() - started)
+
+    def summary(self) -> str:
+        return ", ".join(f"{name} {seconds * 1000:.0f} мс" for name, seconds in self.phases.items())
+
+
+def begin_startup(process: str, started: float) -> StartupReport:
+    """Заводит отчёт процесса; `started` — perf_counter() до импортов точки входа."""
+    global _report
+    _report = StartupReport(process=process, started=started)
+    _report.mark("imports", time.perf_counter() - started)
+    return _report
+
+
+def startup_report() -> Optional[StartupReport]:
+    return _report
+
+
+@contextmanager
+def _phase(name: str) -> Iterator[None]:
+    if _report is None:
+        yield
+        return
+    with _report.phase(name):
+        yield
+
+
+async def _prime_connections(session_maker: async_sessionmaker[AsyncSession], count: int) -> int:
+    # Импорт здесь: services.tasks тянет aiogram и кэши, а startup нужен и планировщику до них
+    from app.services.tasks import prime_statements
+
+    today = date.today()
+
+    async def prime_one() -> int:
+        async with session_maker() as session:
+            try:
+                return await prime_statements(session, today)
+            finally:
+                await session.rollback()
+
+    # Сессии открыты одновременно — каждая на своём соединении пула
+    results = await asyncio.gather(*(prime_one() for _ in range(max(1, count))), return_exceptions=True)
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if errors:
+        logger.warning("Прогрев запросов: ошибок %s из %s: %s", len(errors), len(results), errors[0])
+    return sum(r for r in results if not isinstance(r, BaseException))
+
+
+async def warm_start(session_maker: async_sessionmaker[AsyncSession], *, prime: bool = True) -> None:
+    """
+    Прогрев до первого апдейта: мапперы, соединения пула и (с `prime`) горячие запросы.
+    Ошибки прогрева только логируются — старт они не останавливают.
+    """
+    with _phase("mappers"):
+        configure_mappers()
+    with _phase("pool"):
+        await warm_up(session_maker)
+    if prime:
+        with _phase("statements"):
+            primed = await _prime_connections(session_maker, pool_settings(session_maker).warmup)
+        logger.info("Прогрето запросов: %s", primed)
+    if _report is not None:
+        _report.mark("ready", time.perf_counter() - _report.started)
+        logger.info("Старт %s: %s", _report.process, _report.summary())
+
+
+def record_first_update(seconds: float) -> None:
+    """Длительность первого апдейта после старта — один раз за процесс."""
+    if _report is None or _report.first_update is not None:
+        return
+    _report.first_update = seconds
+    STARTUP_SECONDS.labels(_report.process, "first_update").set(seconds)
+    logger.info(
+        "Первый апдейт обработан за %.0f мс, через %.1f с после старта",
+        seconds * 1000, time.perf_counter() - _report.started,
+    )
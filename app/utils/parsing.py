@@ -1,8 +1,11 @@
 from __future__ import annotations
 
+import csv
+import io
 import re
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import date
+from typing import List, Optional, Tuple
 
 DATE_PATTERNS = [
     re.compile(r"^(?P<d>\d{2})\.(?P<m>\d{2})$"),               # DD.MM
@@ -15,10 +18,15 @@ class TaskCommand:
     title: str
     deadline: date
     assignee_username: str  # без '@'
+    # Напоминания: за сколько минут до дедлайна (0 — в момент дедлайна); None — по умолчанию
+    reminders: Optional[List[int]] = None
 
 class ParseError(Exception):
     pass
 
+# Ограничение колонки tasks.title
+TITLE_MAX_LEN = 500
+
 def _parse_date(value: str) -> date:
     value = value.strip()
     today = date.today()
@@ -34,12 +42,35 @@ def _parse_date(value: str) -> date:
         return date(y, mth, d)
     raise ParseError("Не удалось распознать дату. Поддерживаемые форматы: DD.MM, DD.MM.YYYY, YYYY-MM-DD.")
 
+DURATION_RE = re.compile(r"^(?P<n>\d+)\s*(?P<u>м|мин|m|min|ч|h|д|d)?$", re.IGNORECASE)
+_DURATION_UNITS = {"м": 1, "мин": 1, "m": 1, "min": 1, "ч": 60, "h": 60, "д": 1440, "d": 1440}
+REMIND_KEYWORDS = {"напомнить", "remind"}
+
+
+def parse_duration_minutes(value: str) -> int:
+    """'24ч' / '24h' / '2д' / '30м' / '0' -> минуты; число без единицы — часы."""
+    m = DURATION_RE.match(value.strip().rstrip(","))
+    if not m:
+        raise ParseError(f"Не понял интервал напоминания: {value}. Пример: 24ч, 2д, 30м, 0.")
+    unit = (m["u"] or "ч").lower()
+    return int(m["n"]) * _DURATION_UNITS[unit]
+
+
+def parse_reminders(tokens: List[str]) -> List[int]:
+    """Список интервалов после слова 'напомнить' (через пробел или запятую)."""
+    values = [t for token in tokens for t in token.split(",") if t]
+    if not values:
+        raise ParseError("После 'напомнить' укажите интервалы, например: напомнить 24ч 0")
+    return sorted({parse_duration_minutes(v) for v in values}, reverse=True)
+
+
 def parse_task_command(text: str) -> TaskCommand:
     """
     Алгоритм:
       1) убрать '/task' в начале
       2) найти ключевое слово 'до' (как отдельное слово)
       3) слева -> title, справа -> первое слово дата, второе слово (если начинается с @) -> username
+      4) необязательно: 'напомнить 24ч 0' — когда напомнить исполнителю
     """
     if not text:
         raise ParseError("Пустая команда.")
@@ -57,6 +88,8 @@ def parse_task_command(text: str) -> TaskCommand:
     right = text[m.end():].strip()
     if not left:
         raise ParseError("Не указан заголовок задачи перед 'до'.")
+    if len(left) > TITLE_MAX_LEN:
+        raise ParseError(f"Слишком длинный заголовок (больше {TITLE_MAX_LEN} символов).")
 
     parts = right.split()
     if len(parts) == 0:
@@ -69,5 +102,113 @@ def parse_task_command(text: str) -> TaskCommand:
     if not assignee_username:
         raise ParseError("Не указан исполнитель (@username).")
 
+    reminders = None
+    if len(parts) >= 3 and parts[2].lower() in REMIND_KEYWORDS:
+        reminders = parse_reminders(parts[3:])
+
     deadline = _parse_date(date_str)
-    return TaskCommand(title=left, deadline=deadline, assignee_username=assignee_username)
+    return TaskCommand(title=left, deadline=deadline, assignee_username=assignee_username, reminders=reminders)
+
+
+# Не больше стольких задач в одном /done (с учётом диапазонов)
+MAX_DONE_IDS = 100
+_ID_RANGE_RE = re.compile(r"^#?(?P<a>\d+)(?:\s*[-–]\s*#?(?P<b>\d+))?$")
+
+
+def parse_task_ids(text: str) -> List[int]:
+    """'12 15 19', '#12, #15' и диапазоны '20-25' -> отсортированные уникальные id."""
+    ids = set()
+    for token in re.split(r"[\s,;]+", re.sub(r"\s*[-–]\s*", "-", text.strip())):
+        if not token:
+            continue
+        m = _ID_RANGE_RE.match(token)
+        if not m:
+            raise ParseError(f"Не понял номер задачи: {token}")
+        a = int(m["a"])
+        b = int(m["b"]) if m["b"] else a
+        if b < a:
+            a, b = b, a
+        if b - a + 1 > MAX_DONE_IDS:
+            raise ParseError(f"Слишком большой диапазон: {token}")
+        ids.update(range(a, b + 1))
+        if len(ids) > MAX_DONE_IDS:
+            raise ParseError(f"Не больше {MAX_DONE_IDS} задач за раз.")
+    if not ids:
+        raise ParseError("Укажите номер задачи.")
+    return sorted(ids)
+
+
+# --- Пакетное создание: много строк в одном сообщении или CSV ---
+
+@dataclass
+class BulkParseResult:
+    items: List[TaskCommand] = field(default_factory=list)
+    # (номер строки, ошибка) — такие строки пропускаются
+    errors: List[Tuple[int, str]] = field(default_factory=list)
+
+
+_CSV_HEADER_WORDS = {"title", "задача", "что", "название"}
+# Формат username в Telegram — ячейка CSV может содержать что угодно
+USERNAME_RE = re.compile(r"^[A-Za-z0-9_]{5,32}$")
+
+
+def parse_task_lines(text: str) -> BulkParseResult:
+    """
+    Многострочный /task: каждая непустая строка — '<что> до <дата> @username [напомнить ...]'.
+    Первая строка может быть пустой командой '/task'.
+    """
+    result = BulkParseResult()
+    for line_no, line in enumerate((text or "").splitlines(), start=1):
+        if line_no == 1:
+            line = re.sub(r"^/task(@[A-Za-z0-9_]+)?\s*", "", line.strip(), flags=re.IGNORECASE)
+        if not line.strip():
+            continue
+        try:
+            result.items.append(parse_task_command(line))
+        except (ParseError, ValueError) as e:
+            result.errors.append((line_no, str(e)))
+    return result
+
+
+def parse_task_csv(content: str) -> BulkParseResult:
+    """
+    CSV с колонками: что, дедлайн, исполнитель[, напоминания]. Разделитель — ',', ';'
+    или табуляция; строка заголовка необязательна.
+    """
+    result = BulkParseResult()
+    # Разделитель — тот, которого больше всего в первой строке (Excel в ru-локали пишет ';')
+    first_line = content.lstrip("\ufeff").split("\n", 1)[0]
+    delimiter = max(",;\t", key=first_line.count)
+    reader = csv.reader(io.StringIO(content.lstrip("\ufeff")), delimiter=delimiter)
+    for row in reader:
+        line_no = reader.line_num
+        cells = [c.strip() for c in row]
+        if not any(cells):
+            continue
+        if line_no == 1 and cells[0].lower() in _CSV_HEADER_WORDS:
+            continue
+        if len(cells) < 3:
+            result.errors.append((line_no, "Нужны колонки: что, дедлайн, исполнитель."))
+            continue
+        title, deadline_str, username = cells[:3]
+        username = username.lstrip("@")
+        if not title or not username:
+            result.errors.append((line_no, "Пустое название или исполнитель."))
+            continue
+        if len(title) > TITLE_MAX_LEN:
+            result.errors.append((line_no, f"Слишком длинный заголовок (больше {TITLE_MAX_LEN} символов)."))
+            continue
+        if not USERNAME_RE.match(username):
+            result.errors.append((line_no, f"Некорректный username исполнителя: {username} (5–32 символа: латиница, цифры, _)."))
+            continue
+        try:
+            reminders = parse_reminders(cells[3].split()) if len(cells) > 3 and cells[3] else None
+            result.items.append(TaskCommand(
+                title=title,
+                deadline=_parse_date(deadline_str),
+                assignee_username=username,
+                reminders=reminders,
+            ))
+        except (ParseError, ValueError) as e:
+            result.errors.append((line_no, str(e)))
+    return result
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import asyncio
+import re
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+_RATE_RE = re.compile(r"^(?P<n>\d+(?:\.\d+)?)\s*/\s*(?P<t>\d+(?:\.\d+)?)?\s*(?P<u>s|m|h|с|м|ч)?$", re.IGNORECASE)
+_RATE_UNITS = {"s": 1, "с": 1, "m": 60, "м": 60, "h": 3600, "ч": 3600}
+
+
+@dataclass(frozen=True)
+class Rate:
+    """Не больше `capacity` событий подряд, в среднем `per_second` в секунду."""
+    capacity: float
+    per_second: float
+
+
+def parse_rate(value: str) -> Optional[Rate]:
+    """'5/10s' -> 5 событий за 10 секунд; '1/m', '30/1h'; '0' или 'off' — без лимита."""
+    value = value.strip().lower()
+    if value in {"", "0", "off"}:
+        return None
+    m = _RATE_RE.match(value)
+    if not m or float(m["n"]) <= 0:
+        raise ValueError(f"Не понял лимит: {value}. Пример: 5/10s, 1/m")
+    period = float(m["t"] or 1) * _RATE_UNITS[(m["u"] or "s").lower()]
+    if period <= 0:
+        raise ValueError(f"Нулевой период в лимите: {value}")
+    return Rate(capacity=float(m["n"]), per_second=float(m["n"]) / period)
+
+
+def parse_rate_rules(value: str) -> Dict[str, Optional[Rate]]:
+    """'export=1/m, board=2/60s' -> {'export': Rate(...), ...}; 'off' отключает лимит команды."""
+    rules: Dict[str, Optional[Rate]] = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        name, sep, rate = item.partition("=")
+        if not sep or not name.strip():
+            raise ValueError(f"Ожидалось команда=лимит, получено: {item.strip()}")
+        rules[name.strip().lstrip("/").lower()] = parse_rate(rate)
+    return rules
+
+
+class TokenBucket:
+    """
+    Классический token bucket: `rate` токенов в секунду, не больше `capacity`.
+    Не потокобезопасен — рассчитан на один event loop.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None) -> None:
+        if rate <= 0:
+            raise ValueError("rate должен быть положительным")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def wait_time(self, tokens: float = 1.0, now: Optional[float] = None) -> float:
+        """Сколько секунд ждать, пока наберутся `tokens` токенов (0 — есть уже); ничего не списывает."""
+        now = time.monotonic() if now is None else now
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill(now)
+        if self.tokens >= tokens:
+            return 0.0
+        return (tokens - self.tokens) / self.rate
+
+    def try_acquire(self, tokens: float = 1.0, now: Optional[float] = None) -> float:
+        """Берёт токены, если они есть, и возвращает 0; иначе — сколько секунд ждать."""
+        wait = self.wait_time(tokens, now)
+        if not wait:
+            self.tokens -= tokens
+        return wait
+
+    def block_for(self, seconds: float, now: Optional[float] = None) -> None:
+        """Запрещает выдачу токенов на `seconds` (например, по RetryAfter от Telegram)."""
+        now = time.monotonic() if now is None else now
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self.tokens = 0.0
+        self.updated = max(self.updated, self.blocked_until)
+
+    def is_idle(self, now: Optional[float] = None) -> bool:
+        """Ведро полное и не заблокировано — его состояние можно забыть."""
+        now = time.monotonic() if now is None else now
+        if now < self.blocked_until:
+            return False
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        while True:
+            delay = self.try_acquire(tokens)
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
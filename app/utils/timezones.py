@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+from typing import Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+
+@lru_cache(maxsize=512)
+def get_timezone(name: str) -> ZoneInfo:
+    return ZoneInfo(name)
+
+
+def is_valid_timezone(name: str) -> bool:
+    try:
+        get_timezone(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return False
+    return True
+
+
+def resolve_timezone(name: Optional[str], default: str) -> ZoneInfo:
+    """Часовой пояс пользователя или пояс по умолчанию, если не задан/неизвестен."""
+    if name and is_valid_timezone(name):
+        return get_timezone(name)
+    return get_timezone(default)
+
+
+def local_today(tz_name: Optional[str], default: str, now: Optional[datetime] = None) -> date:
+    now = now or datetime.now(timezone.utc)
+    return now.astimezone(resolve_timezone(tz_name, default)).date()
+
+
+def next_occurrence(now: datetime, tz: ZoneInfo, at: time) -> datetime:
+    """Ближайший момент строго после `now`, когда в поясе `tz` будет `at` (в UTC)."""
+    local_now = now.astimezone(tz)
+    candidate = datetime.combine(local_now.date(), at, tzinfo=tz)
+    if candidate <= local_now:
+        candidate = datetime.combine(local_now.date() + timedelta(days=1), at, tzinfo=tz)
+    return candidate.astimezone(timezone.utc)
@@ -0,0 +1,141 @@
+"""
+Приём апдейтов через webhook (aiohttp) с несколькими процессами-воркерами.
+
+Все воркеры слушают один порт (SO_REUSEPORT), ядро распределяет между ними
+соединения от Telegram/nginx. Хендлер запускается в фоне, а Telegram сразу
+получает 200 — медленный апдейт не задерживает следующие.
+"""
+from __future__ import annotations
+
+import time
+
+# Воркеры запускаются через spawn — импорты у каждого свои
+_IMPORT_STARTED = time.perf_counter()
+
+import asyncio
+import logging
+import multiprocessing as mp
+from typing import List
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from app.bot import build_bot, build_dispatcher
+from app.config import Config
+from app.db.session import PoolSettings, build_session_maker
+from app.metrics import start_metrics_server
+from app.services.identity import configure_identity_cache
+from app.services.view_cache import configure_view_cache
+from app.startup import begin_startup
+from app.utils.logging import setup_logging
+
+logger = logging.getLogger(__name__)
+
+
+def build_webhook_app(config: Config, dp: Dispatcher, bot: Bot) -> web.Application:
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        # 200 сразу, обработка — фоновой задачей
+        handle_in_background=True,
+        secret_token=config.webhook_secret or None,
+    ).register(app, path=config.webhook_path)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def _register_webhook(config: Config, dp: Dispatcher, bot: Bot) -> None:
+    url = config.webhook_base_url + config.webhook_path
+    await bot.set_webhook(
+        url,
+        secret_token=config.webhook_secret or None,
+        allowed_updates=dp.resolve_used_update_types(),
+        # Telegram принимает 1..100, иначе set_webhook падает с Bad Request
+        max_connections=min(100, max(40, config.webhook_workers * 20)),
+    )
+    logger.info("Webhook зарегистрирован: %s", url)
+
+
+async def serve(config: Config, worker_index: int = 0) -> None:
+    """Один воркер: свой пул соединений к БД, свой бот, общий порт."""
+    begin_startup("webhook", _IMPORT_STARTED)
+    session_maker = build_session_maker(
+        config.database_url,
+        replica_urls=config.database_replica_urls,
+        replica_max_lag=config.replica_max_lag,
+        pool=PoolSettings.from_config(config),
+    )
+    configure_identity_cache(maxsize=config.identity_cache_size, ttl=config.identity_cache_ttl)
+    view_cache_size = config.view_cache_size
+    if config.webhook_workers > 1 and config.db_pgbouncer:
+        # LISTEN не работает через pgbouncer в режиме transaction — инвалидация между воркерами не дойдёт
+        logger.warning("DB_PGBOUNCER и несколько воркеров: кэш представлений выключен")
+        view_cache_size = 0
+    configure_view_cache(
+        maxsize=view_cache_size,
+        ttl=config.view_cache_ttl,
+        cross_process=config.webhook_workers > 1,
+    )
+    # У каждого процесса свой реестр метрик — и свой порт
+    if config.metrics_port:
+        start_metrics_server(config.metrics_host, config.metrics_port + worker_index)
+
+    bot = build_bot(config)
+    dp = build_dispatcher(config, session_maker)
+    app = build_webhook_app(config, dp, bot)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(
+        runner,
+        config.webhook_host,
+        config.webhook_port,
+        reuse_port=config.webhook_workers > 1,
+    )
+    await site.start()
+    logger.info("Воркер %s слушает %s:%s", worker_index, config.webhook_host, config.webhook_port)
+
+    # Регистрирует webhook только первый воркер
+    if worker_index == 0:
+        await _register_webhook(config, dp, bot)
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+def _worker_main(config: Config, worker_index: int) -> None:
+    setup_logging(config.log_level)
+    try:
+        asyncio.run(serve(config, worker_index))
+    except KeyboardInterrupt:
+        pass
+
+
+def run_webhook(config: Config) -> None:
+    if config.webhook_workers <= 1:
+        asyncio.run(serve(config))
+        return
+
+    ctx = mp.get_context("spawn")
+    workers: List[mp.Process] = [
+        ctx.Process(target=_worker_main, args=(config, i), name=f"webhook-worker-{i}", daemon=False)
+        for i in range(config.webhook_workers)
+    ]
+    for p in workers:
+        p.start()
+    try:
+        for p in workers:
+            p.join()
+    except KeyboardInterrupt:
+        for p in workers:
+            p.terminate()
+        for p in workers:
+            p.join()
+    # Если воркер упал — пусть systemd перезапустит весь сервис
+    codes = [p.exitcode for p in workers]
+    if any(codes):
+        raise SystemExit(f"Воркеры webhook завершились с кодами {codes}")
@@ -0,0 +1,7 @@
+"""
+Бенчмарки сервисного слоя на синтетических данных.
+
+Запускаются против отдельной (локальной) БД — никогда не против боевой:
+    python -m bench.digest --database-url postgresql+asyncpg://.../deadline_bench
+    python -m bench.services --database-url postgresql+asyncpg://.../deadline_bench --preset large
+"""
@@ -0,0 +1,117 @@
+"""
+Горячие запросы при растущей истории закрытых задач: без архива и после переноса в tasks_archive.
+
+Для каждого объёма истории (закрытых задач на пользователя сверх рабочих данных)
+БД пересоздаётся и наполняется, меряются списки задач и дайджест; затем история
+переносится в архив и замер повторяется. Без архива время растёт вместе с историей,
+после переноса остаётся на уровне рабочих данных.
+
+    python -m bench.archive --database-url postgresql+asyncpg://u:p@localhost/deadline_bench --history 0,20,100
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import date
+from typing import Any, Dict, List
+
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+
+from app.db.models import Task, TaskArchive
+from app.services.archive import archive_closed_tasks
+from app.services.digest import iter_digests
+from app.services.tasks import fetch_task_view
+from bench.datagen import DataSpec, generate, iter_history_batches, reset_schema
+from bench.harness import QueryCounter, Recorder
+
+Maker = async_sessionmaker[AsyncSession]
+
+
+async def _vacuum(engine: AsyncEngine) -> None:
+    # Статистика и карта видимости как после autovacuum — иначе меряем мёртвые строки
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("VACUUM ANALYZE tasks"))
+        await conn.execute(text("VACUUM ANALYZE tasks_archive"))
+
+
+async def _table_stats(maker: Maker) -> Dict[str, Any]:
+    async with maker() as session:
+        hot = await session.scalar(select(func.count()).select_from(Task))
+        archived = await session.scalar(select(func.count()).select_from(TaskArchive))
+        size = await session.scalar(text("SELECT pg_total_relation_size('tasks')"))
+    return {"tasks_rows": hot, "archive_rows": archived, "tasks_mb": round(size / 2 ** 20, 1)}
+
+
+async def _measure(maker: Maker, engine: AsyncEngine, user_ids: List[int], today: date) -> List[Dict[str, Any]]:
+    rec = Recorder(QueryCounter(engine))
+    for view in ("my", "overdue"):
+        for user_id in user_ids:
+            async with maker() as session:
+                async with rec.measure(f"fetch_{view}"):
+                    await fetch_task_view(session, user_id, view, today)
+    async with maker() as session:
+        async with rec.measure("digest_scan"):
+            async for _ in iter_digests(session, today):
+                pass
+    return rec.report()
+
+
+async def run_level(engine: AsyncEngine, maker: Maker, spec: DataSpec, per_user: int, today: date, samples: int) -> Dict[str, Any]:
+    await reset_schema(engine)
+    await generate(maker, spec, today)
+    async with maker() as session:
+        for batch in iter_history_batches(spec, per_user, today):
+            await session.execute(insert(Task), batch)
+            await session.commit()
+    await _vacuum(engine)
+
+    rnd = random.Random(spec.seed)
+    user_ids = [rnd.randint(1, spec.users) for _ in range(samples)]
+    level: Dict[str, Any] = {"history_per_user": per_user}
+    level["before"] = {**await _table_stats(maker), "results": await _measure(maker, engine, user_ids, today)}
+
+    started = time.perf_counter()
+    async with maker() as session:
+        moved = await archive_closed_tasks(session, older_than_days=30)
+    level["archived"] = {"rows": moved, "seconds": round(time.perf_counter() - started, 3)}
+    await _vacuum(engine)
+    level["after"] = {**await _table_stats(maker), "results": await _measure(maker, engine, user_ids, today)}
+    return level
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", required=True, help="Отдельная PostgreSQL-БД для бенчмарка (будет пересоздана)")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--chats", type=int, default=100)
+    parser.add_argument("--tasks-per-user", type=int, default=5)
+    parser.add_argument("--history", default="0,20,100", help="Закрытых задач истории на пользователя, через запятую")
+    parser.add_argument("--samples", type=int, default=200, help="Пользователей на замер списков")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--today", type=date.fromisoformat, default=date.today())
+    args = parser.parse_args()
+
+    spec = DataSpec(users=args.users, chats=args.chats, tasks_per_user=args.tasks_per_user, seed=args.seed)
+    engine = create_async_engine(args.database_url, echo=False)
+    maker = async_sessionmaker(engine, expire_on_commit=False)
+    levels = []
+    try:
+        for per_user in (int(v) for v in args.history.split(",") if v.strip()):
+            levels.append(await run_level(engine, maker, spec, per_user, args.today, args.samples))
+    finally:
+        await engine.dispose()
+
+    print(json.dumps({
+        "spec": {"users": spec.users, "chats": spec.chats, "tasks": spec.tasks, "seed": spec.seed},
+        "today": args.today.isoformat(),
+        "levels": levels,
+    }, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import itertools
+import random
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, Iterator, List
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from app.db.base import Base
+from app.db.models import Chat, Task, User
+
+INSERT_BATCH = 5000
+
+
+@dataclass(frozen=True)
+class DataSpec:
+    users: int = 1000
+    chats: int = 50
+    # В среднем задач на пользователя; реальное распределение по исполнителям — Zipf
+    tasks_per_user: int = 5
+    seed: int = 42
+    # Показатель Zipf: чем больше, тем сильнее задачи концентрируются у «активных» людей
+    assignee_skew: float = 1.1
+    # Доля открытых задач среди ещё не наступивших и среди просроченных дедлайнов
+    open_share_future: float = 0.85
+    open_share_past: float = 0.25
+
+    @property
+    def tasks(self) -> int:
+        return self.users * self.tasks_per_user
+
+
+# Готовые размеры: large — порядка 100k пользователей и 1M задач
+PRESETS: Dict[str, DataSpec] = {
+    "small": DataSpec(users=1_000, chats=50, tasks_per_user=5),
+    "medium": DataSpec(users=20_000, chats=1_000, tasks_per_user=10),
+    "large": DataSpec(users=100_000, chats=5_000, tasks_per_user=10),
+}
+
+
+async def reset_schema(engine: AsyncEngine) -> None:
+    """Пересоздаёт все таблицы в бенчмарк-БД."""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def _insert_batched(session: AsyncSession, model, rows: List[dict]) -> None:
+    for i in range(0, len(rows), INSERT_BATCH):
+        await session.execute(insert(model), rows[i:i + INSERT_BATCH])
+
+
+def _zipf_cum_weights(n: int, s: float) -> List[float]:
+    return list(itertools.accumulate(1.0 / (rank ** s) for rank in range(1, n + 1)))
+
+
+def _deadline_offset(rnd: random.Random) -> int:
+    """
+    Смещение дедлайна от сегодня, дней: большинство — ближайшие две недели,
+    хвост просроченных и редкие дедлайны на месяцы вперёд.
+    """
+    r = rnd.random()
+    if r < 0.05:
+        return 0
+    if r < 0.30:
+        return -int(rnd.expovariate(1 / 10)) - 1
+    if r < 0.90:
+        return int(rnd.expovariate(1 / 5)) + 1
+    return rnd.randint(30, 180)
+
+
+def _closed_at(day: date) -> datetime:
+    return datetime.combine(day, time(12, 0), tzinfo=timezone.utc)
+
+
+def iter_history_batches(spec: DataSpec, per_user: int, today: date, *, max_age_days: int = 720) -> Iterator[List[dict]]:
+    """
+    Давняя история: `per_user` закрытых задач на каждого пользователя, закрытых
+    от 60 до `max_age_days` дней назад. Рабочие (свежие) данные не меняет.
+    """
+    rnd = random.Random(spec.seed + 1)
+    batch: List[dict] = []
+    for n in range(spec.users * per_user):
+        day = today - timedelta(days=rnd.randint(60, max_age_days))
+        batch.append({
+            "chat_id": rnd.randint(1, spec.chats),
+            "creator_id": rnd.randint(1, spec.users),
+            "assignee_id": n % spec.users + 1,
+            "title": f"Архивная задача {n}",
+            "deadline": day,
+            "status": "done",
+            "closed_at": _closed_at(day),
+        })
+        if len(batch) >= INSERT_BATCH:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_task_batches(spec: DataSpec, today: date) -> Iterator[List[dict]]:
+    """Задачи пачками по INSERT_BATCH — миллион строк не держим в памяти целиком."""
+    rnd = random.Random(spec.seed)
+    # Ранг Zipf → пользователь: «активные» исполнители разбросаны по id, а не идут первыми
+    by_rank = list(range(1, spec.users + 1))
+    rnd.shuffle(by_rank)
+    cum_weights = _zipf_cum_weights(spec.users, spec.assignee_skew)
+    chat_weights = _zipf_cum_weights(spec.chats, 1.0)
+    chat_ids = list(range(1, spec.chats + 1))
+
+    batch: List[dict] = []
+    for task_id in range(1, spec.tasks + 1):
+        offset = _deadline_offset(rnd)
+        open_share = spec.open_share_past if offset < 0 else spec.open_share_future
+        deadline = today + timedelta(days=offset)
+        status = "open" if rnd.random() < open_share else "done"
+        batch.append({
+            "chat_id": rnd.choices(chat_ids, cum_weights=chat_weights)[0],
+            "creator_id": rnd.randint(1, spec.users),
+            "assignee_id": rnd.choices(by_rank, cum_weights=cum_weights)[0],
+            "title": f"Задача {task_id}",
+            "deadline": deadline,
+            "status": status,
+            # Закрыта в день дедлайна (или вчера, если дедлайн ещё впереди)
+            "closed_at": _closed_at(min(deadline, today - timedelta(days=1))) if status == "done" else None,
+        })
+        if len(batch) >= INSERT_BATCH:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def generate(session_maker: async_sessionmaker[AsyncSession], spec: DataSpec, today: date) -> None:
+    """
+    Детерминированно наполняет БД пользователями, чатами и задачами.
+    Рассчитывает на свежую схему: id пользователей и чатов идут подряд с 1.
+    """
+    users = [
+        {
+            "tg_id": 10_000_000 + i,
+            "username": f"user{i}",
+            "username_lc": f"user{i}",
+            "first_name": f"U{i}",
+            "last_name": None,
+        }
+        for i in range(1, spec.users + 1)
+    ]
+    chats = [
+        {"tg_chat_id": -100_000_000 - i, "title": f"Chat {i}", "type": "supergroup"}
+        for i in range(1, spec.chats + 1)
+    ]
+
+    async with session_maker() as session:
+        await _insert_batched(session, User, users)
+        await _insert_batched(session, Chat, chats)
+        await session.commit()
+        for batch in iter_task_batches(spec, today):
+            await session.execute(insert(Task), batch)
+            # Коммитим пачками, чтобы не раздувать одну транзакцию на миллион строк
+            await session.commit()
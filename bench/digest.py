@@ -0,0 +1,96 @@
+"""
+Сравнение старого цикла дайджестов (3N+1 запросов) с потоковым движком.
+
+    python -m bench.digest --database-url postgresql+asyncpg://u:p@localhost/deadline_bench --users 20000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from datetime import date
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.db.models import Chat, Task, User
+from app.services.digest import iter_digests, render_digest
+from bench.datagen import DataSpec, generate, reset_schema
+from bench.harness import FakeBot, QueryCounter
+
+
+async def legacy_digest_loop(session, bot, today: date) -> None:
+    """Прежняя реализация send_daily_digests: по три запроса на пользователя."""
+    users = await session.execute(
+        select(User).where(
+            User.tg_id.is_not(None),
+            User.id.in_(select(Task.assignee_id).where(Task.status == "open")),
+        )
+    )
+    for user in users.scalars().all():
+        open_tasks = select(Task).where(Task.assignee_id == user.id, Task.status == "open")
+        q_today = await session.execute(open_tasks.where(Task.deadline == today).order_by(Task.id))
+        q_overdue = await session.execute(open_tasks.where(Task.deadline < today).order_by(Task.deadline, Task.id))
+        tasks = list(q_today.scalars().all()) + list(q_overdue.scalars().all())
+        if not tasks:
+            continue
+        q = await session.execute(select(Chat).where(Chat.id.in_({t.chat_id for t in tasks})))
+        chats_map = {c.id: c for c in q.scalars().all()}
+        lines = [f"#{t.id} — {t.title} ({chats_map[t.chat_id].title})" for t in tasks]
+        await bot.send_message(user.tg_id, "\n".join(lines))
+
+
+async def engine_digest_loop(session, bot, today: date) -> None:
+    async for digest in iter_digests(session, today):
+        text = render_digest(digest)
+        if text:
+            await bot.send_message(digest.tg_id, text)
+
+
+async def _measure(name: str, fn, session_maker, counter: QueryCounter, today: date) -> dict:
+    bot = FakeBot()
+    counter.count = 0
+    started = time.perf_counter()
+    async with session_maker() as session:
+        await fn(session, bot, today)
+    elapsed = time.perf_counter() - started
+    return {
+        "name": name,
+        "seconds": round(elapsed, 4),
+        "queries": counter.count,
+        "digests": len(bot.sent),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--database-url", required=True, help="Отдельная БД для бенчмарка (будет пересоздана)")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--chats", type=int, default=100)
+    parser.add_argument("--tasks-per-user", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    engine = create_async_engine(args.database_url, echo=False)
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    today = date.today()
+
+    await reset_schema(engine)
+    await generate(
+        session_maker,
+        DataSpec(users=args.users, chats=args.chats, tasks_per_user=args.tasks_per_user, seed=args.seed),
+        today,
+    )
+
+    counter = QueryCounter(engine)
+    results = [
+        await _measure("legacy_loop", legacy_digest_loop, session_maker, counter, today),
+        await _measure("streamed_engine", engine_digest_loop, session_maker, counter, today),
+    ]
+    await engine.dispose()
+    print(json.dumps({"users": args.users, "tasks_per_user": args.tasks_per_user, "results": results}, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+"""Общие инструменты бенчмарков: фейковый бот, счётчик запросов, сбор перцентилей."""
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+class FakeBot:
+    """
+    Записывает отправленные сообщения вместо похода в Telegram.
+    `latency` и `jitter` (сек) имитируют время ответа Bot API.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, seed: int = 0) -> None:
+        self.sent: List[Tuple[int, str]] = []
+        self._latency = latency
+        self._jitter = jitter
+        self._rnd = random.Random(seed)
+
+    async def send_message(self, chat_id: int, text: str, **kwargs: Any) -> None:
+        if self._latency or self._jitter:
+            await asyncio.sleep(self._latency + self._rnd.uniform(0, self._jitter))
+        self.sent.append((chat_id, text))
+
+
+class QueryCounter:
+    """Считает SQL-запросы, выполненные движком."""
+
+    def __init__(self, engine: AsyncEngine) -> None:
+        self.count = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args: Any) -> None:
+        self.count += 1
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+@dataclass
+class OpStats:
+    """Замеры одной операции: задержки и число SQL-запросов на вызов."""
+    name: str
+    latencies: List[float] = field(default_factory=list)
+    queries: List[int] = field(default_factory=list)
+    error: Optional[str] = None
+
+    def report(self) -> Dict[str, Any]:
+        if self.error is not None:
+            return {"name": self.name, "error": self.error}
+        n = len(self.latencies)
+        return {
+            "name": self.name,
+            "n": n,
+            "p50_ms": round(percentile(self.latencies, 0.50) * 1000, 3),
+            "p95_ms": round(percentile(self.latencies, 0.95) * 1000, 3),
+            "p99_ms": round(percentile(self.latencies, 0.99) * 1000, 3),
+            "mean_ms": round(sum(self.latencies) / n * 1000, 3) if n else 0.0,
+            "queries_per_op": round(sum(self.queries) / n, 2) if n else 0.0,
+        }
+
+
+class Recorder:
+    """Собирает OpStats по именам операций."""
+
+    def __init__(self, counter: QueryCounter) -> None:
+        self._counter = counter
+        self.ops: Dict[str, OpStats] = {}
+
+    def stats(self, name: str) -> OpStats:
+        return self.ops.setdefault(name, OpStats(name))
+
+    @asynccontextmanager
+    async def measure(self, name: str) -> AsyncIterator[None]:
+        stats = self.stats(name)
+        queries_before = self._counter.count
+        started = time.perf_counter()
+        yield
+        stats.latencies.append(time.perf_counter() - started)
+        stats.queries.append(self._counter.count - queries_before)
+
+    def fail(self, name: str, exc: BaseException) -> None:
+        self.stats(name).error = f"{type(exc).__name__}: {exc}"
+
+    def report(self) -> List[Dict[str, Any]]:
+        return [s.report() for s in self.ops.values()]
@@ -0,0 +1,176 @@
+"""
+Бенчмарк сервисного слоя на синтетических данных: перцентили задержек и число
+SQL-запросов на операцию, результат — одной строкой JSON (удобно сравнивать прогоны).
+
+    python -m bench.services --database-url postgresql+asyncpg://u:p@localhost/deadline_bench --preset large
+    python -m bench.services --database-url sqlite+aiosqlite:///bench.db --users 2000
+
+SQLite годится как быстрая замена для путей чтения; операции, завязанные на
+диалект PostgreSQL (= ANY(:ids) и RETURNING столбцов chats из UPDATE ... FROM
+при закрытии), попадут в отчёт с полем "error" — остальные группы доходят до конца.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+from dataclasses import replace
+from datetime import date
+from types import SimpleNamespace
+from typing import List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.db.models import Chat, Task, User
+from app.services.delivery import DeliverySettings
+from app.services.notifications import send_daily_digests
+from app.services.tasks import (
+    TASK_VIEWS,
+    close_tasks,
+    create_task,
+    fetch_task_view,
+    get_or_stub_user_by_username,
+    upsert_user_from_tg,
+)
+from bench.datagen import PRESETS, DataSpec, generate, reset_schema
+from bench.harness import FakeBot, QueryCounter, Recorder
+
+# Лимиты Telegram в бенчмарке не нужны — меряем свой код, а не token bucket
+UNTHROTTLED = DeliverySettings(global_rate=1e9, private_chat_rate=1e9, group_chat_rate=1e9)
+
+Maker = async_sessionmaker[AsyncSession]
+
+
+def _tg_user(user_id: int) -> SimpleNamespace:
+    # Совпадает с профилем из datagen, т.е. повторный upsert ничего не меняет
+    return SimpleNamespace(id=10_000_000 + user_id, username=f"user{user_id}", first_name=f"U{user_id}", last_name=None)
+
+
+async def bench_views(maker: Maker, rec: Recorder, user_ids: List[int], today: date) -> None:
+    for view in TASK_VIEWS:
+        for user_id in user_ids:
+            async with maker() as session:
+                async with rec.measure(f"fetch_{view}"):
+                    page = await fetch_task_view(session, user_id, view, today)
+                if page.has_next:
+                    async with rec.measure(f"fetch_{view}_next"):
+                        await fetch_task_view(session, user_id, view, today, after=page.last)
+
+
+async def bench_upsert(maker: Maker, rec: Recorder, user_ids: List[int]) -> None:
+    # Первый проход — пустой кэш identity, второй — тёплый
+    for name in ("upsert_user_cold", "upsert_user_warm"):
+        for user_id in user_ids:
+            async with maker() as session:
+                async with rec.measure(name):
+                    await upsert_user_from_tg(session, _tg_user(user_id))
+                    await session.commit()
+
+
+async def bench_resolve_username(maker: Maker, rec: Recorder, user_ids: List[int]) -> None:
+    for user_id in user_ids:
+        async with maker() as session:
+            async with rec.measure("resolve_username"):
+                await get_or_stub_user_by_username(session, f"User{user_id}")
+
+
+async def bench_create(maker: Maker, rec: Recorder, rnd: random.Random, spec: DataSpec, today: date, n: int) -> None:
+    for i in range(n):
+        async with maker() as session:
+            chat = await session.get(Chat, rnd.randint(1, spec.chats))
+            creator = await session.get(User, rnd.randint(1, spec.users))
+            assignee = await session.get(User, rnd.randint(1, spec.users))
+            async with rec.measure("create_task"):
+                await create_task(
+                    session, chat=chat, creator=creator, assignee=assignee, title=f"Бенч {i}", deadline=today,
+                )
+                await session.commit()
+
+
+async def bench_done(maker: Maker, rec: Recorder, rnd: random.Random, n: int) -> None:
+    async with maker() as session:
+        q = await session.execute(select(Task.id, Task.assignee_id).where(Task.status == "open").limit(n * 20))
+        candidates = q.all()
+    for task_id, assignee_id in rnd.sample(candidates, min(n, len(candidates))):
+        async with maker() as session:
+            async with rec.measure("close_task"):
+                result = await close_tasks(session, task_ids=[task_id], closer_id=assignee_id)
+                await session.commit()
+            if result.failed:
+                raise RuntimeError(f"close_tasks({task_id}): {result.failed[task_id]}")
+
+
+async def bench_digest(maker: Maker, rec: Recorder, today: date, runs: int, latency: float) -> Optional[int]:
+    sent = None
+    for run in range(runs):
+        bot = FakeBot(latency=latency, jitter=latency, seed=run)
+        async with maker() as session:
+            async with rec.measure("digest_full"):
+                await send_daily_digests(session, bot, UNTHROTTLED, today=today)
+        sent = len(bot.sent)
+    return sent
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", required=True, help="Отдельная БД для бенчмарка (будет пересоздана)")
+    parser.add_argument("--preset", choices=sorted(PRESETS), help="Готовый размер данных")
+    parser.add_argument("--users", type=int)
+    parser.add_argument("--chats", type=int)
+    parser.add_argument("--tasks-per-user", type=int)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--today", type=date.fromisoformat, default=date.today())
+    parser.add_argument("--samples", type=int, default=200, help="Вызовов на каждую операцию")
+    parser.add_argument("--digest-runs", type=int, default=3)
+    parser.add_argument("--send-latency", type=float, default=0.002, help="Имитация задержки Bot API, сек")
+    parser.add_argument("--skip-generate", action="store_true", help="Использовать уже наполненную БД")
+    args = parser.parse_args()
+
+    spec = PRESETS.get(args.preset, DataSpec())
+    overrides = {k: v for k, v in (("users", args.users), ("chats", args.chats), ("tasks_per_user", args.tasks_per_user)) if v}
+    spec = replace(spec, seed=args.seed, **overrides)
+
+    engine = create_async_engine(args.database_url, echo=False)
+    maker = async_sessionmaker(engine, expire_on_commit=False)
+    if not args.skip_generate:
+        await reset_schema(engine)
+        await generate(maker, spec, args.today)
+
+    rnd = random.Random(args.seed)
+    sample_users = [rnd.randint(1, spec.users) for _ in range(args.samples)]
+    rec = Recorder(QueryCounter(engine))
+
+    # Каждая группа независима: падение одной (например, диалект) не останавливает остальные
+    steps = [
+        ("fetch_views", bench_views(maker, rec, sample_users, args.today)),
+        ("upsert_user", bench_upsert(maker, rec, sample_users)),
+        ("resolve_username", bench_resolve_username(maker, rec, sample_users)),
+        ("create_task", bench_create(maker, rec, rnd, spec, args.today, args.samples)),
+        ("close_task", bench_done(maker, rec, rnd, args.samples)),
+    ]
+    for name, step in steps:
+        try:
+            await step
+        except Exception as e:
+            rec.fail(name, e)
+    digests_sent = None
+    try:
+        digests_sent = await bench_digest(maker, rec, args.today, args.digest_runs, args.send_latency)
+    except Exception as e:
+        rec.fail("digest_full", e)
+    await engine.dispose()
+
+    print(json.dumps({
+        "dialect": engine.dialect.name,
+        "spec": {"users": spec.users, "chats": spec.chats, "tasks": spec.tasks, "seed": spec.seed},
+        "today": args.today.isoformat(),
+        "samples": args.samples,
+        "digests_sent": digests_sent,
+        "results": rec.report(),
+    }, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,127 @@
+"""
+Холодный старт бота: импорты, прогрев и первый апдейт — без warm_start и с ним.
+
+Каждый прогон — свежий интерпретатор (как после перезапуска systemd): импорт
+диспетчера, затем (в режиме warm) app.startup.warm_start, затем /my и /today
+через настоящий диспетчер против отдельной БД (схема будет пересоздана) и
+заглушки Bot API. Печатает медианы по --runs прогонам в JSON; второй апдейт —
+ориентир установившегося режима.
+
+    python -m bench.startup --database-url postgresql+asyncpg://u:p@localhost/deadline_bench --runs 5
+"""
+from __future__ import annotations
+
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+from datetime import date, timedelta
+from typing import Any, Dict, List
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiohttp import web
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.bot import build_dispatcher
+from app.config import Config
+from app.db.models import Chat, Task, User
+from app.db.session import PoolSettings, build_session_maker
+from app.startup import begin_startup, warm_start
+from bench.datagen import reset_schema
+from scripts.fake_telegram import FakeBotApi, make_update
+
+TG_ID = 777
+MODES = ("cold", "warm")
+
+
+async def seed(database_url: str) -> None:
+    session_maker = build_session_maker(database_url)
+    engine = session_maker.kw["bind"]
+    await reset_schema(engine)
+    async with AsyncSession(engine) as session:
+        session.add(User(id=1, tg_id=TG_ID, username=f"user{TG_ID}", username_lc=f"user{TG_ID}", first_name=f"U{TG_ID}"))
+        session.add(Chat(id=1, tg_chat_id=-1777, title="Startup chat", type="supergroup"))
+        await session.flush()
+        for i in range(10):
+            session.add(Task(chat_id=1, creator_id=1, assignee_id=1, title=f"Задача {i}", deadline=date.today() + timedelta(days=i % 3)))
+        await session.commit()
+    await engine.dispose()
+
+
+async def child(database_url: str, mode: str) -> Dict[str, Any]:
+    """Один старт в этом процессе; время импортов — от начала импорта модуля."""
+    report = begin_startup("bench", _IMPORT_STARTED)
+    api = FakeBotApi()
+    runner = web.AppRunner(api.app())
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    port = runner.addresses[0][1]
+
+    session_maker = build_session_maker(database_url, pool=PoolSettings(warmup=2))
+    config = Config(
+        bot_token="42:STARTUP",
+        database_url=database_url,
+        throttle_user=None,
+        throttle_chat=None,
+        throttle_commands=(),
+    )
+    bot = Bot(config.bot_token, session=AiohttpSession(api=TelegramAPIServer.from_base(f"http://127.0.0.1:{port}")))
+    dp = build_dispatcher(config, session_maker)
+    result: Dict[str, Any] = {}
+    try:
+        if mode == "warm":
+            await warm_start(session_maker)
+        for i, command in enumerate(("/my", "/today"), start=1):
+            started = time.perf_counter()
+            await dp.feed_raw_update(bot, make_update(i, TG_ID, command))
+            result["first_update_ms" if i == 1 else "second_update_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    finally:
+        await bot.session.close()
+        await session_maker.kw["bind"].dispose()
+        await runner.cleanup()
+    result.update({f"{name}_ms": round(seconds * 1000, 1) for name, seconds in report.phases.items()})
+    return result
+
+
+def _median(runs: List[Dict[str, Any]]) -> Dict[str, float]:
+    keys = sorted({k for run in runs for k in run})
+    return {k: round(statistics.median(run[k] for run in runs if k in run), 1) for k in keys}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", required=True, help="Отдельная PostgreSQL-БД для бенчмарка (будет пересоздана)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(child(args.database_url, args.child))))
+        return
+
+    asyncio.run(seed(args.database_url))
+    report: Dict[str, Any] = {"runs": args.runs}
+    for mode in MODES:
+        runs = []
+        for _ in range(args.runs):
+            out = subprocess.run(
+                [sys.executable, "-m", "bench.startup", "--database-url", args.database_url, "--child", mode],
+                check=True,
+                capture_output=True,
+                text=True,
+            )
+            runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+        report[mode] = _median(runs)
+    print(json.dumps(report, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
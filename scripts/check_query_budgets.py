@@ -0,0 +1,265 @@
+"""
+Проверка бюджетов SQL-запросов хендлеров (ловит N+1 и ленивые загрузки).
+
+Прогоняет апдейты через настоящий диспетчер против отдельной БД (схема будет
+пересоздана) и заглушки Bot API, считает SQL-запросы на каждый апдейт и сверяет
+с flags={"query_budget": N} сработавшего хендлера. При превышении печатает
+запросы; ленивая загрузка связи под AsyncSession считается ошибкой, как и любое
+исключение или запись уровня ERROR в логе за время апдейта (в том числе
+проглоченная фоновым кодом). В конце проверяет, что записи действительно
+дошли до БД: /task создал напоминания, /done закрыл задачи.
+
+    python scripts/check_query_budgets.py --database-url postgresql+asyncpg://u:p@localhost/deadline_budget
+
+Код выхода 1, если есть нарушения, ошибки или хендлеры без бюджета/сценария.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiohttp import web
+from sqlalchemy import event, func, select
+
+from app.bot import build_dispatcher
+from app.config import Config
+from app.db.models import Task, TaskReminder
+from app.db.session import build_session_maker, set_lazy_load_mode
+from app.keyboards import TaskPageCb
+from bench.datagen import reset_schema
+from fake_telegram import FakeBotApi
+
+ALICE, BOB = 501, 502
+GROUP = -100501
+
+
+@dataclass
+class Probe:
+    handler: Optional[str] = None
+    budget: Optional[int] = None
+    statements: List[str] = field(default_factory=list)
+
+
+_probe: ContextVar[Optional[Probe]] = ContextVar("budget_probe", default=None)
+
+
+class ProbeMiddleware(BaseMiddleware):
+    """Внутренняя миддлвара: запоминает, какой хендлер сработал и его бюджет."""
+
+    async def __call__(self, handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]], event: Any, data: Dict[str, Any]) -> Any:
+        probe = _probe.get()
+        if probe is not None:
+            probe.handler = data["handler"].callback.__name__
+            probe.budget = data["handler"].flags.get("query_budget")
+        return await handler(event, data)
+
+
+class ErrorLog(logging.Handler):
+    """Собирает записи уровня ERROR: фоновый код и aiogram логируют исключения, а не пробрасывают."""
+
+    def __init__(self) -> None:
+        super().__init__(logging.ERROR)
+        self.records: List[str] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        message = record.getMessage()
+        if record.exc_info and record.exc_info[1] is not None:
+            message += f" ({type(record.exc_info[1]).__name__}: {record.exc_info[1]})"
+        self.records.append(f"{record.name}: {message}")
+
+    def drain(self) -> List[str]:
+        records, self.records = self.records, []
+        return records
+
+
+def _record_statement(conn, cursor, statement, parameters, context, executemany) -> None:
+    probe = _probe.get()
+    if probe is not None:
+        probe.statements.append(" ".join(statement.split()))
+
+
+def _user(tg_id: int, username: str) -> Dict[str, Any]:
+    return {"id": tg_id, "is_bot": False, "first_name": username.title(), "username": username}
+
+
+def _message(update_id: int, tg_id: int, username: str, text: str, *, chat_id: Optional[int] = None) -> Dict[str, Any]:
+    chat = (
+        {"id": chat_id, "type": "supergroup", "title": "Budget chat"}
+        if chat_id is not None
+        else {"id": tg_id, "type": "private", "first_name": username.title()}
+    )
+    command_len = len(text.split()[0]) if text.startswith("/") else 0
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": chat,
+            "from": _user(tg_id, username),
+            "text": text,
+            "entities": [{"type": "bot_command", "offset": 0, "length": command_len}] if command_len else [],
+        },
+    }
+
+
+def _callback(update_id: int, tg_id: int, username: str, data: str) -> Dict[str, Any]:
+    message = _message(update_id, tg_id, username, "Твои задачи:")["message"]
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": _user(tg_id, username),
+            "chat_instance": "budget",
+            "message": message,
+            "data": data,
+        },
+    }
+
+
+def scenarios() -> List[tuple[str, Dict[str, Any]]]:
+    """(ожидаемый хендлер, апдейт) — по порядку, состояние БД переходит из шага в шаг."""
+    deadline = (date.today() + timedelta(days=1)).strftime("%d.%m.%Y")
+    nav = TaskPageCb(view="my", dir="next", day=date.today().toordinal(), task_id=0).pack()
+    steps = [
+        ("start_private", (ALICE, "alice", "/start", None)),
+        ("start_group", (ALICE, "alice", "/start", GROUP)),
+        ("board_cmd", (ALICE, "alice", "/board", GROUP)),
+        # bob ещё не писал боту — создаётся заглушка
+        ("task_create_group", (ALICE, "alice", f"/task подготовить отчёт до {deadline} @bob", GROUP)),
+        ("task_create_group", (ALICE, "alice", f"/task созвон до {deadline} @bob напомнить 2h", GROUP)),
+        (
+            "task_bulk_group",
+            (ALICE, "alice", f"/task\nдизайн до {deadline} @bob\nвёрстка до {deadline} @carol\nревью до {deadline} @alice", GROUP),
+        ),
+        # bob пишет /start — заглушка сливается в настоящего пользователя
+        ("start_private", (BOB, "bob", "/start", None)),
+        ("my_tasks", (BOB, "bob", "/my", None)),
+        ("today_tasks", (BOB, "bob", "/today", None)),
+        ("week_tasks", (BOB, "bob", "/week", None)),
+        ("overdue_tasks", (BOB, "bob", "/overdue", None)),
+        ("tz_cmd", (BOB, "bob", "/tz Europe/Berlin", None)),
+        ("digest_time_cmd", (BOB, "bob", "/digest 08:30", None)),
+        ("done_cmd", (BOB, "bob", "/done 1 3-5", None)),
+        ("export_private", (BOB, "bob", "/export", None)),
+        ("export_group", (ALICE, "alice", "/export ics", GROUP)),
+        ("help_cmd", (BOB, "bob", "/help", None)),
+    ]
+    updates = [
+        (handler, _message(i, tg_id, username, text, chat_id=chat_id))
+        for i, (handler, (tg_id, username, text, chat_id)) in enumerate(steps, start=1)
+    ]
+    updates.append(("task_page_nav", _callback(len(updates) + 1, BOB, "bob", nav)))
+    return updates
+
+
+def declared_budgets(dp: Dispatcher) -> Dict[str, Optional[int]]:
+    budgets: Dict[str, Optional[int]] = {}
+    for router in dp.chain_tail:
+        for observer in (router.message, router.callback_query):
+            for handler in observer.handlers:
+                budgets[handler.callback.__name__] = handler.flags.get("query_budget")
+    return budgets
+
+
+async def run(database_url: str) -> int:
+    api = FakeBotApi()
+    runner = web.AppRunner(api.app())
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    port = runner.addresses[0][1]
+
+    session_maker = build_session_maker(database_url)
+    engine = session_maker.kw["bind"]
+    await reset_schema(engine)
+    event.listen(engine.sync_engine, "before_cursor_execute", _record_statement)
+    set_lazy_load_mode("raise")
+    error_log = ErrorLog()
+    logging.getLogger().addHandler(error_log)
+
+    # Сценарии идут подряд от одного пользователя — лимиты команд выключаем
+    config = Config(
+        bot_token="42:BUDGET",
+        database_url=database_url,
+        throttle_user=None,
+        throttle_chat=None,
+        throttle_commands=(),
+    )
+    bot = Bot(config.bot_token, session=AiohttpSession(api=TelegramAPIServer.from_base(f"http://127.0.0.1:{port}")))
+    dp = build_dispatcher(config, session_maker)
+    dp.message.middleware(ProbeMiddleware())
+    dp.callback_query.middleware(ProbeMiddleware())
+
+    failures = 0
+    covered = set()
+    try:
+        for expected, update in scenarios():
+            probe = Probe()
+            token = _probe.set(probe)
+            error = None
+            try:
+                await dp.feed_raw_update(bot, update)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            finally:
+                _probe.reset(token)
+            logged = error_log.drain()
+
+            covered.add(probe.handler)
+            used = len(probe.statements)
+            ok = error is None and not logged and probe.handler == expected and probe.budget is not None and used <= probe.budget
+            print(f"{'OK  ' if ok else 'FAIL'} {expected:<18} запросов {used:>2} / бюджет {probe.budget}")
+            if ok:
+                continue
+            failures += 1
+            if error is not None:
+                print(f"     ошибка: {error}")
+            for record in logged:
+                print(f"     в логе: {record}")
+            if probe.handler != expected:
+                print(f"     сработал хендлер {probe.handler}, ожидался {expected}")
+            if probe.budget is None:
+                print("     у хендлера не объявлен flags={'query_budget': N}")
+            elif used > probe.budget:
+                for i, statement in enumerate(probe.statements, start=1):
+                    print(f"     {i:>2}. {statement[:200]}")
+
+        for name, budget in declared_budgets(dp).items():
+            if budget is None or name not in covered:
+                failures += 1
+                print(f"FAIL {name:<18} " + ("нет бюджета" if budget is None else "нет сценария в проверке"))
+
+        # Хендлер мог ответить «не получилось» без исключения — проверяем сами записи
+        async with session_maker() as session:
+            reminders = await session.scalar(select(func.count()).select_from(TaskReminder))
+            done = await session.scalar(select(func.count()).select_from(Task).where(Task.status == "done"))
+        for what, count in (("напоминаний после /task", reminders), ("закрытых задач после /done", done)):
+            if not count:
+                failures += 1
+                print(f"FAIL в БД нет {what}")
+    finally:
+        logging.getLogger().removeHandler(error_log)
+        await bot.session.close()
+        await engine.dispose()
+        await runner.cleanup()
+    return 1 if failures else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", required=True, help="Отдельная БД (будет пересоздана)")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.database_url)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Проверка через EXPLAIN, что горячие запросы используют нужные индексы.
+
+    python scripts/check_query_plans.py            # индекс должен быть применим
+    python scripts/check_query_plans.py --natural  # план как есть (на боевом объёме данных)
+
+По умолчанию последовательное сканирование выключено (SET LOCAL enable_seqscan = off):
+на маленькой БД планировщик честно выбирает seq scan, а нам важно, что индекс
+вообще подходит под запрос. Код возврата 1 — если какой-то запрос индекс не использует.
+"""
+import argparse
+import asyncio
+import json
+import sys
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Iterator, List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from app.config import load_config
+from app.services.archive import ARCHIVE_BATCH_SIZE, archive_candidates_query
+from app.services.digest import digest_rows_query
+from app.services.tasks import ViewCursor, task_view_query
+
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement: Any) -> None:
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def _pg_explain(element: Explain, compiler: Any, **kw: Any) -> str:
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+def _index_names(plan: Any) -> Iterator[str]:
+    if isinstance(plan, dict):
+        if "Index Name" in plan:
+            yield plan["Index Name"]
+        for value in plan.values():
+            yield from _index_names(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _index_names(item)
+
+
+def hot_queries(today: date) -> List[Tuple[str, Any, str]]:
+    """(название, запрос, ожидаемый индекс)"""
+    cursor = ViewCursor(today, 1)
+    return [
+        ("view:my", task_view_query(1, "my", today), "tasks_open_assignee_deadline_idx"),
+        ("view:my:next", task_view_query(1, "my", today, after=cursor), "tasks_open_assignee_deadline_idx"),
+        ("view:today", task_view_query(1, "today", today), "tasks_open_assignee_deadline_idx"),
+        ("view:week", task_view_query(1, "week", today), "tasks_open_assignee_deadline_idx"),
+        ("view:overdue", task_view_query(1, "overdue", today), "tasks_open_assignee_deadline_idx"),
+        ("digest", digest_rows_query(today), "tasks_open_assignee_deadline_idx"),
+        (
+            "archive:candidates",
+            archive_candidates_query(datetime.now(timezone.utc) - timedelta(days=30), ARCHIVE_BATCH_SIZE),
+            "tasks_closed_at_idx",
+        ),
+    ]
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--natural", action="store_true", help="Не выключать seq scan")
+    args = parser.parse_args()
+
+    cfg = load_config()
+    engine = create_async_engine(cfg.database_url, echo=False)
+    failed = 0
+    try:
+        for name, stmt, expected in hot_queries(date.today()):
+            async with engine.connect() as conn:
+                if not args.natural:
+                    await conn.execute(text("SET LOCAL enable_seqscan = off"))
+                q = await conn.execute(Explain(stmt))
+                plan = q.scalar_one()
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                await conn.rollback()
+            used = sorted(set(_index_names(plan)))
+            ok = expected in used
+            failed += 0 if ok else 1
+            print(f"{'OK  ' if ok else 'FAIL'} {name}: ожидается {expected}, использованы: {', '.join(used) or '—'}")
+    finally:
+        await engine.dispose()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
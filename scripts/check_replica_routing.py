@@ -0,0 +1,115 @@
+"""
+Проверка маршрутизации чтений на реплику на двух обычных локальных БД.
+
+Вторая БД изображает реплику: в обе кладутся одинаковые пользователь и чат, но
+задача с разным названием — по названию видно, какая БД ответила. Обе схемы
+будут пересозданы.
+
+    python scripts/check_replica_routing.py \\
+        --database-url postgresql+asyncpg://u:p@localhost/deadline_primary \\
+        --replica-url postgresql+asyncpg://u:p@localhost/deadline_replica
+
+Код выхода 1, если хоть одна проверка не прошла.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+import time
+from datetime import date
+from typing import List
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app.db.models import Chat, Task, User
+from app.db.session import build_session_maker, replica_set, use_replica
+from app.services.digest import iter_digests
+from app.services.tasks import close_tasks, fetch_task_view
+from bench.datagen import reset_schema
+
+TODAY = date.today()
+
+
+async def _seed(engine: AsyncEngine, title: str) -> None:
+    await reset_schema(engine)
+    async with AsyncSession(engine) as session:
+        session.add(User(id=1, tg_id=1001, username="alice", username_lc="alice"))
+        session.add(Chat(id=1, tg_chat_id=-1001, title="Replica chat", type="supergroup"))
+        await session.flush()
+        session.add(Task(id=1, chat_id=1, creator_id=1, assignee_id=1, title=title, deadline=TODAY, status="open"))
+        await session.commit()
+
+
+async def _titles(session: AsyncSession) -> List[str]:
+    page = await fetch_task_view(session, 1, "my", TODAY)
+    return [row.title for row in page.rows]
+
+
+async def run(database_url: str, replica_url: str) -> int:
+    maker = build_session_maker(database_url, replica_urls=[replica_url], replica_max_lag=5.0)
+    primary: AsyncEngine = maker.kw["bind"]
+    replicas = replica_set(maker)
+    replica = replicas.engines[0]
+    await _seed(primary, "primary")
+    await _seed(replica, "replica")
+
+    failures = 0
+
+    def report(name: str, ok: bool, detail: object = "") -> None:
+        nonlocal failures
+        failures += not ok
+        print(f"{'OK  ' if ok else 'FAIL'} {name:<44} {detail}")
+
+    try:
+        async with maker() as session:
+            report("до проверки отставания — primary", await _titles(session) == ["primary"])
+
+        await replicas.check()
+        async with maker() as session:
+            report("вне use_replica — primary", await _titles(session) == ["primary"])
+            with use_replica(session):
+                titles = await _titles(session)
+            report("use_replica — реплика", titles == ["replica"], titles)
+            with use_replica(session, changed_at=time.monotonic()):
+                titles = await _titles(session)
+            report("только что изменено — primary", titles == ["primary"], titles)
+            with use_replica(session):
+                digests = [d async for d in iter_digests(session, TODAY)]
+            titles = [t.title for d in digests for t in d.today]
+            report("дайджест — реплика", titles == ["replica"], titles)
+
+        async with maker() as session:
+            with use_replica(session):
+                result = await close_tasks(session, task_ids=[1], closer_id=1)
+                await session.commit()
+            report("запись внутри use_replica — primary", [c.id for c in result.closed] == [1], result.failed)
+        for name, engine, expected in (("primary", primary, "done"), ("replica", replica, "open")):
+            async with engine.connect() as conn:
+                status = (await conn.execute(select(Task.status).where(Task.id == 1))).scalar_one()
+            report(f"статус задачи на {name}", status == expected, status)
+
+        # Реплика «отстала» сильнее допустимого — выводится из ротации
+        replicas.max_lag = -1
+        await replicas.check()
+        async with maker() as session:
+            with use_replica(session):
+                titles = await _titles(session)
+            report("реплика отстаёт — primary", titles == [], titles)
+    finally:
+        await primary.dispose()
+        await replica.dispose()
+    return 1 if failures else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", required=True, help="Отдельная БД-«primary» (будет пересоздана)")
+    parser.add_argument("--replica-url", required=True, help="Отдельная БД-«реплика» (будет пересоздана)")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.database_url, args.replica_url)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Проверка лимитов команд на нескольких «воркерах» с общим бэкендом.
+
+Несколько Throttler'ов (как webhook-воркеры) делят один бэкенд и получают флуд
+команд от одного пользователя; пропущено должно быть не больше, чем позволяет
+один лимит, а не столько, сколько воркеров. Без --redis-url общий бэкенд
+изображает MemoryThrottleBackend, с ним — локальный Redis (будут созданы ключи
+с префиксом throttle-check:).
+
+    python scripts/check_throttling.py --workers 4 --seconds 3
+    python scripts/check_throttling.py --redis-url redis://localhost:6379/15
+
+Код выхода 1, если пропущено больше лимита.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import math
+import sys
+import time
+import uuid
+
+from app.services.throttling import MemoryThrottleBackend, RedisThrottleBackend, ThrottleSettings, Throttler
+from app.utils.ratelimit import parse_rate
+
+
+async def run(args: argparse.Namespace) -> int:
+    rate = parse_rate(args.rate)
+    if rate is None:
+        print("Нужен лимит, например 5/10s")
+        return 1
+    if args.redis_url:
+        backend = RedisThrottleBackend(args.redis_url, prefix=f"throttle-check:{uuid.uuid4().hex}:")
+    else:
+        backend = MemoryThrottleBackend()
+    settings = ThrottleSettings(user=rate, chat=None)
+    workers = [Throttler(settings, backend) for _ in range(args.workers)]
+
+    admitted = 0
+    sent = 0
+    started = time.monotonic()
+    try:
+        while time.monotonic() - started < args.seconds:
+            for throttler in workers:
+                wait, _ = await throttler.check(1, None, "my")
+                sent += 1
+                admitted += not wait
+            await asyncio.sleep(1 / args.flood)
+    finally:
+        await backend.close()
+    elapsed = time.monotonic() - started
+
+    limit = math.floor(rate.capacity + rate.per_second * elapsed)
+    ok = admitted <= limit
+    print(f"{'OK  ' if ok else 'FAIL'} отправлено {sent}, пропущено {admitted}, лимит {limit} за {elapsed:.1f} с")
+    return 0 if ok else 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis-url", default="", help="Redis для общего бэкенда; пусто — общий бэкенд в памяти")
+    parser.add_argument("--rate", default="5/10s", help="Лимит на пользователя")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--flood", type=float, default=20.0, help="Команд в секунду на каждый воркер")
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,15 +2,13 @@ import asyncio
 from sqlalchemy.ext.asyncio import create_async_engine
 
 from app.config import load_config
-from app.db.base import Base
-# ВАЖНО: импортируем модели, чтобы они зарегистрировались в metadata
-from app.db import models  # noqa: F401
+from app.db.migrations import migrate
 
 async def main():
+    # Таблицы и индексы создаются миграциями (см. scripts/migrate.py)
     cfg = load_config()
     engine = create_async_engine(cfg.database_url, echo=False, pool_pre_ping=True)
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    await migrate(engine)
     await engine.dispose()
     print("Таблицы успешно созданы.")
 
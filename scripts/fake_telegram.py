@@ -0,0 +1,144 @@
+"""
+Локальный «фейковый Telegram» для прогона бота в webhook-режиме.
+
+1) Поднимает Bot API-заглушку: отвечает ok на любой метод и считает вызовы.
+   Бот нужно запустить с TELEGRAM_API_URL=http://127.0.0.1:8081 и RUN_MODE=webhook.
+2) Шлёт на webhook бота синтетические апдейты (команды /my, /today, ...) и
+   печатает время ответа webhook и число вызовов Bot API в JSON.
+
+    python scripts/fake_telegram.py --webhook http://127.0.0.1:8080/telegram/webhook \\
+        --secret change-me --updates 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import time
+from collections import Counter
+from typing import Any, Dict, List
+
+from aiohttp import ClientSession, web
+
+COMMANDS = ["/my", "/today", "/week", "/overdue", "/help"]
+
+
+class FakeBotApi:
+    """Заглушка Bot API: /bot<token>/<method>."""
+
+    def __init__(self) -> None:
+        self.calls: Counter = Counter()
+        self._message_ids = itertools.count(1)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] += 1
+        payload: Dict[str, Any] = {}
+        if request.content_type == "application/json":
+            payload = await request.json()
+        elif request.can_read_body:
+            payload = dict(await request.post())
+        return web.json_response({"ok": True, "result": self._result(method, payload)})
+
+    def _result(self, method: str, payload: Dict[str, Any]) -> Any:
+        lowered = method.lower()
+        if lowered == "getme":
+            return {"id": 1, "is_bot": True, "first_name": "FakeBot", "username": "fake_bot"}
+        if lowered.startswith("send") or lowered.startswith("edit"):
+            chat_id = int(payload.get("chat_id", 0) or 0)
+            return {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup"},
+                "text": payload.get("text", ""),
+            }
+        return True
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        return app
+
+
+def make_update(update_id: int, user_id: int, text: str) -> Dict[str, Any]:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private", "first_name": f"U{user_id}"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"U{user_id}", "username": f"user{user_id}"},
+            "text": text,
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}],
+        },
+    }
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+async def drive(webhook: str, secret: str, updates: int, users: int, concurrency: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    sem = asyncio.Semaphore(concurrency)
+    headers = {"X-Telegram-Bot-Api-Secret-Token": secret} if secret else {}
+
+    async with ClientSession() as http:
+        async def one(i: int) -> None:
+            body = make_update(i + 1, 1000 + i % users, COMMANDS[i % len(COMMANDS)])
+            async with sem:
+                started = time.perf_counter()
+                async with http.post(webhook, json=body, headers=headers) as resp:
+                    await resp.read()
+                    statuses[resp.status] += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(updates)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "updates": updates,
+        "seconds": round(elapsed, 3),
+        "updates_per_s": round(updates / elapsed, 1) if elapsed else 0.0,
+        "ack_p50_ms": round(_percentile(latencies, 0.50) * 1000, 2),
+        "ack_p95_ms": round(_percentile(latencies, 0.95) * 1000, 2),
+        "ack_p99_ms": round(_percentile(latencies, 0.99) * 1000, 2),
+        "statuses": dict(statuses),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--api-host", default="127.0.0.1")
+    parser.add_argument("--api-port", type=int, default=8081)
+    parser.add_argument("--webhook", help="URL webhook бота; без него — только заглушка Bot API")
+    parser.add_argument("--secret", default="")
+    parser.add_argument("--updates", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--settle", type=float, default=2.0, help="Сколько ждать фоновые хендлеры, сек")
+    args = parser.parse_args()
+
+    api = FakeBotApi()
+    runner = web.AppRunner(api.app())
+    await runner.setup()
+    await web.TCPSite(runner, args.api_host, args.api_port).start()
+
+    try:
+        if not args.webhook:
+            print(f"Bot API-заглушка слушает http://{args.api_host}:{args.api_port}; Ctrl+C для выхода")
+            await asyncio.Event().wait()
+        report = await drive(args.webhook, args.secret, args.updates, args.users, args.concurrency)
+        await asyncio.sleep(args.settle)
+        report["bot_api_calls"] = dict(api.calls)
+        print(json.dumps(report, ensure_ascii=False))
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
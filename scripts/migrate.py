@@ -0,0 +1,49 @@
+"""
+Применение миграций схемы.
+
+    python scripts/migrate.py            # применить всё
+    python scripts/migrate.py --list     # показать статус
+    python scripts/migrate.py --to 2     # применить до версии 2 включительно
+"""
+import argparse
+import asyncio
+import logging
+
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.config import load_config
+from app.db.migrations import applied_versions, discover, migrate
+from app.utils.logging import setup_logging
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--list", action="store_true", help="Только показать статус миграций")
+    parser.add_argument("--to", type=int, default=None, help="Целевая версия")
+    args = parser.parse_args()
+
+    cfg = load_config()
+    setup_logging(cfg.log_level)
+    engine = create_async_engine(cfg.database_url, echo=False)
+    try:
+        if args.list:
+            async with engine.begin() as conn:
+                try:
+                    done = await applied_versions(conn)
+                except Exception:
+                    done = set()
+            for mig in discover():
+                mark = "x" if mig.version in done else " "
+                print(f"[{mark}] {mig.version:04d}_{mig.name}")
+            return
+        applied = await migrate(engine, target=args.to)
+        if applied:
+            logging.info("Применено миграций: %s", len(applied))
+        else:
+            logging.info("Схема актуальна")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
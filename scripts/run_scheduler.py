@@ -1,35 +1,96 @@
+from time import perf_counter
+
+# Отсюда считается время импортов в отчёте о старте (app.startup)
+_IMPORT_STARTED = perf_counter()
+
 import asyncio
 import logging
+from datetime import datetime, time, timezone
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 
 from aiogram import Bot
-from aiogram.client.default import DefaultBotProperties
 
-from app.config import load_config
-from app.db.session import build_session_maker
-from app.services.notifications import send_daily_digests
+from app.bot import build_bot
+from app.config import Config, load_config
+from app.db.session import PoolSettings, build_session_maker, replica_set
+from app.metrics import DIGEST_RUN_SECONDS, start_metrics_server
+from app.services.archive import archive_closed_tasks
+from app.services.delivery import DeliverySettings
+from app.services.notifications import send_due_digests_sharded
+from app.services.reminders import ReminderEngine
+from app.startup import begin_startup, warm_start
 from app.utils.logging import setup_logging
 
 
-async def digest_job(session_maker, bot: Bot):
+async def digest_job(session_maker, bot: Bot, config: Config, settings: DeliverySettings):
+    # Раз в минуту: только те пользователи, у которых подошло время дайджеста.
+    # Экземпляров планировщика может быть несколько — шарды делятся через advisory-lock
+    with DIGEST_RUN_SECONDS.labels("due").time():
+        processed = await send_due_digests_sharded(
+            session_maker,
+            bot,
+            settings,
+            now=datetime.now(timezone.utc),
+            default_tz=config.default_timezone,
+            default_time=time(hour=config.daily_digest_hour),
+            shards=config.scheduler_shards,
+        )
+    if processed:
+        logging.info("Обработано дайджестов: %s", processed)
+
+async def archive_job(session_maker, config: Config):
+    # Раз в час: давно закрытые задачи — из горячей таблицы в архив
     async with session_maker() as session:
-        await send_daily_digests(session, bot)
+        await archive_closed_tasks(
+            session,
+            older_than_days=config.archive_after_days,
+            batch_size=config.archive_batch_size,
+        )
 
 async def main():
     config = load_config()
     setup_logging(config.log_level)
+    begin_startup("scheduler", _IMPORT_STARTED)
     logging.info("Запуск планировщика дайджестов")
 
-    session_maker = build_session_maker(config.database_url)
-    bot = Bot(token=config.bot_token, default=DefaultBotProperties(parse_mode="HTML"))
+    start_metrics_server(config.metrics_host, config.scheduler_metrics_port)
+    session_maker = build_session_maker(
+        config.database_url,
+        replica_urls=config.database_replica_urls,
+        replica_max_lag=config.replica_max_lag,
+        pool=PoolSettings.from_config(config),
+    )
+    bot = build_bot(config)
+    # Мапперы и пул; горячие запросы бота планировщику не нужны
+    await warm_start(session_maker, prime=False)
 
     scheduler = AsyncIOScheduler()
-    trigger = CronTrigger(hour=config.daily_digest_hour, minute=0)
-    scheduler.add_job(digest_job, trigger=trigger, args=[session_maker, bot], name="daily_digest")
+    scheduler.add_job(
+        digest_job,
+        trigger=IntervalTrigger(minutes=1),
+        args=[session_maker, bot, config, DeliverySettings.from_config(config)],
+        name="due_digests",
+        max_instances=1,
+        coalesce=True,
+    )
+    if config.archive_after_days > 0:
+        scheduler.add_job(
+            archive_job,
+            trigger=IntervalTrigger(hours=1),
+            args=[session_maker, config],
+            name="archive_closed_tasks",
+            max_instances=1,
+            coalesce=True,
+        )
     scheduler.start()
 
+    # Напоминания о дедлайнах: таймеры в памяти, отправка через outbox бота
+    reminders = asyncio.create_task(ReminderEngine(session_maker).run(), name="reminders")
+    replicas = replica_set(session_maker)
+    replica_monitor = asyncio.create_task(replicas.monitor(), name="replica-monitor") if replicas else None
+
     # Блокируемся, пока работает scheduler
     try:
         while True:
@@ -37,6 +98,9 @@ async def main():
     except (KeyboardInterrupt, SystemExit):
         pass
     finally:
+        reminders.cancel()
+        if replica_monitor is not None:
+            replica_monitor.cancel()
         await bot.session.close()
 
 if __name__ == "__main__":
@@ -0,0 +1,41 @@
+from datetime import date
+
+from app.utils.parsing import parse_task_csv, parse_task_lines
+
+
+def test_task_lines_skip_command_and_report_bad_lines():
+    result = parse_task_lines("/task@deadline_bot\nдизайн до 2030-05-01 @alice_1\n\nбез даты @bob_22\nревью до 01.05.2030 @carol_3 напомнить 2h")
+    assert [(i.title, i.assignee_username) for i in result.items] == [("дизайн", "alice_1"), ("ревью", "carol_3")]
+    assert result.items[1].deadline == date(2030, 5, 1)
+    assert result.items[1].reminders == [120]
+    assert [line_no for line_no, _ in result.errors] == [4]
+
+
+def test_task_csv_sniffs_semicolon_and_skips_header():
+    result = parse_task_csv("Задача;Дедлайн;Исполнитель\nотчёт, черновик;2030-05-01;@alice_1\n")
+    assert [(i.title, i.deadline, i.assignee_username) for i in result.items] == [
+        ("отчёт, черновик", date(2030, 5, 1), "alice_1"),
+    ]
+    assert result.errors == []
+
+
+def test_task_csv_tab_delimiter_and_bom():
+    result = parse_task_csv("\ufeffотчёт\t01.05.2030\talice_1\t24h 0\n")
+    assert len(result.items) == 1
+    assert result.items[0].title == "отчёт"
+    assert result.items[0].reminders == [1440, 0]
+
+
+def test_task_csv_reports_bad_rows():
+    content = "\n".join([
+        "a,2030-05-01,alice_1",
+        "b,2030-05-01",
+        "c,2030-05-01,bob smith",
+        "d,2030-05-01,bob!x",
+        "e,2030-05-01,bob",
+        "f,завтра,alice_1",
+        ",2030-05-01,alice_1",
+    ])
+    result = parse_task_csv(content)
+    assert [i.title for i in result.items] == ["a"]
+    assert [line_no for line_no, _ in result.errors] == [2, 3, 4, 5, 6, 7]
@@ -0,0 +1,20 @@
+from sqlalchemy import create_engine, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.db import session as db_session  # noqa: F401 — регистрирует слушатели Session
+from app.db.base import Base
+from app.db.models import User
+
+
+def test_orm_dml_passes_lazy_load_listener():
+    # do_orm_execute срабатывает и на ORM INSERT/UPDATE — слушатель ленивых загрузок не должен на них падать
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[User.__table__])
+    db_session.set_lazy_load_mode("raise")
+    try:
+        with Session(engine) as session:
+            session.execute(insert(User), [{"tg_id": 1, "username": "alice", "username_lc": "alice"}])
+            session.execute(update(User).where(User.tg_id == 1).values(username_lc="bob"))
+            assert session.scalar(select(User.username_lc).where(User.tg_id == 1)) == "bob"
+    finally:
+        db_session.set_lazy_load_mode("log")
@@ -0,0 +1,25 @@
+import asyncio
+
+import pytest
+
+from app.services.throttling import MemoryThrottleBackend, ThrottleSettings, Throttler
+from app.utils.ratelimit import Rate
+
+
+def test_rejected_by_user_limit_keeps_command_quota():
+    # Отказ по общему лимиту пользователя не должен списывать токен команды
+    settings = ThrottleSettings(
+        user=Rate(capacity=1, per_second=0.001),
+        chat=None,
+        commands={"my": Rate(capacity=2, per_second=0.001)},
+    )
+    backend = MemoryThrottleBackend()
+    throttler = Throttler(settings, backend)
+
+    async def run():
+        assert await throttler.check(1, None, "my") == (0.0, "")
+        wait, scope = await throttler.check(1, None, "my")
+        assert wait > 0 and scope == "user"
+        return backend._buckets["u:1:my"].tokens
+
+    assert asyncio.run(run()) == pytest.approx(1, abs=0.01)